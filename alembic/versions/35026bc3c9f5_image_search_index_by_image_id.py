@@ -0,0 +1,93 @@
+"""image search index by image id
+
+Revision ID: 35026bc3c9f5
+Revises: a03d51afb339
+Create Date: 2026-10-18 12:07:02.189369
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "35026bc3c9f5"
+down_revision: Union[str, None] = "a03d51afb339"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute(
+            "CREATE INDEX ix_image_description_trgm ON image "
+            "USING gin (description gin_trgm_ops)"
+        )
+    elif dialect == "sqlite":
+        _drop_sqlite_search_index()
+        op.execute(
+            "CREATE VIRTUAL TABLE image_fts USING fts5("
+            "image_id UNINDEXED, title, description, "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        op.execute(
+            "CREATE TRIGGER image_fts_insert AFTER INSERT ON image BEGIN "
+            "INSERT INTO image_fts(image_id, title, description) "
+            "VALUES (new.id, new.title, new.description); END"
+        )
+        op.execute(
+            "CREATE TRIGGER image_fts_delete AFTER DELETE ON image BEGIN "
+            "DELETE FROM image_fts WHERE image_id = old.id; END"
+        )
+        op.execute(
+            "CREATE TRIGGER image_fts_update AFTER UPDATE OF title, description "
+            "ON image BEGIN "
+            "UPDATE image_fts SET title = new.title, description = new.description "
+            "WHERE image_id = old.id; END"
+        )
+        op.execute(
+            "INSERT INTO image_fts(image_id, title, description) "
+            "SELECT id, title, description FROM image"
+        )
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_image_description_trgm")
+    elif dialect == "sqlite":
+        _drop_sqlite_search_index()
+        op.execute(
+            "CREATE VIRTUAL TABLE image_fts USING fts5("
+            "title, description, content='image', content_rowid='rowid', "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        op.execute(
+            "CREATE TRIGGER image_fts_insert AFTER INSERT ON image BEGIN "
+            "INSERT INTO image_fts(rowid, title, description) "
+            "VALUES (new.rowid, new.title, new.description); END"
+        )
+        op.execute(
+            "CREATE TRIGGER image_fts_delete AFTER DELETE ON image BEGIN "
+            "INSERT INTO image_fts(image_fts, rowid, title, description) "
+            "VALUES ('delete', old.rowid, old.title, old.description); END"
+        )
+        op.execute(
+            "CREATE TRIGGER image_fts_update AFTER UPDATE OF title, description "
+            "ON image BEGIN "
+            "INSERT INTO image_fts(image_fts, rowid, title, description) "
+            "VALUES ('delete', old.rowid, old.title, old.description); "
+            "INSERT INTO image_fts(rowid, title, description) "
+            "VALUES (new.rowid, new.title, new.description); END"
+        )
+        op.execute("INSERT INTO image_fts(image_fts) VALUES ('rebuild')")
+
+
+def _drop_sqlite_search_index() -> None:
+    op.execute("DROP TRIGGER IF EXISTS image_fts_update")
+    op.execute("DROP TRIGGER IF EXISTS image_fts_delete")
+    op.execute("DROP TRIGGER IF EXISTS image_fts_insert")
+    op.execute("DROP TABLE IF EXISTS image_fts")
@@ -0,0 +1,75 @@
+"""image full text search
+
+Revision ID: 52d9a61b0b7e
+Revises: dbd064225a61
+Create Date: 2026-10-18 11:29:03.464622
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "52d9a61b0b7e"
+down_revision: Union[str, None] = "dbd064225a61"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(
+            "ALTER TABLE image ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+            ") STORED"
+        )
+        op.execute(
+            "CREATE INDEX ix_image_search_vector ON image USING gin (search_vector)"
+        )
+        op.execute(
+            "CREATE INDEX ix_image_title_trgm ON image USING gin (title gin_trgm_ops)"
+        )
+    elif dialect == "sqlite":
+        op.execute(
+            "CREATE VIRTUAL TABLE image_fts USING fts5("
+            "title, description, content='image', content_rowid='rowid', "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        op.execute(
+            "CREATE TRIGGER image_fts_insert AFTER INSERT ON image BEGIN "
+            "INSERT INTO image_fts(rowid, title, description) "
+            "VALUES (new.rowid, new.title, new.description); END"
+        )
+        op.execute(
+            "CREATE TRIGGER image_fts_delete AFTER DELETE ON image BEGIN "
+            "INSERT INTO image_fts(image_fts, rowid, title, description) "
+            "VALUES ('delete', old.rowid, old.title, old.description); END"
+        )
+        op.execute(
+            "CREATE TRIGGER image_fts_update AFTER UPDATE OF title, description "
+            "ON image BEGIN "
+            "INSERT INTO image_fts(image_fts, rowid, title, description) "
+            "VALUES ('delete', old.rowid, old.title, old.description); "
+            "INSERT INTO image_fts(rowid, title, description) "
+            "VALUES (new.rowid, new.title, new.description); END"
+        )
+        op.execute("INSERT INTO image_fts(image_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_image_title_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_image_search_vector")
+        op.execute("ALTER TABLE image DROP COLUMN IF EXISTS search_vector")
+    elif dialect == "sqlite":
+        op.execute("DROP TRIGGER IF EXISTS image_fts_update")
+        op.execute("DROP TRIGGER IF EXISTS image_fts_delete")
+        op.execute("DROP TRIGGER IF EXISTS image_fts_insert")
+        op.execute("DROP TABLE IF EXISTS image_fts")
@@ -0,0 +1,32 @@
+"""recompute color embeddings
+
+Revision ID: a03d51afb339
+Revises: 639c8693cec9
+Create Date: 2026-10-18 11:54:03.555182
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a03d51afb339'
+down_revision: Union[str, None] = '639c8693cec9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("UPDATE imagefile SET embedding = NULL")
+    op.execute(
+        "INSERT INTO processingjob (image_id, state, attempts, run_after) "
+        "SELECT image_id, 'PENDING', 0, CURRENT_TIMESTAMP FROM imagefile "
+        "WHERE image_id NOT IN (SELECT image_id FROM processingjob)"
+    )
+
+
+def downgrade() -> None:
+    pass
@@ -0,0 +1,46 @@
+#!/bin/sh
+# Checks that downloads offloaded to nginx keep the API's caching headers.
+# Run against the docker-compose stack: ./nginx/smoke-test.sh [base-url]
+set -eu
+
+BASE_URL=${1:-http://localhost:${PORT:-80}}
+USERNAME=smoke_$(date +%s)
+PASSWORD=smoke-password
+IMAGE=${IMAGE:-tests/assets/colors.jpg}
+HEADERS=$(mktemp)
+trap 'rm -f "$HEADERS"' EXIT
+
+fail() {
+    echo "FAIL: $1" >&2
+    cat "$HEADERS" >&2
+    exit 1
+}
+
+credentials="{\"username\": \"$USERNAME\", \"password\": \"$PASSWORD\"}"
+curl -sf -H "Content-Type: application/json" -d "$credentials" \
+    "$BASE_URL/users/" > /dev/null
+token=$(curl -sf -H "Content-Type: application/json" -d "$credentials" \
+    "$BASE_URL/auth/jwt/create" | jq -r .access_token)
+auth="Authorization: Bearer $token"
+image_id=$(curl -sf -H "$auth" -F "file=@$IMAGE;type=image/jpeg" -F title=smoke \
+    "$BASE_URL/images/" | jq -r .image_id)
+
+curl -sf -D "$HEADERS" -o /dev/null -H "$auth" "$BASE_URL/images/$image_id/"
+for header in ETag Last-Modified Cache-Control; do
+    grep -qi "^$header: ." "$HEADERS" || fail "$header missing"
+done
+etag=$(grep -i '^ETag:' "$HEADERS" | cut -d' ' -f2- | tr -d '\r')
+
+status=$(curl -s -o /dev/null -w '%{http_code}' -H "$auth" \
+    -H "If-None-Match: $etag" "$BASE_URL/images/$image_id/")
+[ "$status" = 304 ] || fail "conditional GET returned $status"
+
+status=$(curl -s -D "$HEADERS" -o /dev/null -w '%{http_code}' -H "$auth" \
+    -H "Range: bytes=0-9" -H "If-Range: $etag" "$BASE_URL/images/$image_id/")
+[ "$status" = 206 ] || fail "If-Range returned $status"
+
+curl -sf -D "$HEADERS" -o /dev/null -H "$auth" -H "Accept: image/webp" \
+    "$BASE_URL/images/$image_id/?size=256"
+grep -qi '^Vary: .*Accept' "$HEADERS" || fail "Vary missing on variant download"
+
+echo "OK: offloaded downloads keep ETag, Last-Modified, Cache-Control and Vary"
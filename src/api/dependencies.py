@@ -1,8 +1,10 @@
 from typing import Annotated
 
-from fastapi import Depends, HTTPException, UploadFile, status
+from fastapi import Depends, Header, HTTPException, Query, UploadFile, status
 
 from src.auth.service import get_user
+from src.db.pagination import KeysetParams
+from src.images.conditional import RequestConditions
 from src.images.constants import ALLOWED_IMAGE_MIME_TYPES
 from src.images.models import Image
 from src.images.service import ImagesService
@@ -27,3 +29,25 @@ def is_own_image(
 ) -> None:
     if image.owner_id != user.id:
         raise HTTPException(status.HTTP_403_FORBIDDEN)
+
+
+def get_request_conditions(
+    if_none_match: Annotated[str | None, Header()] = None,
+    if_modified_since: Annotated[str | None, Header()] = None,
+    range_header: Annotated[str | None, Header(alias="range")] = None,
+    if_range: Annotated[str | None, Header()] = None,
+) -> RequestConditions:
+    return RequestConditions(
+        if_none_match=if_none_match,
+        if_modified_since=if_modified_since,
+        range=range_header,
+        if_range=if_range,
+    )
+
+
+def get_keyset_params(
+    cursor: str | None = None,
+    size: Annotated[int, Query(ge=1, le=100)] = 50,
+    include_total: bool = False,
+) -> KeysetParams:
+    return KeysetParams(cursor=cursor, size=size, include_total=include_total)
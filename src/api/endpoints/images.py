@@ -1,22 +1,60 @@
-from typing import Annotated
+from typing import Annotated, Literal
 
-from fastapi import APIRouter, Depends, Form, Response, UploadFile, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    Form,
+    Header,
+    Query,
+    Response,
+    UploadFile,
+    status,
+)
 from fastapi_filter import FilterDepends
 from fastapi_pagination import Page
 from fastapi_pagination.ext.sqlmodel import paginate
+from pydantic_extra_types.color import Color
 
 from src.auth.service import AuthenticationRequired, get_user
+from src.db.pagination import KeysetPage, KeysetParams, paginate_keyset
 from src.db.session import DBSession
+from src.images.cached_storage import CacheStatistics
+from src.images.conditional import RequestConditions
+from src.images.constants import (
+    MAX_COLOR_TOLERANCE,
+    MAX_DUPLICATE_DISTANCE,
+    MAX_TRANSFORM_DIMENSION,
+)
 from src.images.filters import ImageFilter
-from src.images.models import Image
-from src.images.schemas import ImageDetailsSchema, ImageIdSchema, ImageUpdateSchema
+from src.images.models import Image, TrendingImage
+from src.images.schemas import (
+    ImageColorMatchSchema,
+    ImageDetailsSchema,
+    ImageDuplicateSchema,
+    ImageIdSchema,
+    ImageLikedSchema,
+    ImageSimilarSchema,
+    ImageTransformSchema,
+    ImageUpdateSchema,
+)
 from src.images.service import ImagesService
-from src.users.models import User
+from src.images.variants import Fit
+from src.users.models import User, UserImageLikes
 
-from ..dependencies import get_image_by_id, is_own_image, validate_image_type
+from ..dependencies import (
+    get_image_by_id,
+    get_keyset_params,
+    get_request_conditions,
+    is_own_image,
+    validate_image_type,
+)
 
 router = APIRouter(dependencies=[AuthenticationRequired])
 
+DEFAULT_FEED_ORDERING = ["-created_at"]
+DEFAULT_LIKED_FEED_ORDERING = ["-liked_at"]
+TRENDING_ORDERING = ["-score"]
+
 
 @router.get(
     "/",
@@ -31,7 +69,47 @@ async def list_images(
     return paginate(
         db_session,
         query,
-        transformer=ImageDetailsSchema.from_model_bulk,
+        transformer=ImageDetailsSchema.from_row_bulk,
+    )
+
+
+@router.get(
+    "/feed",
+    response_model=KeysetPage[ImageDetailsSchema],
+)
+def list_images_feed(
+    db_session: DBSession,
+    image_filter: Annotated[ImageFilter, FilterDepends(ImageFilter)],
+    images_service: Annotated[ImagesService, Depends()],
+    page_params: Annotated[KeysetParams, Depends(get_keyset_params)],
+):
+    query = images_service.filter_images_query(image_filter)
+    return paginate_keyset(
+        db_session,
+        query,
+        Image,
+        image_filter.ordering_values or DEFAULT_FEED_ORDERING,
+        page_params,
+        ImageDetailsSchema.from_row_bulk,
+    )
+
+
+@router.get(
+    "/trending",
+    response_model=KeysetPage[ImageDetailsSchema],
+)
+def list_trending_images(
+    db_session: DBSession,
+    images_service: Annotated[ImagesService, Depends()],
+    page_params: Annotated[KeysetParams, Depends(get_keyset_params)],
+):
+    return paginate_keyset(
+        db_session,
+        images_service.get_trending_images_query(),
+        TrendingImage,
+        TRENDING_ORDERING,
+        page_params,
+        ImageDetailsSchema.from_row_bulk,
     )
 
 
@@ -54,7 +132,7 @@ async def upload_image(
 
 @router.get(
     "/liked",
-    response_model=Page[ImageDetailsSchema],
+    response_model=Page[ImageLikedSchema],
 )
 async def list_liked_images(
     user: Annotated[User, Depends(get_user)],
@@ -62,39 +140,141 @@ async def list_liked_images(
     image_filter: Annotated[ImageFilter, FilterDepends(ImageFilter)],
     images_service: Annotated[ImagesService, Depends()],
 ):
-    query = images_service.get_liked_images_query(user)
-    image_filter.filter(query)
+    query = images_service.filter_liked_images_query(user, image_filter)
     return paginate(
         db_session,
         query,
-        transformer=ImageDetailsSchema.from_model_bulk,
+        transformer=ImageLikedSchema.from_row_bulk,
+    )
+
+
+@router.get(
+    "/liked/feed",
+    response_model=KeysetPage[ImageLikedSchema],
+)
+def list_liked_images_feed(
+    user: Annotated[User, Depends(get_user)],
+    db_session: DBSession,
+    image_filter: Annotated[ImageFilter, FilterDepends(ImageFilter)],
+    images_service: Annotated[ImagesService, Depends()],
+    page_params: Annotated[KeysetParams, Depends(get_keyset_params)],
+):
+    query = images_service.filter_liked_images_query(user, image_filter)
+    if image_filter.ordering_values:
+        model, ordering = Image, image_filter.ordering_values
+    else:
+        model, ordering = UserImageLikes, DEFAULT_LIKED_FEED_ORDERING
+    return paginate_keyset(
+        db_session,
+        query,
+        model,
+        ordering,
+        page_params,
+        ImageLikedSchema.from_row_bulk,
     )
 
 
 @router.post("/liked/{image_id}", status_code=status.HTTP_204_NO_CONTENT)
 def like_image(
+    image_id: str,
     user: Annotated[User, Depends(get_user)],
-    image: Annotated[Image, Depends(get_image_by_id)],
     images_service: Annotated[ImagesService, Depends()],
 ):
-    images_service.like_image(image, user)
+    images_service.like_image(image_id, user)
 
 
 @router.delete("/liked/{image_id}", status_code=status.HTTP_204_NO_CONTENT)
 def remove_like(
+    image_id: str,
     user: Annotated[User, Depends(get_user)],
-    image: Annotated[Image, Depends(get_image_by_id)],
     images_service: Annotated[ImagesService, Depends()],
 ):
-    images_service.remove_like(image, user)
+    images_service.remove_like(image_id, user)
+
+
+@router.get(
+    "/search/color",
+    response_model=list[ImageColorMatchSchema],
+)
+def search_images_by_color(
+    color: Color,
+    images_service: Annotated[ImagesService, Depends()],
+    tolerance: Annotated[float, Query(gt=0, le=MAX_COLOR_TOLERANCE)] = 10,
+    size: Annotated[int, Query(ge=1, le=100)] = 50,
+):
+    rows = images_service.search_images_by_color(color.as_hex(), tolerance, size)
+    return ImageColorMatchSchema.from_row_bulk(rows)
+
+
+@router.get(
+    "/cache",
+    response_model=CacheStatistics,
+)
+def get_cache_statistics(images_service: Annotated[ImagesService, Depends()]):
+    return images_service.get_cache_statistics()
 
 
 @router.get("/{image_id}/")
 async def download_image(
     image_id: str,
     images_service: Annotated[ImagesService, Depends()],
+    conditions: Annotated[RequestConditions, Depends(get_request_conditions)],
+    size: Annotated[int | None, Query(gt=0)] = None,
+    v: str | None = None,
+    accept: Annotated[str | None, Header()] = None,
 ) -> Response:
-    return await images_service.get_image_file(image_id)
+    return await images_service.get_image_file(image_id, size, accept, conditions, v)
+
+
+@router.get("/{image_id}/transform")
+async def transform_image(
+    image_id: str,
+    images_service: Annotated[ImagesService, Depends()],
+    conditions: Annotated[RequestConditions, Depends(get_request_conditions)],
+    w: Annotated[int | None, Query(gt=0, le=MAX_TRANSFORM_DIMENSION)] = None,
+    h: Annotated[int | None, Query(gt=0, le=MAX_TRANSFORM_DIMENSION)] = None,
+    fit: Fit = "contain",
+    quality: Annotated[int, Query(ge=1, le=100)] = 80,
+    format: Literal["jpeg", "png", "webp"] | None = None,
+    accept: Annotated[str | None, Header()] = None,
+) -> Response:
+    transform = ImageTransformSchema(
+        width=w,
+        height=h,
+        fit=fit,
+        quality=quality,
+        format=format,
+    )
+    return await images_service.get_transformed_image(
+        image_id, transform, accept, conditions
+    )
+
+
+@router.get(
+    "/{image_id}/duplicates",
+    response_model=list[ImageDuplicateSchema],
+)
+def find_duplicate_images(
+    image_id: str,
+    images_service: Annotated[ImagesService, Depends()],
+    max_distance: Annotated[int, Query(ge=0, le=MAX_DUPLICATE_DISTANCE)] = 8,
+    size: Annotated[int, Query(ge=1, le=100)] = 50,
+):
+    duplicates = images_service.find_duplicate_images(image_id, max_distance, size)
+    return [ImageDuplicateSchema.from_match(row, match) for row, match in duplicates]
+
+
+@router.get(
+    "/{image_id}/similar",
+    response_model=list[ImageSimilarSchema],
+)
+def find_similar_images(
+    image_id: str,
+    images_service: Annotated[ImagesService, Depends()],
+    size: Annotated[int, Query(ge=1, le=100)] = 20,
+):
+    similar = images_service.find_similar_images(image_id, size)
+    return [ImageSimilarSchema.from_match(row, match) for row, match in similar]
 
 
 @router.patch(
@@ -128,8 +308,8 @@ async def change_image(
     status_code=status.HTTP_204_NO_CONTENT,
     dependencies=[Depends(is_own_image)],
 )
-def delete_image(
+async def delete_image(
     image: Annotated[Image, Depends(get_image_by_id)],
     images_service: Annotated[ImagesService, Depends()],
 ):
-    images_service.delete_image(image)
+    await images_service.delete_image(image)
@@ -1,6 +1,7 @@
 import secrets
 from datetime import timedelta
 from pathlib import Path
+from typing import Literal
 
 from fastapi_jwt import JwtAccessBearer, JwtRefreshBearerCookie
 from pydantic import AnyUrl, Field
@@ -22,8 +23,70 @@ class SecretKeySettings(_SettingsModelConfigMixin, BaseSettings):
 class Settings(_SettingsModelConfigMixin, BaseSettings):
     db_url: AnyUrl
 
-    image_storage_location: Path | AnyUrl = ".images/"
+    image_storage_location: AnyUrl | Path = Path(".images/")
+    image_storage_backend: Literal["local", "content_addressed"] = "local"
+    image_storage_endpoint_url: AnyUrl | None = None
+    image_storage_region: str = "us-east-1"
+    image_storage_access_key: str | None = None
+    image_storage_secret_key: str | None = None
+    image_storage_part_size: int = 8_388_608
+    image_storage_max_connections: int = 32
+    image_storage_shard_depth: int = 2
+    image_storage_shard_width: int = 2
+    image_storage_cache: Literal["none", "tiered"] = "none"
+    image_storage_cache_location: Path = Path(".cache/images/")
+    image_storage_cache_max_size: int = 10_737_418_240
+    image_storage_cache_memory_max_size: int = 0
+    image_storage_cache_memory_max_file_size: int = 65_536
+    image_storage_cache_admission_threshold: int = 2
+    image_serving_mode: Literal["direct", "x_accel_redirect", "x_sendfile"] = "direct"
+    image_serving_internal_location: str = "/protected-images/"
     image_palette_color_count: int = 5
+    image_analysis_max_dimension: int | None = 512
+    image_variant_dimensions: list[int] = [256, 1024, 2048]
+    image_variant_formats: list[Literal["jpeg", "png", "webp"]] = ["webp", "jpeg"]
+    image_variant_quality: int = 80
+    image_cache_max_age: int = 31_536_000
+
+    image_derivative_cache_location: Path = Path(".cache/derivatives/")
+    image_derivative_cache_max_size: int = 1_073_741_824
+
+    image_analysis_workers: int = 2
+    image_analysis_max_pending: int = 16
+    image_analysis_submit_timeout: float = 10.0
+
+    image_processing_inline: bool = True
+    image_processing_concurrency: int = 2
+    image_processing_max_attempts: int = 5
+    image_processing_retry_delay: float = 10.0
+    image_processing_release_delay: float = 1.0
+    image_processing_lease: float = 600.0
+    image_processing_poll_interval: float = 5.0
+
+    image_index_preload: bool = True
+    image_duplicate_index_refresh_interval: float = 5.0
+    image_duplicate_index_reconcile_interval: float = 300.0
+    image_similarity_index_location: str | None = None
+    image_similarity_index_lists: int = 256
+    image_similarity_index_probes: int = 8
+    image_similarity_index_refresh_interval: float = 5.0
+    image_similarity_index_reconcile_interval: float = 300.0
+
+    image_trending_half_life: float = 86_400.0
+    image_trending_min_score: float = 0.1
+    image_trending_refresh_interval: float = 60.0
+    image_like_reconcile_interval: float = 86_400.0
+
+    image_scrub_batch_size: int = 500
+    image_scrub_operations_per_second: float | None = 100.0
+    image_scrub_bytes_per_second: int | None = 8_388_608
+    image_scrub_grace_period: float = 3600.0
+
+    @property
+    def image_storage_kind(self) -> str:
+        if isinstance(self.image_storage_location, AnyUrl):
+            return "object"
+        return self.image_storage_backend
 
 
 SECRET_KEY = SecretKeySettings().secret_key
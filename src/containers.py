@@ -4,7 +4,16 @@ from passlib.context import CryptContext
 
 from .config import Settings
 from .db.service import Database
-from .images.storage import LocalImageStorage
+from .images.analysis import EMBEDDING_DIMENSION
+from .images.cache import DerivativeCache
+from .images.cached_storage import create_caching_storage
+from .images.duplicates import DuplicateIndex
+from .images.executor import init_analysis_executor
+from .images.object_storage import ObjectImageStorage, S3Client
+from .images.processing import ImageProcessor
+from .images.similarity import SimilarityIndex
+from .images.storage import ContentAddressedImageStorage, LocalImageStorage
+from .images.trending import TrendingScores
 
 
 class Container(DeclarativeContainer):
@@ -25,9 +34,113 @@ class Container(DeclarativeContainer):
         pool_type=db_pool_type,
     )
 
-    image_storage = providers.Factory(
-        LocalImageStorage,
-        storage_location=settings.provided.image_storage_location,
+    image_storage_client = providers.Resource(
+        S3Client,
+        endpoint_url=settings.provided.image_storage_endpoint_url,
+        region=settings.provided.image_storage_region,
+        access_key=settings.provided.image_storage_access_key,
+        secret_key=settings.provided.image_storage_secret_key,
+        max_connections=settings.provided.image_storage_max_connections,
+    )
+
+    image_storage_backend = providers.Selector(
+        settings.provided.image_storage_kind,
+        local=providers.Factory(
+            LocalImageStorage,
+            storage_location=settings.provided.image_storage_location,
+            serving_mode=settings.provided.image_serving_mode,
+            internal_location=settings.provided.image_serving_internal_location,
+            shard_depth=settings.provided.image_storage_shard_depth,
+            shard_width=settings.provided.image_storage_shard_width,
+        ),
+        content_addressed=providers.Factory(
+            ContentAddressedImageStorage,
+            storage_location=settings.provided.image_storage_location,
+            serving_mode=settings.provided.image_serving_mode,
+            internal_location=settings.provided.image_serving_internal_location,
+            shard_depth=settings.provided.image_storage_shard_depth,
+            shard_width=settings.provided.image_storage_shard_width,
+        ),
+        object=providers.Factory(
+            ObjectImageStorage,
+            client=image_storage_client,
+            location=settings.provided.image_storage_location,
+            part_size=settings.provided.image_storage_part_size,
+        ),
+    )
+
+    image_storage_disk_cache = providers.Singleton(
+        DerivativeCache,
+        location=settings.provided.image_storage_cache_location,
+        max_size=settings.provided.image_storage_cache_max_size,
+    )
+
+    image_storage = providers.Selector(
+        settings.provided.image_storage_cache,
+        none=image_storage_backend,
+        tiered=providers.Singleton(
+            create_caching_storage,
+            storage=image_storage_backend,
+            disk_cache=image_storage_disk_cache,
+            memory_max_size=settings.provided.image_storage_cache_memory_max_size,
+            memory_max_file_size=(
+                settings.provided.image_storage_cache_memory_max_file_size
+            ),
+            admission_threshold=(
+                settings.provided.image_storage_cache_admission_threshold
+            ),
+        ),
+    )
+
+    analysis_executor = providers.Resource(
+        init_analysis_executor,
+        max_workers=settings.provided.image_analysis_workers,
+        max_pending=settings.provided.image_analysis_max_pending,
+        submit_timeout=settings.provided.image_analysis_submit_timeout,
+    )
+
+    derivative_cache = providers.Singleton(
+        DerivativeCache,
+        location=settings.provided.image_derivative_cache_location,
+        max_size=settings.provided.image_derivative_cache_max_size,
+    )
+
+    duplicate_index = providers.ThreadSafeSingleton(
+        DuplicateIndex,
+        database=db,
+        refresh_interval=settings.provided.image_duplicate_index_refresh_interval,
+        reconcile_interval=settings.provided.image_duplicate_index_reconcile_interval,
+    )
+
+    similarity_index = providers.ThreadSafeSingleton(
+        SimilarityIndex,
+        database=db,
+        dimension=EMBEDDING_DIMENSION,
+        list_count=settings.provided.image_similarity_index_lists,
+        probe_count=settings.provided.image_similarity_index_probes,
+        refresh_interval=settings.provided.image_similarity_index_refresh_interval,
+        reconcile_interval=settings.provided.image_similarity_index_reconcile_interval,
+        location=settings.provided.image_similarity_index_location,
+    )
+
+    trending_scores = providers.Factory(
+        TrendingScores,
+        database=db,
+        half_life=settings.provided.image_trending_half_life,
+        min_score=settings.provided.image_trending_min_score,
+    )
+
+    image_processor = providers.Factory(
+        ImageProcessor,
+        database=db,
+        storage=image_storage,
+        analysis_executor=analysis_executor,
+        settings=settings,
     )
 
     passlib_context = providers.Object(CryptContext(schemes=["bcrypt"]))
+
+
+async def close_clients(container: Container) -> None:
+    if container.image_storage_client.initialized:
+        await container.image_storage_client().aclose()
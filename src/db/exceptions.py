@@ -35,3 +35,8 @@ def raises_on_not_found(
         return sync_wrapper
 
     return decorator
+
+
+class InvalidCursor(Exception):
+    def __init__(self, message: str = "Invalid pagination cursor", *args) -> None:
+        super().__init__(message, *args)
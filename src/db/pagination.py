@@ -0,0 +1,139 @@
+import base64
+import binascii
+import json
+from typing import Any, Callable, Generic, Iterable, NamedTuple, Sequence, TypeVar
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from sqlalchemy import Row, and_, func, literal, or_, tuple_
+from sqlmodel import Session, SQLModel, select
+from sqlmodel.sql.expression import Select
+
+from .exceptions import InvalidCursor
+
+T = TypeVar("T")
+
+
+class KeysetParams(BaseModel):
+    cursor: str | None = None
+    size: int = 50
+    include_total: bool = False
+
+
+class KeysetPage(BaseModel, Generic[T]):
+    items: list[T]
+    next_cursor: str | None = None
+    total: int | None = None
+
+
+class _KeysetColumn(NamedTuple):
+    name: str
+    descending: bool
+
+    @property
+    def field(self) -> str:
+        return f"-{self.name}" if self.descending else self.name
+
+
+def paginate_keyset(
+    session: Session,
+    query: Select,
+    model: type[SQLModel],
+    ordering: Iterable[str],
+    params: KeysetParams,
+    transformer: Callable[[Sequence[Row]], Sequence[T]],
+) -> KeysetPage[T]:
+    keyset = _get_keyset(model, ordering)
+    columns = [getattr(model, column.name) for column in keyset]
+    page_query = (
+        query.order_by(None)
+        .add_columns(
+            *(column.label(f"_keyset_{index}") for index, column in enumerate(columns))
+        )
+        .order_by(
+            *(
+                column.desc() if keyset_column.descending else column.asc()
+                for column, keyset_column in zip(columns, keyset)
+            )
+        )
+    )
+    if params.cursor is not None:
+        values = _decode_cursor(params.cursor, model, keyset)
+        page_query = page_query.where(_after(columns, keyset, values))
+    rows = session.exec(page_query.limit(params.size + 1)).all()
+    next_cursor = None
+    if len(rows) > params.size:
+        rows = rows[: params.size]
+        next_cursor = _encode_cursor(keyset, rows[-1][-len(keyset) :])
+    total = None
+    if params.include_total:
+        total = session.exec(
+            select(func.count()).select_from(query.order_by(None).subquery())
+        ).one()
+    return KeysetPage(items=transformer(rows), next_cursor=next_cursor, total=total)
+
+
+def _get_keyset(model: type[SQLModel], ordering: Iterable[str]) -> list[_KeysetColumn]:
+    keyset = []
+    for field in ordering:
+        name = field.lstrip("+-")
+        column = model.__table__.columns.get(name)
+        if column is None or column.nullable:
+            raise InvalidCursor(f"Cannot paginate by {name}")
+        if name not in (keyset_column.name for keyset_column in keyset):
+            keyset.append(_KeysetColumn(name, field.startswith("-")))
+    for column in model.__table__.primary_key.columns:
+        if column.name not in (keyset_column.name for keyset_column in keyset):
+            descending = keyset[-1].descending if keyset else False
+            keyset.append(_KeysetColumn(column.name, descending))
+    return keyset
+
+
+def _after(columns: list, keyset: list[_KeysetColumn], values: list[Any]):
+    values = [literal(value, column.type) for column, value in zip(columns, values)]
+    if len({column.descending for column in keyset}) == 1:
+        if keyset[0].descending:
+            return tuple_(*columns) < tuple_(*values)
+        return tuple_(*columns) > tuple_(*values)
+    conditions = []
+    for index, (column, keyset_column) in enumerate(zip(columns, keyset)):
+        beyond = (
+            column < values[index]
+            if keyset_column.descending
+            else column > values[index]
+        )
+        conditions.append(
+            and_(
+                *(columns[prior] == values[prior] for prior in range(index)),
+                beyond,
+            )
+        )
+    return or_(*conditions)
+
+
+def _encode_cursor(keyset: list[_KeysetColumn], values: Sequence[Any]) -> str:
+    payload = {
+        "k": [column.field for column in keyset],
+        "v": jsonable_encoder(list(values)),
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def _decode_cursor(
+    cursor: str,
+    model: type[SQLModel],
+    keyset: list[_KeysetColumn],
+) -> list[Any]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        expected_fields = [column.field for column in keyset]
+        if payload["k"] != expected_fields or len(payload["v"]) != len(keyset):
+            raise InvalidCursor()
+        return [
+            TypeAdapter(model.model_fields[column.name].annotation).validate_python(
+                value
+            )
+            for column, value in zip(keyset, payload["v"])
+        ]
+    except (binascii.Error, ValueError, TypeError, KeyError, ValidationError) as exc:
+        raise InvalidCursor() from exc
@@ -0,0 +1,13 @@
+from sqlalchemy import Insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, SQLModel
+
+_DIALECT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def insert_ignoring_conflicts(session: Session, model: type[SQLModel]) -> Insert:
+    dialect_insert = _DIALECT_INSERTS[session.get_bind().dialect.name]
+    return dialect_insert(model).on_conflict_do_nothing()
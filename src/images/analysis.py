@@ -0,0 +1,172 @@
+import numpy as np
+from PIL import Image as PILImage
+from pydantic import BaseModel
+from pydantic_extra_types.color import Color
+
+from .colors import rgb_array_to_lab
+from .hashing import difference_hash, perceptual_hash
+from .sources import ImageSource, open_image
+
+_ALPHA_THRESHOLD = 125
+_QUANTIZATION_SHIFT = 3
+_QUANTIZATION_BITS = 8 - _QUANTIZATION_SHIFT
+_EMBEDDING_BINS = 4
+_EMBEDDING_RANGES = ((0.0, 100.0), (-64.0, 64.0), (-64.0, 64.0))
+EMBEDDING_DIMENSION = _EMBEDDING_BINS ** len(_EMBEDDING_RANGES)
+
+
+class ImageAnalysis(BaseModel):
+    width: int
+    height: int
+    dominant_color: str
+    average_color: str
+    palette: list[str]
+    phash: int
+    dhash: int
+    embedding: bytes
+
+
+def downscale_image(
+    image: PILImage.Image,
+    max_dimension: int,
+    resample: PILImage.Resampling = PILImage.Resampling.BOX,
+) -> PILImage.Image:
+    scale = max_dimension / max(image.size)
+    if scale >= 1:
+        return image
+    size = (max(round(image.width * scale), 1), max(round(image.height * scale), 1))
+    return image.resize(size, resample, reducing_gap=2.0)
+
+
+def image_pixels(image: PILImage.Image) -> np.ndarray:
+    return np.asarray(image.convert("RGBA"))
+
+
+def decode_image(
+    source: ImageSource,
+    max_dimension: int | None = None,
+) -> tuple[int, int, np.ndarray]:
+    with open_image(source) as image:
+        width, height = image.size
+        if max_dimension:
+            image.draft(None, (max_dimension, max_dimension))
+            image = downscale_image(image, max_dimension)
+        pixels = image_pixels(image)
+    return width, height, pixels
+
+
+def opaque_pixels(pixels: np.ndarray) -> np.ndarray:
+    pixels = pixels.reshape(-1, 4)
+    opaque = pixels[pixels[:, 3] >= _ALPHA_THRESHOLD]
+    if not len(opaque):
+        opaque = pixels
+    return opaque[:, :3]
+
+
+def build_color_histogram(rgb: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    quantized = (rgb >> _QUANTIZATION_SHIFT).astype(np.int32)
+    bins = (
+        quantized[:, 0] << (2 * _QUANTIZATION_BITS)
+        | quantized[:, 1] << _QUANTIZATION_BITS
+        | quantized[:, 2]
+    )
+    bin_count = 1 << (3 * _QUANTIZATION_BITS)
+    counts = np.bincount(bins, minlength=bin_count)
+    sums = np.stack(
+        [np.bincount(bins, weights=rgb[:, c], minlength=bin_count) for c in range(3)],
+        axis=1,
+    )
+    occupied = counts.nonzero()[0]
+    return sums[occupied] / counts[occupied, None], counts[occupied]
+
+
+def median_cut(
+    colors: np.ndarray,
+    weights: np.ndarray,
+    color_count: int,
+) -> list[tuple[np.ndarray, int]]:
+    boxes = [(colors, weights)]
+    while len(boxes) < color_count:
+        spreads = [np.ptp(box_colors, axis=0) for box_colors, _ in boxes]
+        scores = [
+            spread.max() * box_weights.sum()
+            for spread, (_, box_weights) in zip(spreads, boxes)
+        ]
+        index = int(np.argmax(scores))
+        if scores[index] == 0:
+            break
+        box_colors, box_weights = boxes.pop(index)
+        channel = spreads[index].argmax()
+        order = np.argsort(box_colors[:, channel], kind="stable")
+        cumulative = np.cumsum(box_weights[order])
+        split = int(np.searchsorted(cumulative, cumulative[-1] / 2))
+        split = min(max(split, 1), len(order) - 1)
+        for part in (order[:split], order[split:]):
+            boxes.append((box_colors[part], box_weights[part]))
+    return [
+        (np.average(box_colors, axis=0, weights=box_weights), box_weights.sum())
+        for box_colors, box_weights in boxes
+    ]
+
+
+def color_embedding(rgb: np.ndarray) -> bytes:
+    lab = rgb_array_to_lab(rgb)
+    bins = np.zeros((len(lab), 1), dtype=np.int64)
+    weights = np.ones((len(lab), 1))
+    for channel, (low, high) in enumerate(_EMBEDDING_RANGES):
+        position = (lab[:, channel] - low) / (high - low) * _EMBEDDING_BINS - 0.5
+        position = np.clip(position, 0, _EMBEDDING_BINS - 1)
+        lower = np.minimum(position.astype(np.int64), _EMBEDDING_BINS - 2)
+        upper_weight = (position - lower)[:, None]
+        bins = np.concatenate(
+            [
+                bins * _EMBEDDING_BINS + lower[:, None],
+                bins * _EMBEDDING_BINS + lower[:, None] + 1,
+            ],
+            axis=1,
+        )
+        weights = np.concatenate(
+            [weights * (1 - upper_weight), weights * upper_weight], axis=1
+        )
+    histogram = np.bincount(
+        bins.ravel(), weights=weights.ravel(), minlength=EMBEDDING_DIMENSION
+    )
+    histogram = np.sqrt(histogram / len(lab))
+    return (histogram / np.linalg.norm(histogram)).astype(np.float16).tobytes()
+
+
+def to_hex(color: np.ndarray) -> str:
+    return Color(tuple(int(channel) for channel in np.rint(color))).as_hex()
+
+
+def analyze_pixels(
+    width: int,
+    height: int,
+    pixels: np.ndarray,
+    palette_color_count: int,
+) -> ImageAnalysis:
+    rgb = opaque_pixels(pixels)
+    colors, weights = build_color_histogram(rgb)
+    boxes = median_cut(colors, weights, palette_color_count)
+    boxes.sort(key=lambda box: box[1], reverse=True)
+    palette = list(dict.fromkeys(to_hex(color) for color, _ in boxes))
+    image = PILImage.fromarray(pixels, "RGBA")
+    return ImageAnalysis(
+        width=width,
+        height=height,
+        dominant_color=palette[0],
+        average_color=to_hex(rgb.mean(axis=0)),
+        palette=palette,
+        phash=perceptual_hash(image),
+        dhash=difference_hash(image),
+        embedding=color_embedding(rgb),
+    )
+
+
+def analyze_image(
+    source: ImageSource,
+    palette_color_count: int,
+    max_dimension: int | None = None,
+) -> ImageAnalysis:
+    width, height, pixels = decode_image(source, max_dimension)
+    return analyze_pixels(width, height, pixels, palette_color_count)
@@ -0,0 +1,55 @@
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from sqlmodel import Session, select, update
+
+from .models import ImageBlob, ImageFile, ProcessingState
+
+
+class BlobReferences:
+    def __init__(self, session: Session) -> None:
+        self._session = session
+
+    def acquire(self, content_hash: str, size: int) -> None:
+        if self._increment(content_hash):
+            return
+        try:
+            with self._session.begin_nested():
+                self._session.add(
+                    ImageBlob(content_hash=content_hash, size=size, ref_count=1)
+                )
+        except IntegrityError:
+            self._increment(content_hash)
+
+    def release(self, content_hash: str) -> None:
+        blob = self._session.exec(
+            select(ImageBlob)
+            .where(ImageBlob.content_hash == content_hash)
+            .with_for_update()
+        ).first()
+        if blob is None:
+            return
+        blob.ref_count -= 1
+        if blob.ref_count > 0:
+            self._session.add(blob)
+        else:
+            self._session.delete(blob)
+
+    def find_processed(self, content_hash: str, image_id: str) -> ImageFile | None:
+        return self._session.exec(
+            select(ImageFile)
+            .where(
+                ImageFile.content_hash == content_hash,
+                ImageFile.processing_state == ProcessingState.DONE,
+                ImageFile.image_id != image_id,
+            )
+            .options(selectinload(ImageFile.palette), selectinload(ImageFile.variants))
+            .limit(1)
+        ).first()
+
+    def _increment(self, content_hash: str) -> bool:
+        result = self._session.exec(
+            update(ImageBlob)
+            .where(ImageBlob.content_hash == content_hash)
+            .values(ref_count=ImageBlob.ref_count + 1)
+        )
+        return result.rowcount > 0
@@ -0,0 +1,232 @@
+import asyncio
+from collections import OrderedDict
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable
+from uuid import uuid4
+
+import aiofiles
+import aiofiles.os
+from aiofiles.threadpool.binary import AsyncBufferedReader
+from fastapi.concurrency import run_in_threadpool
+
+_HALVED_COUNTERS = bytes(counter >> 1 for counter in range(256))
+_MAX_FREQUENCY = 15
+_OPEN_ATTEMPTS = 3
+
+Render = Callable[[], Awaitable[bytes] | AsyncIterator[bytes]]
+
+
+class FrequencySketch:
+    def __init__(self, width: int = 4096, depth: int = 4) -> None:
+        self._width = width
+        self._rows = [bytearray(width) for _ in range(depth)]
+        self._sample_size = 10 * width
+        self._additions = 0
+
+    def increment(self, key: str) -> None:
+        for seed, row in enumerate(self._rows):
+            index = hash((seed, key)) % self._width
+            if row[index] < _MAX_FREQUENCY:
+                row[index] += 1
+        self._additions += 1
+        if self._additions >= self._sample_size:
+            self._age()
+
+    def estimate(self, key: str) -> int:
+        return min(
+            row[hash((seed, key)) % self._width] for seed, row in enumerate(self._rows)
+        )
+
+    def _age(self) -> None:
+        for row in self._rows:
+            row[:] = row.translate(_HALVED_COUNTERS)
+        self._additions //= 2
+
+
+class MemoryCache:
+    def __init__(self, max_size: int, sketch: FrequencySketch) -> None:
+        self._max_size = max_size
+        self._sketch = sketch
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._total_size = 0
+
+    @property
+    def total_size(self) -> int:
+        return self._total_size
+
+    def get(self, key: str) -> bytes | None:
+        content = self._entries.get(key)
+        if content is not None:
+            self._entries.move_to_end(key)
+        return content
+
+    def admits(self, key: str, size: int) -> bool:
+        if size > self._max_size:
+            return False
+        if key in self._entries or self._total_size + size <= self._max_size:
+            return True
+        victim = next(iter(self._entries))
+        return self._sketch.estimate(key) > self._sketch.estimate(victim)
+
+    def put(self, key: str, content: bytes) -> bool:
+        if not self.admits(key, len(content)):
+            return False
+        self._remove(key)
+        while self._total_size + len(content) > self._max_size:
+            self._remove(next(iter(self._entries)))
+        self._entries[key] = content
+        self._total_size += len(content)
+        return True
+
+    def discard_prefix(self, prefix: str) -> None:
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        content = self._entries.pop(key, None)
+        if content is not None:
+            self._total_size -= len(content)
+
+
+# Entries are handed out as open files so eviction, here or in another process
+# sharing the location, cannot pull them from under a response. max_size is
+# enforced per process: each one evicts against its own index, so N processes
+# sharing a location can use up to N * max_size.
+class DerivativeCache:
+    def __init__(self, location: str | Path, max_size: int) -> None:
+        self._location = Path(location)
+        self._max_size = max_size
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._total_size = 0
+        self._pending: dict[str, asyncio.Task[Path]] = {}
+        self._indexed = False
+
+    @property
+    def total_size(self) -> int:
+        return self._total_size
+
+    async def get(self, key: str) -> Path | None:
+        if not self._indexed:
+            await run_in_threadpool(self._build_index)
+        if key not in self._entries:
+            return None
+        path = self._get_path(key)
+        self._entries.move_to_end(key)
+        if await aiofiles.os.path.exists(path):
+            return path
+        self._remove_entry(key)
+        return None
+
+    async def get_or_create(
+        self,
+        key: str,
+        render: Render,
+    ) -> Path:
+        path = await self.get(key)
+        if path is not None:
+            return path
+        if key not in self._pending:
+            task = asyncio.create_task(self._create(key, render))
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        return await asyncio.shield(self._pending[key])
+
+    async def open(self, key: str) -> AsyncBufferedReader | None:
+        path = await self.get(key)
+        if path is None:
+            return None
+        return await self._open(key, path)
+
+    async def open_or_create(
+        self,
+        key: str,
+        render: Render,
+    ) -> AsyncBufferedReader:
+        for _ in range(_OPEN_ATTEMPTS):
+            cache_file = await self._open(key, await self.get_or_create(key, render))
+            if cache_file is not None:
+                return cache_file
+        raise FileNotFoundError(self._get_path(key))
+
+    async def discard_prefix(self, prefix: str) -> None:
+        if not self._indexed:
+            await run_in_threadpool(self._build_index)
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            self._remove_entry(key)
+            try:
+                await aiofiles.os.remove(self._get_path(key))
+            except FileNotFoundError:
+                pass
+
+    async def _create(self, key: str, render: Render) -> Path:
+        path = self._get_path(key)
+        if await aiofiles.os.path.exists(path):
+            self._add_entry(key, (await aiofiles.os.stat(path)).st_size)
+            return path
+        await aiofiles.os.makedirs(path.parent, exist_ok=True)
+        temp_path = path.with_name(f".{path.name}.{uuid4().hex}")
+        try:
+            size = await _write_rendered(temp_path, render())
+            await aiofiles.os.replace(temp_path, path)
+        finally:
+            if await aiofiles.os.path.exists(temp_path):
+                await aiofiles.os.remove(temp_path)
+        self._add_entry(key, size)
+        await self._evict()
+        return path
+
+    async def _open(self, key: str, path: Path) -> AsyncBufferedReader | None:
+        try:
+            return await aiofiles.open(path, "rb")
+        except FileNotFoundError:
+            self._remove_entry(key)
+            return None
+
+    async def _evict(self) -> None:
+        while self._total_size > self._max_size and len(self._entries) > 1:
+            key, _ = next(iter(self._entries.items()))
+            self._remove_entry(key)
+            try:
+                await aiofiles.os.remove(self._get_path(key))
+            except FileNotFoundError:
+                pass
+
+    def _build_index(self) -> None:
+        files = []
+        if self._location.exists():
+            for entry in self._location.glob("*/*"):
+                if entry.name.startswith("."):
+                    continue
+                stat = entry.stat()
+                files.append((stat.st_atime, entry.name, stat.st_size))
+        for _, key, size in sorted(files):
+            if key not in self._entries:
+                self._add_entry(key, size)
+        self._indexed = True
+
+    def _add_entry(self, key: str, size: int) -> None:
+        self._remove_entry(key)
+        self._entries[key] = size
+        self._total_size += size
+
+    def _remove_entry(self, key: str) -> None:
+        self._total_size -= self._entries.pop(key, 0)
+
+    def _get_path(self, key: str) -> Path:
+        return self._location / key[:2] / key
+
+
+async def _write_rendered(
+    path: Path,
+    rendered: Awaitable[bytes] | AsyncIterator[bytes],
+) -> int:
+    async with aiofiles.open(path, "wb") as cache_file:
+        if not isinstance(rendered, AsyncIterator):
+            content = await rendered
+            await cache_file.write(content)
+            return len(content)
+        size = 0
+        async for chunk in rendered:
+            await cache_file.write(chunk)
+            size += len(chunk)
+        return size
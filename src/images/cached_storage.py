@@ -0,0 +1,259 @@
+import os
+from typing import AsyncIterator, Awaitable, Callable, Iterable
+from uuid import UUID
+
+from aiofiles.threadpool.binary import AsyncBufferedReader
+from fastapi import Response, UploadFile, status
+from pydantic import BaseModel
+
+from .cache import DerivativeCache, FrequencySketch, MemoryCache, Render
+from .conditional import ByteRange
+from .models import ImageFile, ImageVariant
+from .sources import ImageSource
+from .storage import (
+    BlobStorage,
+    ImageStorage,
+    StoredFile,
+    content_disposition,
+    open_file_response,
+)
+
+
+class CacheStatistics(BaseModel):
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+
+
+class CachingImageStorage(ImageStorage):
+    def __init__(
+        self,
+        storage: ImageStorage,
+        disk_cache: DerivativeCache,
+        memory_max_size: int = 0,
+        memory_max_file_size: int = 65_536,
+        admission_threshold: int = 2,
+    ) -> None:
+        self._storage = storage
+        self._disk_cache = disk_cache
+        self._sketch = FrequencySketch()
+        self._memory_cache = MemoryCache(memory_max_size, self._sketch)
+        self._memory_max_file_size = memory_max_file_size
+        self._admission_threshold = admission_threshold
+        self.statistics = CacheStatistics()
+
+    async def save_image(self, image_id: str, uploaded_file: UploadFile) -> ImageFile:
+        file_metadata = await self._storage.save_image(image_id, uploaded_file)
+        await self._discard(f"{image_id}-")
+        return file_metadata
+
+    async def load_image(
+        self,
+        file_metadata: ImageFile,
+        byte_range: ByteRange | None = None,
+    ) -> Response:
+        response = await self._load_cached(
+            _get_image_key(file_metadata),
+            lambda: self._storage.iter_image(file_metadata),
+            file_metadata.content_type,
+            file_metadata.size,
+            byte_range,
+            filename=file_metadata.filename,
+        )
+        if response is None:
+            return await self._storage.load_image(file_metadata, byte_range)
+        return response
+
+    async def read_image(self, file_metadata: ImageFile) -> bytes:
+        key = _get_image_key(file_metadata)
+        self._sketch.increment(key)
+        content = self._memory_cache.get(key)
+        if content is not None:
+            self.statistics.memory_hits += 1
+            return content
+        cached_file = await self._disk_cache.open(key)
+        if cached_file is None:
+            self.statistics.misses += 1
+            content = await self._storage.read_image(file_metadata)
+            if not self._is_admitted(key):
+                return content
+            await self._disk_cache.get_or_create(key, _returning(content))
+        else:
+            self.statistics.disk_hits += 1
+            content = await _read_and_close(cached_file)
+        if len(content) <= self._memory_max_file_size:
+            self._memory_cache.put(key, content)
+        return content
+
+    def iter_image(self, file_metadata: ImageFile) -> AsyncIterator[bytes]:
+        return self._storage.iter_image(file_metadata)
+
+    async def get_image_source(self, file_metadata: ImageFile) -> ImageSource:
+        cached_path = await self._disk_cache.get(_get_image_key(file_metadata))
+        if cached_path is None:
+            return await self._storage.get_image_source(file_metadata)
+        return os.path.abspath(cached_path)
+
+    async def get_image_size(self, file_metadata: ImageFile) -> int | None:
+        return await self._storage.get_image_size(file_metadata)
+
+    def list_images(self, after: str | None = None) -> AsyncIterator[StoredFile]:
+        return self._storage.list_images(after)
+
+    async def delete_image(self, file_metadata: ImageFile) -> None:
+        await self._storage.delete_image(file_metadata)
+        await self._discard(f"{file_metadata.image_id}-")
+
+    async def delete_images(self, files: Iterable[ImageFile]) -> None:
+        files = list(files)
+        await self._storage.delete_images(files)
+        for file_metadata in files:
+            await self._discard(f"{file_metadata.image_id}-")
+
+    async def delete_stored_files(self, stored_files: Iterable[StoredFile]) -> None:
+        await self._storage.delete_stored_files(stored_files)
+
+    async def save_variant(self, variant: ImageVariant, content: bytes) -> None:
+        await self._storage.save_variant(variant, content)
+        await self._discard(_get_variant_prefix(variant))
+
+    async def copy_variant(
+        self,
+        variant: ImageVariant,
+        image_id: str | UUID,
+    ) -> ImageVariant:
+        return await self._storage.copy_variant(variant, image_id)
+
+    async def read_variant(self, variant: ImageVariant) -> bytes:
+        return await self._storage.read_variant(variant)
+
+    def iter_variant(self, variant: ImageVariant) -> AsyncIterator[bytes]:
+        return self._storage.iter_variant(variant)
+
+    async def load_variant(
+        self,
+        variant: ImageVariant,
+        byte_range: ByteRange | None = None,
+    ) -> Response:
+        response = await self._load_cached(
+            f"{_get_variant_prefix(variant)}{variant.size}",
+            lambda: self._storage.iter_variant(variant),
+            variant.content_type,
+            variant.size,
+            byte_range,
+        )
+        if response is None:
+            return await self._storage.load_variant(variant, byte_range)
+        return response
+
+    async def _load_cached(
+        self,
+        key: str,
+        read: Render,
+        media_type: str,
+        size: int,
+        byte_range: ByteRange | None,
+        filename: str | None = None,
+    ) -> Response | None:
+        self._sketch.increment(key)
+        content = self._memory_cache.get(key)
+        if content is not None:
+            self.statistics.memory_hits += 1
+            return _content_response(content, media_type, byte_range, filename)
+        cached_file = await self._disk_cache.open(key)
+        if cached_file is not None:
+            self.statistics.disk_hits += 1
+        else:
+            self.statistics.misses += 1
+            if not self._is_admitted(key):
+                return None
+            cached_file = await self._disk_cache.open_or_create(key, read)
+        await self._promote(key, cached_file, size)
+        return open_file_response(cached_file, media_type, size, byte_range, filename)
+
+    async def _promote(
+        self,
+        key: str,
+        cached_file: AsyncBufferedReader,
+        size: int,
+    ) -> None:
+        if size > self._memory_max_file_size or not self._memory_cache.admits(
+            key, size
+        ):
+            return
+        self._memory_cache.put(key, await cached_file.read())
+
+    def _is_admitted(self, key: str) -> bool:
+        return self._sketch.estimate(key) >= self._admission_threshold
+
+    async def _discard(self, prefix: str) -> None:
+        self._memory_cache.discard_prefix(prefix)
+        await self._disk_cache.discard_prefix(prefix)
+
+
+class CachingBlobStorage(CachingImageStorage, BlobStorage):
+    _storage: BlobStorage
+
+    def list_blobs(self, after: str | None = None) -> AsyncIterator[StoredFile]:
+        return self._storage.list_blobs(after)
+
+    async def delete_blob(self, content_hash: str) -> None:
+        await self._storage.delete_blob(content_hash)
+
+
+def create_caching_storage(
+    storage: ImageStorage,
+    disk_cache: DerivativeCache,
+    **options,
+) -> CachingImageStorage:
+    if isinstance(storage, BlobStorage):
+        return CachingBlobStorage(storage, disk_cache, **options)
+    return CachingImageStorage(storage, disk_cache, **options)
+
+
+def _get_image_key(file_metadata: ImageFile) -> str:
+    version = file_metadata.content_hash
+    if version is None and file_metadata.uploaded_at is not None:
+        version = int(file_metadata.uploaded_at.timestamp())
+    return f"{file_metadata.image_id}-{version}"
+
+
+def _get_variant_prefix(variant: ImageVariant) -> str:
+    return f"{variant.image_id}-{variant.dimension}.{variant.format}-"
+
+
+async def _read_and_close(cached_file: AsyncBufferedReader) -> bytes:
+    try:
+        return await cached_file.read()
+    finally:
+        await cached_file.close()
+
+
+def _returning(content: bytes) -> Callable[[], Awaitable[bytes]]:
+    async def read() -> bytes:
+        return content
+
+    return read
+
+
+def _content_response(
+    content: bytes,
+    media_type: str,
+    byte_range: ByteRange | None,
+    filename: str | None,
+) -> Response:
+    if byte_range is not None:
+        return Response(
+            content[byte_range.start : byte_range.end + 1],
+            status_code=status.HTTP_206_PARTIAL_CONTENT,
+            media_type=media_type,
+            headers={
+                "Content-Range": (
+                    f"bytes {byte_range.start}-{byte_range.end}/{len(content)}"
+                ),
+            },
+        )
+    headers = {}
+    if filename is not None:
+        headers["Content-Disposition"] = content_disposition(filename)
+    return Response(content, media_type=media_type, headers=headers)
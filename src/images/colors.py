@@ -0,0 +1,105 @@
+import math
+from itertools import product
+from typing import NamedTuple
+
+import numpy as np
+from pydantic_extra_types.color import Color
+
+LAB_BUCKET_SIZE = 10.0
+_LAB_MINIMUM = (0.0, -128.0, -128.0)
+_BUCKETS_PER_AXIS = 32
+_WHITE_POINT = (0.95047, 1.0, 1.08883)
+_EPSILON = 216 / 24389
+_KAPPA = 24389 / 27
+
+
+class LabColor(NamedTuple):
+    lightness: float
+    a: float
+    b: float
+
+
+_RGB_TO_XYZ = np.array(
+    [
+        [0.4124564, 0.3575761, 0.1804375],
+        [0.2126729, 0.7151522, 0.0721750],
+        [0.0193339, 0.1191920, 0.9503041],
+    ]
+)
+
+
+def rgb_array_to_lab(rgb: np.ndarray) -> np.ndarray:
+    values = np.asarray(rgb, dtype=np.float64) / 255
+    linear = np.where(
+        values <= 0.04045, values / 12.92, ((values + 0.055) / 1.055) ** 2.4
+    )
+    xyz = linear @ _RGB_TO_XYZ.T / _WHITE_POINT
+    f = np.where(xyz > _EPSILON, np.cbrt(xyz), (_KAPPA * xyz + 16) / 116)
+    return np.stack(
+        [
+            116 * f[..., 1] - 16,
+            500 * (f[..., 0] - f[..., 1]),
+            200 * (f[..., 1] - f[..., 2]),
+        ],
+        axis=-1,
+    )
+
+
+def rgb_to_lab(red: int, green: int, blue: int) -> LabColor:
+    return LabColor(*(float(value) for value in rgb_array_to_lab([red, green, blue])))
+
+
+def color_to_lab(color: str | Color) -> LabColor:
+    if not isinstance(color, Color):
+        color = Color(color)
+    return rgb_to_lab(*color.as_rgb_tuple(alpha=False))
+
+
+def delta_e(first: LabColor, second: LabColor) -> float:
+    return math.dist(first, second)
+
+
+def _get_bucket_index(value: float, minimum: float) -> int:
+    index = math.floor((value - minimum) / LAB_BUCKET_SIZE)
+    return min(max(index, 0), _BUCKETS_PER_AXIS - 1)
+
+
+def _pack_bucket(indices: tuple[int, ...]) -> int:
+    bucket = 0
+    for index in indices:
+        bucket = bucket * _BUCKETS_PER_AXIS + index
+    return bucket
+
+
+def get_color_bucket(lab: LabColor) -> int:
+    return _pack_bucket(
+        tuple(_get_bucket_index(value, low) for value, low in zip(lab, _LAB_MINIMUM))
+    )
+
+
+def _distance_to_bucket(value: float, minimum: float, index: int) -> float:
+    low = minimum + index * LAB_BUCKET_SIZE
+    high = low + LAB_BUCKET_SIZE
+    if index == 0:
+        low = -math.inf
+    if index == _BUCKETS_PER_AXIS - 1:
+        high = math.inf
+    return max(low - value, 0.0, value - high)
+
+
+def get_neighbouring_buckets(lab: LabColor, tolerance: float) -> list[int]:
+    axes = [
+        [
+            (index, _distance_to_bucket(value, low, index))
+            for index in range(
+                _get_bucket_index(value - tolerance, low),
+                _get_bucket_index(value + tolerance, low) + 1,
+            )
+        ]
+        for value, low in zip(lab, _LAB_MINIMUM)
+    ]
+    return [
+        _pack_bucket(tuple(index for index, _ in cell))
+        for cell in product(*axes)
+        if sum(distance**2 for _, distance in cell) <= tolerance**2
+    ]
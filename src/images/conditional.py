@@ -0,0 +1,117 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import NamedTuple
+
+from pydantic import BaseModel
+
+from .exceptions import RangeNotSatisfiable
+
+
+class ByteRange(NamedTuple):
+    start: int
+    end: int
+
+    @property
+    def length(self) -> int:
+        return self.end - self.start + 1
+
+
+class RequestConditions(BaseModel):
+    if_none_match: str | None = None
+    if_modified_since: str | None = None
+    range: str | None = None
+    if_range: str | None = None
+
+
+def make_etag(*parts: object) -> str:
+    return '"{}"'.format("-".join(str(part) for part in parts))
+
+
+def format_http_date(value: datetime) -> str:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc), usegmt=True)
+
+
+def parse_http_date(value: str) -> datetime | None:
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+def _strip_weak(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def _is_modified_since(last_modified: datetime, if_modified_since: str) -> bool:
+    since = parse_http_date(if_modified_since)
+    if since is None:
+        return True
+    if last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) > since
+
+
+def is_not_modified(
+    conditions: RequestConditions,
+    etag: str | None,
+    last_modified: datetime | None,
+) -> bool:
+    if conditions.if_none_match is not None:
+        if etag is None:
+            return False
+        if conditions.if_none_match.strip() == "*":
+            return True
+        return _strip_weak(etag) in (
+            _strip_weak(candidate.strip())
+            for candidate in conditions.if_none_match.split(",")
+        )
+    if conditions.if_modified_since is not None and last_modified is not None:
+        return not _is_modified_since(last_modified, conditions.if_modified_since)
+    return False
+
+
+def parse_range(range_header: str, size: int) -> ByteRange | None:
+    unit, _, ranges = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in ranges:
+        return None
+    first, separator, last = ranges.strip().partition("-")
+    if not separator:
+        return None
+    try:
+        if not first:
+            suffix_length = int(last)
+            if suffix_length <= 0 or size == 0:
+                raise RangeNotSatisfiable(size)
+            return ByteRange(max(size - suffix_length, 0), size - 1)
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(size)
+    if start > end:
+        return None
+    return ByteRange(start, min(end, size - 1))
+
+
+def get_byte_range(
+    conditions: RequestConditions,
+    size: int,
+    etag: str | None,
+    last_modified: datetime | None,
+) -> ByteRange | None:
+    if conditions.range is None:
+        return None
+    if conditions.if_range is not None:
+        if_range = conditions.if_range.strip()
+        if if_range.startswith('"') or if_range.startswith("W/"):
+            if etag is None or if_range.startswith("W/") or if_range != etag:
+                return None
+        elif last_modified is None or _is_modified_since(last_modified, if_range):
+            return None
+    return parse_range(conditions.range, size)
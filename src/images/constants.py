@@ -7,3 +7,17 @@ ALLOWED_IMAGE_MIME_TYPES = [
     "image/png",
     "image/webp",
 ]
+
+IMAGE_MIME_TYPE_ALIASES = {"image/jpg": "image/jpeg"}
+
+MAX_TRANSFORM_DIMENSION = 4096
+
+MAX_COLOR_TOLERANCE = 25
+
+MAX_DUPLICATE_DISTANCE = 16
+
+VARIANT_CONTENT_TYPES = {
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "webp": "image/webp",
+}
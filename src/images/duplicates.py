@@ -0,0 +1,188 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import cache
+from itertools import combinations
+from typing import NamedTuple
+from uuid import UUID
+
+from sqlmodel import select
+
+from ..db.service import Database
+from .hashing import HASH_BITS, hamming_distance
+from .models import ImageFile
+
+_CHUNK_COUNT = 4
+_CHUNK_BITS = HASH_BITS // _CHUNK_COUNT
+_CHUNK_MASK = (1 << _CHUNK_BITS) - 1
+_SYNC_OVERLAP = timedelta(minutes=1)
+
+
+class ImageHashes(NamedTuple):
+    phash: int
+    dhash: int
+
+
+class DuplicateMatch(NamedTuple):
+    image_id: UUID
+    distance: int
+    dhash_distance: int
+
+
+@cache
+def _flip_masks(radius: int) -> tuple[int, ...]:
+    return tuple(
+        sum(1 << bit for bit in bits)
+        for flipped in range(radius + 1)
+        for bits in combinations(range(_CHUNK_BITS), flipped)
+    )
+
+
+def _get_chunks(value: int) -> list[int]:
+    return [
+        value >> (chunk * _CHUNK_BITS) & _CHUNK_MASK for chunk in range(_CHUNK_COUNT)
+    ]
+
+
+class HammingIndex:
+    def __init__(self) -> None:
+        self._hashes: dict[UUID, ImageHashes] = {}
+        self._tables: list[dict[int, set[UUID]]] = [{} for _ in range(_CHUNK_COUNT)]
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def image_ids(self) -> set[UUID]:
+        return set(self._hashes)
+
+    def add(self, image_id: UUID, hashes: ImageHashes) -> None:
+        self.remove(image_id)
+        self._hashes[image_id] = hashes
+        for table, chunk in zip(self._tables, _get_chunks(hashes.phash)):
+            table.setdefault(chunk, set()).add(image_id)
+
+    def remove(self, image_id: UUID) -> None:
+        hashes = self._hashes.pop(image_id, None)
+        if hashes is None:
+            return
+        for table, chunk in zip(self._tables, _get_chunks(hashes.phash)):
+            bucket = table[chunk]
+            bucket.discard(image_id)
+            if not bucket:
+                del table[chunk]
+
+    def search(self, hashes: ImageHashes, max_distance: int) -> list[DuplicateMatch]:
+        masks = _flip_masks(max_distance // _CHUNK_COUNT)
+        candidates = set()
+        for table, chunk in zip(self._tables, _get_chunks(hashes.phash)):
+            for mask in masks:
+                candidates.update(table.get(chunk ^ mask, ()))
+        matches = []
+        for image_id in candidates:
+            candidate = self._hashes[image_id]
+            distance = hamming_distance(hashes.phash, candidate.phash)
+            if distance <= max_distance:
+                dhash_distance = hamming_distance(hashes.dhash, candidate.dhash)
+                matches.append(DuplicateMatch(image_id, distance, dhash_distance))
+        matches.sort(key=lambda match: (match.distance, match.dhash_distance))
+        return matches
+
+
+class DuplicateIndex:
+    def __init__(
+        self,
+        database: Database,
+        refresh_interval: float,
+        reconcile_interval: float,
+        batch_size: int = 10_000,
+    ) -> None:
+        self._database = database
+        self._refresh_interval = refresh_interval
+        self._reconcile_interval = reconcile_interval
+        self._batch_size = batch_size
+        self._index = HammingIndex()
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._synced_until: datetime | None = None
+        self._refreshed_at: float | None = None
+        self._reconciled_at: float | None = None
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def refresh(self, force: bool = False) -> None:
+        with self._refresh_lock:
+            now = time.monotonic()
+            if (
+                not force
+                and self._refreshed_at is not None
+                and now - self._refreshed_at < self._refresh_interval
+            ):
+                return
+            if (
+                force
+                or self._reconciled_at is None
+                or now - self._reconciled_at >= self._reconcile_interval
+            ):
+                self._reconcile()
+                self._reconciled_at = now
+            self._sync()
+            self._refreshed_at = now
+
+    def _sync(self) -> None:
+        query = (
+            select(
+                ImageFile.image_id,
+                ImageFile.phash,
+                ImageFile.dhash,
+                ImageFile.analyzed_at,
+            )
+            .where(ImageFile.phash.is_not(None), ImageFile.dhash.is_not(None))
+            .order_by(ImageFile.analyzed_at)
+            .execution_options(yield_per=self._batch_size)
+        )
+        if self._synced_until is not None:
+            query = query.where(
+                ImageFile.analyzed_at >= self._synced_until - _SYNC_OVERLAP
+            )
+        with self._database.session() as session:
+            for image_id, phash, dhash, analyzed_at in session.exec(query):
+                self.add(image_id, ImageHashes(phash, dhash))
+                self._synced_until = analyzed_at
+
+    def _reconcile(self) -> None:
+        with self._lock:
+            indexed_ids = self._index.image_ids()
+        if not indexed_ids:
+            return
+        query = (
+            select(ImageFile.image_id)
+            .where(ImageFile.phash.is_not(None), ImageFile.dhash.is_not(None))
+            .execution_options(yield_per=self._batch_size)
+        )
+        with self._database.session() as session:
+            image_ids = set(session.exec(query))
+        with self._lock:
+            for image_id in indexed_ids - image_ids:
+                self._index.remove(image_id)
+
+    def add(self, image_id: UUID, hashes: ImageHashes) -> None:
+        with self._lock:
+            self._index.add(image_id, hashes)
+
+    def remove(self, image_id: UUID) -> None:
+        with self._lock:
+            self._index.remove(image_id)
+
+    def find(
+        self,
+        image_id: UUID,
+        hashes: ImageHashes,
+        max_distance: int,
+    ) -> list[DuplicateMatch]:
+        with self._lock:
+            return [
+                match
+                for match in self._index.search(hashes, max_distance)
+                if match.image_id != image_id
+            ]
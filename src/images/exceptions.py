@@ -3,3 +3,24 @@ from ..exceptions import NotFound
 
 class ImageNotFound(NotFound):
     pass
+
+
+class AnalysisQueueFull(Exception):
+    def __init__(self, message: str = "Image analysis queue is full", *args) -> None:
+        super().__init__(message, *args)
+
+
+class InvalidImage(Exception):
+    def __init__(self, message: str = "Invalid or corrupt image file", *args) -> None:
+        super().__init__(message, *args)
+
+
+class RangeNotSatisfiable(Exception):
+    def __init__(
+        self,
+        size: int,
+        message: str = "Requested range not satisfiable",
+        *args,
+    ) -> None:
+        super().__init__(message, *args)
+        self.size = size
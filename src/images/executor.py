@@ -0,0 +1,86 @@
+import asyncio
+import multiprocessing
+import signal
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterator, ParamSpec, TypeVar
+
+from .exceptions import AnalysisQueueFull
+
+T = TypeVar("T")
+P = ParamSpec("P")
+
+
+class AnalysisExecutor:
+    def __init__(
+        self,
+        max_workers: int,
+        max_pending: int,
+        submit_timeout: float,
+    ) -> None:
+        self._max_workers = max_workers
+        self._pool = self._create_pool()
+        self._pool_lock = threading.Lock()
+        self._slots = asyncio.Semaphore(max_workers + max_pending)
+        self._submit_timeout = submit_timeout
+
+    async def submit(
+        self,
+        func: Callable[P, T],
+        *args: P.args,
+        **kwargs: P.kwargs,
+    ) -> asyncio.Future[T]:
+        try:
+            async with asyncio.timeout(self._submit_timeout):
+                await self._slots.acquire()
+        except TimeoutError as exc:
+            raise AnalysisQueueFull() from exc
+        try:
+            future = asyncio.wrap_future(self._submit(func, *args, **kwargs))
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self) -> None:
+        with self._pool_lock:
+            self._pool.shutdown(cancel_futures=True)
+
+    def _create_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            self._max_workers,
+            mp_context=multiprocessing.get_context("forkserver"),
+            initializer=signal.signal,
+            initargs=(signal.SIGINT, signal.SIG_IGN),
+        )
+
+    def _submit(
+        self,
+        func: Callable[P, T],
+        *args: P.args,
+        **kwargs: P.kwargs,
+    ) -> Future[T]:
+        pool = self._pool
+        try:
+            return pool.submit(func, *args, **kwargs)
+        except BrokenProcessPool:
+            return self._replace_pool(pool).submit(func, *args, **kwargs)
+
+    def _replace_pool(self, broken_pool: ProcessPoolExecutor) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is broken_pool:
+                self._pool = self._create_pool()
+                broken_pool.shutdown(wait=False, cancel_futures=True)
+            return self._pool
+
+
+def init_analysis_executor(
+    max_workers: int,
+    max_pending: int,
+    submit_timeout: float,
+) -> Iterator[AnalysisExecutor]:
+    executor = AnalysisExecutor(max_workers, max_pending, submit_timeout)
+    yield executor
+    executor.shutdown()
@@ -1,8 +1,10 @@
 from datetime import datetime
 
 from fastapi_filter.contrib.sqlalchemy import Filter
+from sqlalchemy import Select
 
 from .models import Image
+from .search import get_search_terms, match_images, rank_images
 
 
 class ImageFilter(Filter):
@@ -10,7 +12,24 @@ class ImageFilter(Filter):
     owner_id: int | None = None
     created_at__gte: datetime | None = None
     created_at__lte: datetime | None = None
+    search: str | None = None
 
     class Constants(Filter.Constants):
         model = Image
-        search_model_fields = ["title", "description"]
+
+    @property
+    def filtering_fields(self):
+        return [
+            (field_name, value)
+            for field_name, value in super().filtering_fields
+            if field_name != self.Constants.search_field_name
+        ]
+
+    def filter(self, query: Select) -> Select:
+        query = super().filter(query)
+        if self.search is None or not get_search_terms(self.search):
+            return query
+        query = query.where(match_images(self.search))
+        if self.order_by is None:
+            query = query.order_by(rank_images(self.search).desc())
+        return query
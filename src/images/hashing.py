@@ -0,0 +1,43 @@
+from functools import cache
+
+import numpy as np
+from PIL import Image as PILImage
+
+HASH_BITS = 64
+_HASH_MASK = (1 << HASH_BITS) - 1
+_HASH_SIZE = 8
+_DCT_SIZE = 32
+
+
+@cache
+def _dct_matrix(size: int) -> np.ndarray:
+    samples = np.arange(size)
+    matrix = np.cos(np.pi * (2 * samples[None, :] + 1) * samples[:, None] / (2 * size))
+    matrix[0] /= np.sqrt(2)
+    return matrix * np.sqrt(2 / size)
+
+
+def _pack_bits(bits: np.ndarray) -> int:
+    value = int.from_bytes(np.packbits(bits.flatten()).tobytes(), "big")
+    return value - (1 << HASH_BITS) if value >> (HASH_BITS - 1) else value
+
+
+def _grayscale(image: PILImage.Image, size: tuple[int, int]) -> np.ndarray:
+    resized = image.convert("L").resize(size, PILImage.Resampling.LANCZOS)
+    return np.asarray(resized, dtype=np.float64)
+
+
+def perceptual_hash(image: PILImage.Image) -> int:
+    pixels = _grayscale(image, (_DCT_SIZE, _DCT_SIZE))
+    dct = _dct_matrix(_DCT_SIZE)
+    coefficients = (dct @ pixels @ dct.T)[:_HASH_SIZE, :_HASH_SIZE]
+    return _pack_bits(coefficients > np.median(coefficients))
+
+
+def difference_hash(image: PILImage.Image) -> int:
+    pixels = _grayscale(image, (_HASH_SIZE + 1, _HASH_SIZE))
+    return _pack_bits(pixels[:, 1:] > pixels[:, :-1])
+
+
+def hamming_distance(first: int, second: int) -> int:
+    return ((first ^ second) & _HASH_MASK).bit_count()
@@ -0,0 +1,166 @@
+from datetime import datetime, timedelta
+from typing import NamedTuple
+from uuid import UUID
+
+from sqlmodel import Session, and_, or_, select
+
+from .analysis import ImageAnalysis
+from .models import (
+    ImageFile,
+    ImagePaletteColor,
+    ImageVariant,
+    ProcessingJob,
+    ProcessingState,
+)
+
+
+class ClaimedJob(NamedTuple):
+    file: ImageFile
+    attempts: int
+    locked_until: datetime
+
+
+class ProcessingQueue:
+    def __init__(self, session: Session) -> None:
+        self._session = session
+
+    def enqueue(self, image_id: str | UUID) -> ProcessingJob:
+        return self._session.merge(ProcessingJob(image_id=image_id))
+
+    def claim(
+        self,
+        limit: int,
+        lease: timedelta,
+        max_attempts: int,
+    ) -> list[ClaimedJob]:
+        now = datetime.utcnow()
+        jobs = self._session.exec(
+            select(ProcessingJob)
+            .where(
+                or_(
+                    and_(
+                        ProcessingJob.state == ProcessingState.PENDING,
+                        ProcessingJob.run_after <= now,
+                    ),
+                    and_(
+                        ProcessingJob.state == ProcessingState.PROCESSING,
+                        ProcessingJob.locked_until < now,
+                    ),
+                )
+            )
+            .order_by(ProcessingJob.run_after)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ).all()
+        claimed_jobs = []
+        for job in jobs:
+            if job.attempts >= max_attempts:
+                self._mark_failed(job, "Processing lease expired")
+            else:
+                claimed_jobs.append(self._start(job, now + lease))
+        self._session.commit()
+        return claimed_jobs
+
+    def claim_image(self, image_id: str | UUID, lease: timedelta) -> ClaimedJob | None:
+        job = self._session.exec(
+            select(ProcessingJob)
+            .where(
+                ProcessingJob.image_id == image_id,
+                ProcessingJob.state == ProcessingState.PENDING,
+            )
+            .with_for_update(skip_locked=True)
+        ).first()
+        if job is None:
+            return None
+        claimed_job = self._start(job, datetime.utcnow() + lease)
+        self._session.commit()
+        return claimed_job
+
+    def complete(
+        self,
+        claimed_job: ClaimedJob,
+        analysis: ImageAnalysis,
+        variants: list[ImageVariant],
+    ) -> bool:
+        job = self._get_claimed(claimed_job)
+        if job is None:
+            return False
+        file_metadata = job.file
+        file_metadata.width = analysis.width
+        file_metadata.height = analysis.height
+        file_metadata.dominant_color = analysis.dominant_color
+        file_metadata.average_color = analysis.average_color
+        file_metadata.phash = analysis.phash
+        file_metadata.dhash = analysis.dhash
+        file_metadata.embedding = analysis.embedding
+        file_metadata.analyzed_at = datetime.utcnow()
+        file_metadata.palette.clear()
+        for color in analysis.palette:
+            file_metadata.palette.append(ImagePaletteColor.from_color(color))
+        file_metadata.variants = variants
+        file_metadata.processing_state = ProcessingState.DONE
+        file_metadata.processing_job = None
+        self._session.add(file_metadata)
+        self._session.commit()
+        return True
+
+    def fail(
+        self,
+        claimed_job: ClaimedJob,
+        error: str,
+        max_attempts: int,
+        retry_delay: timedelta,
+    ) -> None:
+        job = self._get_claimed(claimed_job)
+        if job is None:
+            return
+        if job.attempts >= max_attempts:
+            self._mark_failed(job, error)
+        else:
+            job.state = ProcessingState.PENDING
+            job.run_after = datetime.utcnow() + retry_delay * 2 ** (job.attempts - 1)
+            job.locked_until = None
+            job.last_error = error
+            self._session.add(job)
+        self._session.commit()
+
+    def release(self, claimed_job: ClaimedJob, retry_delay: timedelta) -> None:
+        job = self._get_claimed(claimed_job)
+        if job is None:
+            return
+        job.state = ProcessingState.PENDING
+        job.attempts -= 1
+        job.run_after = datetime.utcnow() + retry_delay
+        job.locked_until = None
+        self._session.add(job)
+        self._session.commit()
+
+    def _start(self, job: ProcessingJob, locked_until: datetime) -> ClaimedJob:
+        job.state = ProcessingState.PROCESSING
+        job.attempts += 1
+        job.locked_until = locked_until
+        job.file.processing_state = ProcessingState.PROCESSING
+        self._session.add(job)
+        return ClaimedJob(
+            file=ImageFile(**job.file.model_dump()),
+            attempts=job.attempts,
+            locked_until=locked_until,
+        )
+
+    def _mark_failed(self, job: ProcessingJob, error: str) -> None:
+        job.state = ProcessingState.FAILED
+        job.locked_until = None
+        job.last_error = error
+        job.file.processing_state = ProcessingState.FAILED
+        self._session.add(job)
+
+    def _get_claimed(self, claimed_job: ClaimedJob) -> ProcessingJob | None:
+        return self._session.exec(
+            select(ProcessingJob)
+            .where(
+                ProcessingJob.image_id == claimed_job.file.image_id,
+                ProcessingJob.state == ProcessingState.PROCESSING,
+                ProcessingJob.locked_until == claimed_job.locked_until,
+            )
+            .with_for_update()
+        ).first()
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import os
+from uuid import UUID, uuid4
+
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from sqlmodel import select
+
+from ..db.service import Database
+from .models import ImageFile
+from .storage import LocalImageStorage
+
+logger = logging.getLogger(__name__)
+
+
+class LayoutMigrationCheckpoint(BaseModel):
+    last_image_id: UUID | None = None
+    scanned: int = 0
+    migrated: int = 0
+
+
+class LayoutMigration:
+    def __init__(
+        self,
+        database: Database,
+        storage: LocalImageStorage,
+        checkpoint_path: str,
+        batch_size: int = 500,
+        concurrency: int = 8,
+    ) -> None:
+        self._database = database
+        self._storage = storage
+        self._checkpoint_path = checkpoint_path
+        self._batch_size = batch_size
+        self._concurrency = concurrency
+
+    async def run(self) -> LayoutMigrationCheckpoint:
+        checkpoint = await run_in_threadpool(self._load_checkpoint)
+        semaphore = asyncio.Semaphore(self._concurrency)
+        while True:
+            image_ids = await run_in_threadpool(
+                self._get_batch, checkpoint.last_image_id
+            )
+            if not image_ids:
+                break
+            results = await asyncio.gather(
+                *(self._migrate_image(semaphore, image_id) for image_id in image_ids)
+            )
+            checkpoint.last_image_id = image_ids[-1]
+            checkpoint.scanned += len(image_ids)
+            checkpoint.migrated += sum(results)
+            await run_in_threadpool(self._save_checkpoint, checkpoint)
+            logger.info(
+                "Scanned %d images, migrated %d",
+                checkpoint.scanned,
+                checkpoint.migrated,
+            )
+        return checkpoint
+
+    async def _migrate_image(
+        self,
+        semaphore: asyncio.Semaphore,
+        image_id: UUID,
+    ) -> bool:
+        async with semaphore:
+            return await run_in_threadpool(self._storage.migrate_image, image_id)
+
+    def _get_batch(self, last_image_id: UUID | None) -> list[UUID]:
+        query = select(ImageFile.image_id).order_by(ImageFile.image_id)
+        if last_image_id is not None:
+            query = query.where(ImageFile.image_id > last_image_id)
+        with self._database.session() as session:
+            return list(session.exec(query.limit(self._batch_size)))
+
+    def _load_checkpoint(self) -> LayoutMigrationCheckpoint:
+        try:
+            with open(self._checkpoint_path, "rb") as checkpoint_file:
+                return LayoutMigrationCheckpoint.model_validate_json(
+                    checkpoint_file.read()
+                )
+        except FileNotFoundError:
+            return LayoutMigrationCheckpoint()
+
+    def _save_checkpoint(self, checkpoint: LayoutMigrationCheckpoint) -> None:
+        temp_path = f"{self._checkpoint_path}.{uuid4().hex}"
+        with open(temp_path, "w") as checkpoint_file:
+            checkpoint_file.write(checkpoint.model_dump_json())
+        os.replace(temp_path, self._checkpoint_path)
@@ -1,26 +1,58 @@
 from datetime import datetime
-from typing import Annotated, Optional
+from enum import StrEnum, auto
+from typing import Annotated, Optional, Self
 from uuid import UUID, uuid4
 
 from pydantic import AfterValidator
 from pydantic_extra_types.color import Color
-from sqlmodel import Field, Relationship, SQLModel, text
+from sqlalchemy.dialects import sqlite
+from sqlmodel import (
+    BigInteger,
+    DateTime,
+    Enum,
+    Field,
+    Index,
+    LargeBinary,
+    Relationship,
+    SQLModel,
+    text,
+)
 
 from ..users.models import User, UserImageLikes
+from .colors import color_to_lab, get_color_bucket
 
 ColorField = Annotated[str, AfterValidator(lambda color: Color(color).as_hex())]
 
 
+class ProcessingState(StrEnum):
+    PENDING = auto()
+    PROCESSING = auto()
+    DONE = auto()
+    FAILED = auto()
+
+
 class Image(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_image_created_at_id", "created_at", "id"),
+        Index("ix_image_owner_id_created_at_id", "owner_id", "created_at", "id"),
+        Index("ix_image_title_id", "title", "id"),
+        Index("ix_image_like_count_id", "like_count", "id"),
+    )
+
     id: UUID | None = Field(default_factory=uuid4, primary_key=True)
     owner_id: int | None = Field(foreign_key="user.id")
     title: str
     description: str | None = Field(default=None)
     created_at: datetime = Field(
+        sa_type=DateTime().with_variant(
+            sqlite.DATETIME(truncate_microseconds=True), "sqlite"
+        ),
         sa_column_kwargs={
             "server_default": text("CURRENT_TIMESTAMP"),
-        }
+        },
     )
+    like_count: int = Field(default=0, sa_column_kwargs={"server_default": "0"})
+    likes_updated_at: datetime | None = Field(default=None, index=True)
 
     owner: Optional[User] = Relationship(back_populates="own_images")
     liked_by: list[User] = Relationship(
@@ -33,6 +65,28 @@ class Image(SQLModel, table=True):
             "cascade": "all,delete,delete-orphan",
         },
     )
+    trending: Optional["TrendingImage"] = Relationship(
+        back_populates="image",
+        sa_relationship_kwargs={
+            "uselist": False,
+            "cascade": "all,delete,delete-orphan",
+        },
+    )
+
+
+class TrendingImage(SQLModel, table=True):
+    __table_args__ = (Index("ix_trendingimage_score_image_id", "score", "image_id"),)
+
+    image_id: UUID | None = Field(
+        default=None,
+        primary_key=True,
+        foreign_key="image.id",
+    )
+    score: float
+    like_count: int
+    likes_updated_at: datetime = Field(index=True)
+
+    image: Image | None = Relationship(back_populates="trending")
 
 
 class ImageFile(SQLModel, table=True):
@@ -44,24 +98,111 @@ class ImageFile(SQLModel, table=True):
     filename: str
     content_type: str
     size: int
+    content_hash: str | None = None
+    uploaded_at: datetime | None = Field(default_factory=datetime.utcnow)
     width: int | None = Field(default=None)
     height: int | None = Field(default=None)
     dominant_color: str | None = None
     average_color: str | None = None
+    phash: int | None = Field(default=None, sa_type=BigInteger)
+    dhash: int | None = Field(default=None, sa_type=BigInteger)
+    embedding: bytes | None = Field(default=None, sa_type=LargeBinary)
+    analyzed_at: datetime | None = Field(default=None, index=True)
+    processing_state: ProcessingState = Field(
+        sa_column=Enum(ProcessingState),
+        default=ProcessingState.PENDING,
+    )
 
     image: Image | None = Relationship(back_populates="file")
     palette: list["ImagePaletteColor"] = Relationship(
         back_populates="file",
         sa_relationship_kwargs={"cascade": "all,delete,delete-orphan"},
     )
+    variants: list["ImageVariant"] = Relationship(
+        back_populates="file",
+        sa_relationship_kwargs={"cascade": "all,delete,delete-orphan"},
+    )
+    processing_job: Optional["ProcessingJob"] = Relationship(
+        back_populates="file",
+        sa_relationship_kwargs={
+            "uselist": False,
+            "cascade": "all,delete,delete-orphan",
+        },
+    )
 
 
 class ImagePaletteColor(SQLModel, table=True):
+    __table_args__ = (
+        Index(
+            "ix_imagepalettecolor_lab_bucket",
+            "lab_bucket",
+            "lab_l",
+            "lab_a",
+            "lab_b",
+            "image_id",
+        ),
+    )
+
     image_id: UUID | None = Field(
         default=None,
         primary_key=True,
         foreign_key="imagefile.image_id",
     )
     color: str = Field(primary_key=True)
+    lab_l: float | None = None
+    lab_a: float | None = None
+    lab_b: float | None = None
+    lab_bucket: int | None = None
 
     file: ImageFile | None = Relationship(back_populates="palette")
+
+    @classmethod
+    def from_color(cls, color: str) -> Self:
+        lab = color_to_lab(color)
+        return cls(
+            color=color,
+            lab_l=lab.lightness,
+            lab_a=lab.a,
+            lab_b=lab.b,
+            lab_bucket=get_color_bucket(lab),
+        )
+
+
+class ImageVariant(SQLModel, table=True):
+    image_id: UUID | None = Field(
+        default=None,
+        primary_key=True,
+        foreign_key="imagefile.image_id",
+    )
+    dimension: int = Field(primary_key=True)
+    format: str = Field(primary_key=True)
+    content_type: str
+    size: int
+    width: int
+    height: int
+
+    file: ImageFile | None = Relationship(back_populates="variants")
+
+
+class ProcessingJob(SQLModel, table=True):
+    image_id: UUID | None = Field(
+        default=None,
+        primary_key=True,
+        foreign_key="imagefile.image_id",
+    )
+    state: ProcessingState = Field(
+        sa_column=Enum(ProcessingState),
+        default=ProcessingState.PENDING,
+    )
+    attempts: int = 0
+    run_after: datetime = Field(default_factory=datetime.utcnow, index=True)
+    locked_until: datetime | None = None
+    last_error: str | None = None
+
+    file: ImageFile | None = Relationship(back_populates="processing_job")
+
+
+class ImageBlob(SQLModel, table=True):
+    content_hash: str = Field(primary_key=True)
+    size: int
+    ref_count: int = 0
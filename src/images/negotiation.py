@@ -0,0 +1,37 @@
+from typing import Sequence
+
+
+def parse_accept(accept: str) -> dict[str, float]:
+    media_ranges = {}
+    for item in accept.split(","):
+        media_range, *params = (part.strip() for part in item.split(";"))
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media_range:
+            media_ranges[media_range.lower()] = quality
+    return media_ranges
+
+
+def choose_content_type(accept: str | None, available: Sequence[str]) -> str | None:
+    if not accept:
+        return next(iter(available), None)
+    media_ranges = parse_accept(accept)
+    chosen_content_type, best_score = None, (0.0, 0)
+    for content_type in available:
+        main_type = content_type.split("/")[0]
+        candidates = (content_type, f"{main_type}/*", "*/*")
+        for specificity, media_range in zip((3, 2, 1), candidates):
+            if media_range in media_ranges:
+                score = (media_ranges[media_range], specificity)
+                break
+        else:
+            continue
+        if score[0] > 0 and score > best_score:
+            chosen_content_type, best_score = content_type, score
+    return chosen_content_type
@@ -0,0 +1,545 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+from datetime import datetime, timezone
+from itertools import chain
+from typing import AsyncIterator, Generator, Iterable, NamedTuple
+from urllib.parse import quote
+from uuid import UUID
+from xml.etree import ElementTree
+
+import httpx
+from fastapi import Response, UploadFile, status
+from fastapi.responses import StreamingResponse
+from pydantic import AnyUrl
+from starlette.types import Receive, Scope, Send
+
+from .conditional import ByteRange
+from .exceptions import ImageNotFound
+from .models import ImageFile, ImageVariant
+from .storage import ImageStorage, StoredFile, content_disposition, is_image_name
+from .upload import stream_upload
+
+_S3_NAMESPACE = "{http://s3.amazonaws.com/doc/2006-03-01/}"
+_UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+_VARIANTS_PREFIX = "variants"
+
+
+def _uri_encode(value: str, safe: str = "-_.~") -> str:
+    return quote(value, safe=safe)
+
+
+def _find_text(element: ElementTree.Element, tag: str) -> str | None:
+    found = element.find(f"{_S3_NAMESPACE}{tag}")
+    if found is None:
+        found = element.find(tag)
+    return None if found is None else found.text
+
+
+class ObjectSummary(NamedTuple):
+    key: str
+    size: int
+    last_modified: datetime
+
+
+class S3SignatureAuth(httpx.Auth):
+    def __init__(self, access_key: str, secret_key: str, region: str) -> None:
+        self._access_key = access_key
+        self._secret_key = secret_key
+        self._region = region
+
+    def auth_flow(
+        self,
+        request: httpx.Request,
+    ) -> Generator[httpx.Request, httpx.Response, None]:
+        now = datetime.now(timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        scope = f"{now:%Y%m%d}/{self._region}/s3/aws4_request"
+        request.headers["x-amz-date"] = amz_date
+        request.headers.setdefault("x-amz-content-sha256", _UNSIGNED_PAYLOAD)
+        signed_headers = sorted(
+            name
+            for name in (name.lower() for name in request.headers)
+            if name in ("host", "content-md5", "content-type", "range")
+            or name.startswith("x-amz-")
+        )
+        canonical_headers = "".join(
+            f"{name}:{' '.join(request.headers[name].split())}\n"
+            for name in signed_headers
+        )
+        canonical_query = "&".join(
+            f"{_uri_encode(key)}={_uri_encode(value)}"
+            for key, value in sorted(request.url.params.multi_items())
+        )
+        canonical_request = "\n".join(
+            (
+                request.method,
+                request.url.raw_path.split(b"?")[0].decode(),
+                canonical_query,
+                canonical_headers,
+                ";".join(signed_headers),
+                request.headers["x-amz-content-sha256"],
+            )
+        )
+        string_to_sign = "\n".join(
+            (
+                "AWS4-HMAC-SHA256",
+                amz_date,
+                scope,
+                hashlib.sha256(canonical_request.encode()).hexdigest(),
+            )
+        )
+        signing_key = f"AWS4{self._secret_key}".encode()
+        for part in (f"{now:%Y%m%d}", self._region, "s3", "aws4_request"):
+            signing_key = hmac.new(signing_key, part.encode(), hashlib.sha256).digest()
+        signature = hmac.new(
+            signing_key, string_to_sign.encode(), hashlib.sha256
+        ).hexdigest()
+        request.headers["Authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self._access_key}/{scope}, "
+            f"SignedHeaders={';'.join(signed_headers)}, Signature={signature}"
+        )
+        yield request
+
+
+class S3Client:
+    def __init__(
+        self,
+        endpoint_url: str | AnyUrl | None,
+        region: str,
+        access_key: str | None,
+        secret_key: str | None,
+        max_connections: int,
+    ) -> None:
+        self._endpoint_url = str(endpoint_url).rstrip("/") if endpoint_url else None
+        self._region = region
+        auth = None
+        if access_key and secret_key:
+            auth = S3SignatureAuth(access_key, secret_key, region)
+        self._client = httpx.AsyncClient(
+            auth=auth,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+            ),
+            timeout=httpx.Timeout(30.0, connect=5.0),
+        )
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def put_object(
+        self,
+        bucket: str,
+        key: str,
+        content: bytes,
+        content_type: str | None = None,
+    ) -> None:
+        headers = {"Content-Type": content_type} if content_type else {}
+        response = await self._client.put(
+            self._get_url(bucket, key), content=content, headers=headers
+        )
+        self._raise_for_status(response)
+
+    async def copy_object(self, bucket: str, source_key: str, key: str) -> None:
+        response = await self._client.put(
+            self._get_url(bucket, key),
+            headers={
+                "x-amz-copy-source": _uri_encode(f"/{bucket}/{source_key}", "/-_.~")
+            },
+        )
+        self._raise_for_status(response)
+        self._raise_for_error_body(response)
+
+    async def get_object(self, bucket: str, key: str) -> bytes:
+        response = await self._client.get(self._get_url(bucket, key))
+        self._raise_for_status(response)
+        return response.content
+
+    async def open_object(
+        self,
+        bucket: str,
+        key: str,
+        byte_range: ByteRange | None = None,
+    ) -> httpx.Response:
+        headers = {}
+        if byte_range is not None:
+            headers["Range"] = f"bytes={byte_range.start}-{byte_range.end}"
+        request = self._client.build_request(
+            "GET", self._get_url(bucket, key), headers=headers
+        )
+        response = await self._client.send(request, stream=True)
+        if response.is_error:
+            await response.aread()
+            await response.aclose()
+            self._raise_for_status(response)
+        return response
+
+    async def delete_object(self, bucket: str, key: str) -> None:
+        response = await self._client.delete(self._get_url(bucket, key))
+        if response.status_code != status.HTTP_404_NOT_FOUND:
+            self._raise_for_status(response)
+
+    async def delete_objects(self, bucket: str, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        for start in range(0, len(keys), 1000):
+            root = ElementTree.Element("Delete")
+            ElementTree.SubElement(root, "Quiet").text = "true"
+            for key in keys[start : start + 1000]:
+                ElementTree.SubElement(
+                    ElementTree.SubElement(root, "Object"), "Key"
+                ).text = key
+            body = ElementTree.tostring(root)
+            response = await self._client.post(
+                self._get_url(bucket),
+                params={"delete": ""},
+                content=body,
+                headers={
+                    "Content-MD5": base64.b64encode(
+                        hashlib.md5(body).digest()
+                    ).decode(),
+                    "Content-Type": "application/xml",
+                },
+            )
+            self._raise_for_status(response)
+
+    async def head_object(self, bucket: str, key: str) -> int | None:
+        response = await self._client.head(self._get_url(bucket, key))
+        if response.status_code == status.HTTP_404_NOT_FOUND:
+            return None
+        self._raise_for_status(response)
+        return int(response.headers["Content-Length"])
+
+    async def list_objects(
+        self,
+        bucket: str,
+        prefix: str,
+        start_after: str | None = None,
+        delimiter: str | None = None,
+    ) -> AsyncIterator[ObjectSummary]:
+        params = {"list-type": "2", "prefix": prefix}
+        if start_after is not None:
+            params["start-after"] = start_after
+        if delimiter is not None:
+            params["delimiter"] = delimiter
+        while True:
+            response = await self._client.get(self._get_url(bucket), params=params)
+            self._raise_for_status(response)
+            root = ElementTree.fromstring(response.content)
+            for contents in root.iter(f"{_S3_NAMESPACE}Contents"):
+                yield ObjectSummary(
+                    _find_text(contents, "Key"),
+                    int(_find_text(contents, "Size")),
+                    datetime.fromisoformat(_find_text(contents, "LastModified")),
+                )
+            token = _find_text(root, "NextContinuationToken")
+            if _find_text(root, "IsTruncated") != "true" or not token:
+                return
+            params["continuation-token"] = token
+
+    async def create_multipart_upload(
+        self,
+        bucket: str,
+        key: str,
+        content_type: str | None = None,
+    ) -> str:
+        headers = {"Content-Type": content_type} if content_type else {}
+        response = await self._client.post(
+            self._get_url(bucket, key), params={"uploads": ""}, headers=headers
+        )
+        self._raise_for_status(response)
+        return _find_text(ElementTree.fromstring(response.content), "UploadId")
+
+    async def upload_part(
+        self,
+        bucket: str,
+        key: str,
+        upload_id: str,
+        part_number: int,
+        content: bytes,
+    ) -> str:
+        response = await self._client.put(
+            self._get_url(bucket, key),
+            params={"partNumber": str(part_number), "uploadId": upload_id},
+            content=content,
+        )
+        self._raise_for_status(response)
+        return response.headers["ETag"]
+
+    async def complete_multipart_upload(
+        self,
+        bucket: str,
+        key: str,
+        upload_id: str,
+        parts: list[str],
+    ) -> None:
+        root = ElementTree.Element("CompleteMultipartUpload")
+        for part_number, etag in enumerate(parts, start=1):
+            part = ElementTree.SubElement(root, "Part")
+            ElementTree.SubElement(part, "PartNumber").text = str(part_number)
+            ElementTree.SubElement(part, "ETag").text = etag
+        response = await self._client.post(
+            self._get_url(bucket, key),
+            params={"uploadId": upload_id},
+            content=ElementTree.tostring(root),
+            headers={"Content-Type": "application/xml"},
+        )
+        self._raise_for_status(response)
+        self._raise_for_error_body(response)
+
+    async def abort_multipart_upload(
+        self,
+        bucket: str,
+        key: str,
+        upload_id: str,
+    ) -> None:
+        response = await self._client.delete(
+            self._get_url(bucket, key), params={"uploadId": upload_id}
+        )
+        if response.status_code != status.HTTP_404_NOT_FOUND:
+            self._raise_for_status(response)
+
+    def _get_url(self, bucket: str, key: str = "") -> str:
+        path = _uri_encode(key, "/-_.~")
+        if self._endpoint_url is not None:
+            return f"{self._endpoint_url}/{bucket}/{path}"
+        return f"https://{bucket}.s3.{self._region}.amazonaws.com/{path}"
+
+    def _raise_for_status(self, response: httpx.Response) -> None:
+        if response.status_code == status.HTTP_404_NOT_FOUND:
+            raise ImageNotFound()
+        response.raise_for_status()
+
+    def _raise_for_error_body(self, response: httpx.Response) -> None:
+        if response.content and ElementTree.fromstring(response.content).tag == "Error":
+            raise httpx.HTTPStatusError(
+                response.text, request=response.request, response=response
+            )
+
+
+class _ObjectResponse(StreamingResponse):
+    def __init__(self, object_response: httpx.Response, **kwargs) -> None:
+        super().__init__(_iter_response(object_response), **kwargs)
+        self._object_response = object_response
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self._object_response.aclose()
+
+
+class ObjectImageStorage(ImageStorage):
+    def __init__(
+        self, client: S3Client, location: str | AnyUrl, part_size: int
+    ) -> None:
+        location = AnyUrl(str(location))
+        self._client = client
+        self._bucket = location.host
+        self._prefix = (location.path or "").strip("/")
+        self._part_size = part_size
+
+    async def save_image(self, image_id: str, uploaded_file: UploadFile) -> ImageFile:
+        file_metadata = self.extract_file_metadata(image_id, uploaded_file)
+        key = self._get_image_key(image_id)
+        buffer = bytearray()
+        upload_id = None
+        parts: list[str] = []
+
+        async def write(chunk: bytes) -> None:
+            nonlocal upload_id
+            buffer.extend(chunk)
+            while len(buffer) >= self._part_size:
+                if upload_id is None:
+                    upload_id = await self._client.create_multipart_upload(
+                        self._bucket, key, file_metadata.content_type
+                    )
+                part = bytes(buffer[: self._part_size])
+                del buffer[: self._part_size]
+                parts.append(
+                    await self._client.upload_part(
+                        self._bucket, key, upload_id, len(parts) + 1, part
+                    )
+                )
+
+        try:
+            await stream_upload(uploaded_file, file_metadata, write)
+            if upload_id is None:
+                await self._client.put_object(
+                    self._bucket, key, bytes(buffer), file_metadata.content_type
+                )
+            else:
+                if buffer:
+                    parts.append(
+                        await self._client.upload_part(
+                            self._bucket, key, upload_id, len(parts) + 1, bytes(buffer)
+                        )
+                    )
+                await self._client.complete_multipart_upload(
+                    self._bucket, key, upload_id, parts
+                )
+        except BaseException:
+            if upload_id is not None:
+                await self._client.abort_multipart_upload(self._bucket, key, upload_id)
+            raise
+        return file_metadata
+
+    async def load_image(
+        self,
+        file_metadata: ImageFile,
+        byte_range: ByteRange | None = None,
+    ) -> Response:
+        return await self._stream_object(
+            self._get_image_key(file_metadata.image_id),
+            file_metadata.content_type,
+            byte_range,
+            filename=file_metadata.filename,
+        )
+
+    async def read_image(self, file_metadata: ImageFile) -> bytes:
+        return await self._client.get_object(
+            self._bucket, self._get_image_key(file_metadata.image_id)
+        )
+
+    def iter_image(self, file_metadata: ImageFile) -> AsyncIterator[bytes]:
+        return self._iter_object(self._get_image_key(file_metadata.image_id))
+
+    async def get_image_size(self, file_metadata: ImageFile) -> int | None:
+        return await self._client.head_object(
+            self._bucket, self._get_image_key(file_metadata.image_id)
+        )
+
+    async def list_images(self, after: str | None = None) -> AsyncIterator[StoredFile]:
+        prefix = f"{self._prefix}/" if self._prefix else ""
+        async for summary in self._client.list_objects(
+            self._bucket, prefix, start_after=after, delimiter="/"
+        ):
+            name = summary.key[len(prefix) :]
+            if is_image_name(name):
+                yield StoredFile(summary.key, name, summary.size, summary.last_modified)
+
+    async def delete_image(self, file_metadata: ImageFile) -> None:
+        await self.delete_images([file_metadata])
+
+    async def delete_images(self, files: Iterable[ImageFile]) -> None:
+        image_ids = [file_metadata.image_id for file_metadata in files]
+        variant_keys = await asyncio.gather(
+            *(self._list_variant_keys(image_id) for image_id in image_ids)
+        )
+        await self._client.delete_objects(
+            self._bucket,
+            [
+                *(self._get_image_key(image_id) for image_id in image_ids),
+                *chain.from_iterable(variant_keys),
+            ],
+        )
+
+    async def delete_stored_files(self, stored_files: Iterable[StoredFile]) -> None:
+        await self._client.delete_objects(
+            self._bucket, [stored_file.cursor for stored_file in stored_files]
+        )
+
+    async def save_variant(self, variant: ImageVariant, content: bytes) -> None:
+        await self._client.put_object(
+            self._bucket,
+            self._get_variant_key(variant),
+            content,
+            variant.content_type,
+        )
+
+    async def copy_variant(
+        self,
+        variant: ImageVariant,
+        image_id: str | UUID,
+    ) -> ImageVariant:
+        copied_variant = ImageVariant(
+            **variant.model_dump(exclude={"image_id"}),
+            image_id=image_id,
+        )
+        await self._client.copy_object(
+            self._bucket,
+            self._get_variant_key(variant),
+            self._get_variant_key(copied_variant),
+        )
+        return copied_variant
+
+    async def read_variant(self, variant: ImageVariant) -> bytes:
+        return await self._client.get_object(
+            self._bucket, self._get_variant_key(variant)
+        )
+
+    def iter_variant(self, variant: ImageVariant) -> AsyncIterator[bytes]:
+        return self._iter_object(self._get_variant_key(variant))
+
+    async def load_variant(
+        self,
+        variant: ImageVariant,
+        byte_range: ByteRange | None = None,
+    ) -> Response:
+        return await self._stream_object(
+            self._get_variant_key(variant),
+            variant.content_type,
+            byte_range,
+        )
+
+    async def _list_variant_keys(self, image_id: str | UUID) -> list[str]:
+        return [
+            summary.key
+            async for summary in self._client.list_objects(
+                self._bucket, self._get_variants_prefix(image_id)
+            )
+        ]
+
+    async def _iter_object(self, key: str) -> AsyncIterator[bytes]:
+        object_response = await self._client.open_object(self._bucket, key)
+        async for chunk in _iter_response(object_response):
+            yield chunk
+
+    async def _stream_object(
+        self,
+        key: str,
+        media_type: str,
+        byte_range: ByteRange | None,
+        filename: str | None = None,
+    ) -> Response:
+        object_response = await self._client.open_object(self._bucket, key, byte_range)
+        headers = {"Content-Length": object_response.headers["Content-Length"]}
+        if byte_range is not None:
+            headers["Content-Range"] = object_response.headers["Content-Range"]
+        if filename is not None:
+            headers["Content-Disposition"] = content_disposition(filename)
+        return _ObjectResponse(
+            object_response,
+            status_code=(
+                status.HTTP_200_OK
+                if byte_range is None
+                else status.HTTP_206_PARTIAL_CONTENT
+            ),
+            media_type=media_type,
+            headers=headers,
+        )
+
+    def _get_key(self, *parts: str) -> str:
+        return "/".join(part for part in (self._prefix, *parts) if part)
+
+    def _get_image_key(self, image_id: str | UUID) -> str:
+        return self._get_key(str(image_id))
+
+    def _get_variants_prefix(self, image_id: str | UUID) -> str:
+        return self._get_key(_VARIANTS_PREFIX, str(image_id)) + "/"
+
+    def _get_variant_key(self, variant: ImageVariant) -> str:
+        return self._get_key(
+            _VARIANTS_PREFIX,
+            str(variant.image_id),
+            f"{variant.dimension}.{variant.format}",
+        )
+
+
+async def _iter_response(response: httpx.Response) -> AsyncIterator[bytes]:
+    try:
+        async for chunk in response.aiter_raw():
+            yield chunk
+    finally:
+        await response.aclose()
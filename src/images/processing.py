@@ -0,0 +1,122 @@
+import logging
+from datetime import timedelta
+from uuid import UUID
+
+from fastapi.concurrency import run_in_threadpool
+
+from ..config import Settings
+from ..db.service import Database
+from .constants import VARIANT_CONTENT_TYPES
+from .exceptions import AnalysisQueueFull
+from .executor import AnalysisExecutor
+from .jobs import ClaimedJob, ProcessingQueue
+from .models import ImageVariant
+from .storage import ImageStorage
+from .tasks import ProcessingResult, process_image_source
+
+logger = logging.getLogger(__name__)
+
+
+class ImageProcessor:
+    def __init__(
+        self,
+        database: Database,
+        storage: ImageStorage,
+        analysis_executor: AnalysisExecutor,
+        settings: Settings,
+    ) -> None:
+        self._database = database
+        self._storage = storage
+        self._analysis_executor = analysis_executor
+        self._settings = settings
+
+    @property
+    def _lease(self) -> timedelta:
+        return timedelta(seconds=self._settings.image_processing_lease)
+
+    async def claim(self, limit: int) -> list[ClaimedJob]:
+        return await run_in_threadpool(self._claim, limit)
+
+    async def process_image(self, image_id: str | UUID) -> None:
+        job = await run_in_threadpool(self._claim_image, image_id)
+        if job is not None:
+            await self.process(job)
+
+    async def process(self, job: ClaimedJob) -> None:
+        try:
+            source = await self._storage.get_image_source(job.file)
+            processing = await self._analysis_executor.submit(
+                process_image_source,
+                source,
+                self._settings.image_palette_color_count,
+                self._settings.image_analysis_max_dimension,
+                self._settings.image_variant_dimensions,
+                self._settings.image_variant_formats,
+                self._settings.image_variant_quality,
+            )
+            result = await processing
+            variants = await self._save_variants(job, result)
+        except AnalysisQueueFull:
+            await run_in_threadpool(self._release, job)
+        except Exception as exc:
+            logger.exception("Processing image %s failed", job.file.image_id)
+            await run_in_threadpool(self._fail, job, repr(exc))
+        else:
+            await run_in_threadpool(self._complete, job, result, variants)
+
+    async def _save_variants(
+        self,
+        job: ClaimedJob,
+        result: ProcessingResult,
+    ) -> list[ImageVariant]:
+        variants = []
+        for encoded_variant in result.variants:
+            variant = ImageVariant(
+                image_id=job.file.image_id,
+                dimension=encoded_variant.dimension,
+                format=encoded_variant.format,
+                content_type=VARIANT_CONTENT_TYPES[encoded_variant.format],
+                size=len(encoded_variant.content),
+                width=encoded_variant.width,
+                height=encoded_variant.height,
+            )
+            await self._storage.save_variant(variant, encoded_variant.content)
+            variants.append(variant)
+        return variants
+
+    def _claim(self, limit: int) -> list[ClaimedJob]:
+        with self._database.session() as session:
+            return ProcessingQueue(session).claim(
+                limit,
+                self._lease,
+                self._settings.image_processing_max_attempts,
+            )
+
+    def _claim_image(self, image_id: str | UUID) -> ClaimedJob | None:
+        with self._database.session() as session:
+            return ProcessingQueue(session).claim_image(image_id, self._lease)
+
+    def _complete(
+        self,
+        job: ClaimedJob,
+        result: ProcessingResult,
+        variants: list[ImageVariant],
+    ) -> None:
+        with self._database.session() as session:
+            ProcessingQueue(session).complete(job, result.analysis, variants)
+
+    def _fail(self, job: ClaimedJob, error: str) -> None:
+        with self._database.session() as session:
+            ProcessingQueue(session).fail(
+                job,
+                error,
+                self._settings.image_processing_max_attempts,
+                timedelta(seconds=self._settings.image_processing_retry_delay),
+            )
+
+    def _release(self, job: ClaimedJob) -> None:
+        with self._database.session() as session:
+            ProcessingQueue(session).release(
+                job,
+                timedelta(seconds=self._settings.image_processing_release_delay),
+            )
@@ -1,10 +1,15 @@
+import math
 from datetime import datetime
 from operator import attrgetter
 from typing import Iterable, Self
 
 from pydantic import BaseModel
+from sqlalchemy import Row
 
-from .models import Image
+from .duplicates import DuplicateMatch
+from .models import Image, ProcessingState
+from .similarity import SimilarMatch
+from .variants import Fit
 
 
 class ImageIdSchema(BaseModel):
@@ -13,36 +18,115 @@ class ImageIdSchema(BaseModel):
 
 class ImageDetailsSchema(BaseModel):
     id: str
-    owner: str
+    owner: str | None = None
     title: str
     description: str | None = None
     size: int | None
+    content_hash: str | None = None
     width: int | None = None
     height: int | None = None
     dominant_color: str | None = None
     average_color: str | None = None
     palette: list[str] = []
+    processing_state: ProcessingState
     created_at: datetime
+    like_count: int = 0
 
     @classmethod
     def from_model(cls, instance: Image) -> Self:
         return cls(
             id=str(instance.id),
-            owner=instance.owner.username,
+            owner=instance.owner.username if instance.owner else None,
             title=instance.title,
             description=instance.description,
             size=instance.file.size,
+            content_hash=instance.file.content_hash,
             width=instance.file.width,
             height=instance.file.height,
             dominant_color=instance.file.dominant_color,
             average_color=instance.file.average_color,
             palette=map(attrgetter("color"), instance.file.palette),
+            processing_state=instance.file.processing_state,
             created_at=instance.created_at,
+            like_count=instance.like_count,
         )
 
     @classmethod
-    def from_model_bulk(cls, instances: Iterable[Image]) -> list[Self]:
-        return [cls.from_model(image) for image in instances]
+    def from_row(cls, row: Row) -> Self:
+        return cls(
+            id=str(row.id),
+            owner=row.owner,
+            title=row.title,
+            description=row.description,
+            size=row.size,
+            content_hash=row.content_hash,
+            width=row.width,
+            height=row.height,
+            dominant_color=row.dominant_color,
+            average_color=row.average_color,
+            palette=row.palette.split(",") if row.palette else [],
+            processing_state=row.processing_state,
+            created_at=row.created_at,
+            like_count=row.like_count,
+        )
+
+    @classmethod
+    def from_row_bulk(cls, rows: Iterable[Row]) -> list[Self]:
+        return [cls.from_row(row) for row in rows]
+
+
+class ImageColorMatchSchema(ImageDetailsSchema):
+    delta_e: float
+
+    @classmethod
+    def from_row(cls, row: Row) -> Self:
+        return cls(
+            **ImageDetailsSchema.from_row(row).model_dump(),
+            delta_e=math.sqrt(row.distance),
+        )
+
+
+class ImageLikedSchema(ImageDetailsSchema):
+    liked_at: datetime
+
+    @classmethod
+    def from_row(cls, row: Row) -> Self:
+        return cls(
+            **ImageDetailsSchema.from_row(row).model_dump(),
+            liked_at=row.liked_at,
+        )
+
+
+class ImageDuplicateSchema(ImageDetailsSchema):
+    distance: int
+    dhash_distance: int
+
+    @classmethod
+    def from_match(cls, row: Row, match: DuplicateMatch) -> Self:
+        return cls(
+            **ImageDetailsSchema.from_row(row).model_dump(),
+            distance=match.distance,
+            dhash_distance=match.dhash_distance,
+        )
+
+
+class ImageSimilarSchema(ImageDetailsSchema):
+    similarity: float
+
+    @classmethod
+    def from_match(cls, row: Row, match: SimilarMatch) -> Self:
+        return cls(
+            **ImageDetailsSchema.from_row(row).model_dump(),
+            similarity=match.similarity,
+        )
+
+
+class ImageTransformSchema(BaseModel):
+    width: int | None = None
+    height: int | None = None
+    fit: Fit = "contain"
+    quality: int
+    format: str | None = None
 
 
 class ImageUpdateSchema(BaseModel):
@@ -0,0 +1,313 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from enum import StrEnum, auto
+from typing import AsyncIterator, Awaitable, Callable
+from uuid import UUID, uuid4
+
+import aiofiles
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from sqlmodel import select, update
+
+from ..db.service import Database
+from .models import ImageBlob, ImageFile
+from .storage import (
+    BlobStorage,
+    ImageStorage,
+    StoredFile,
+    is_image_name,
+    is_temp_name,
+)
+from .upload import UPLOAD_CHUNK_SIZE, UploadDigest
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    def __init__(self, rate: float | None) -> None:
+        self._rate = rate
+        self._allowance = rate or 0.0
+        self._updated_at = time.monotonic()
+
+    async def acquire(self, amount: float = 1) -> None:
+        if not self._rate:
+            return
+        now = time.monotonic()
+        self._allowance = min(
+            self._rate, self._allowance + (now - self._updated_at) * self._rate
+        )
+        self._updated_at = now
+        self._allowance -= amount
+        if self._allowance < 0:
+            await asyncio.sleep(-self._allowance / self._rate)
+
+
+class ScrubPhase(StrEnum):
+    ROWS = auto()
+    FILES = auto()
+    BLOBS = auto()
+
+
+class ScrubReport(BaseModel):
+    checked_rows: int = 0
+    checked_files: int = 0
+    checked_blobs: int = 0
+    missing_files: int = 0
+    size_mismatches: int = 0
+    hash_mismatches: int = 0
+    orphan_files: int = 0
+    orphan_blobs: int = 0
+    abandoned_files: int = 0
+    repaired: int = 0
+
+
+class ScrubCheckpoint(BaseModel):
+    phase: ScrubPhase = ScrubPhase.ROWS
+    cursor: str | None = None
+    report: ScrubReport = Field(default_factory=ScrubReport)
+
+
+class StorageScrubber:
+    def __init__(
+        self,
+        database: Database,
+        storage: ImageStorage,
+        checkpoint_path: str,
+        batch_size: int = 500,
+        operations_per_second: float | None = None,
+        bytes_per_second: float | None = None,
+        grace_period: timedelta = timedelta(hours=1),
+        verify_hash: bool = False,
+        repair: bool = False,
+    ) -> None:
+        self._database = database
+        self._storage = storage
+        self._checkpoint_path = checkpoint_path
+        self._batch_size = batch_size
+        self._operations = RateLimiter(operations_per_second)
+        self._bytes = RateLimiter(bytes_per_second)
+        self._grace_period = grace_period
+        self._verify_hash = verify_hash
+        self._repair = repair
+
+    async def run(self) -> ScrubReport:
+        checkpoint = await run_in_threadpool(self._load_checkpoint)
+        phases = list(ScrubPhase)
+        for phase in phases[phases.index(checkpoint.phase) :]:
+            checkpoint.phase = phase
+            if phase == ScrubPhase.ROWS:
+                await self._scrub_rows(checkpoint)
+            elif phase == ScrubPhase.FILES:
+                await self._scrub_stored_files(
+                    checkpoint, self._storage.list_images, self._check_files
+                )
+            elif isinstance(self._storage, BlobStorage):
+                await self._scrub_stored_files(
+                    checkpoint, self._storage.list_blobs, self._check_blobs
+                )
+            checkpoint.cursor = None
+        await run_in_threadpool(self._save_checkpoint, ScrubCheckpoint())
+        return checkpoint.report
+
+    async def _scrub_rows(self, checkpoint: ScrubCheckpoint) -> None:
+        while True:
+            files = await run_in_threadpool(self._get_files, checkpoint.cursor)
+            if not files:
+                return
+            for file_metadata in files:
+                await self._operations.acquire()
+                await self._check_row(file_metadata, checkpoint.report)
+            checkpoint.report.checked_rows += len(files)
+            checkpoint.cursor = str(files[-1].image_id)
+            await run_in_threadpool(self._save_checkpoint, checkpoint)
+
+    async def _scrub_stored_files(
+        self,
+        checkpoint: ScrubCheckpoint,
+        list_files: Callable[[str | None], AsyncIterator[StoredFile]],
+        check_batch: Callable[[list[StoredFile], ScrubReport], Awaitable[None]],
+    ) -> None:
+        batch = []
+        async for stored_file in list_files(checkpoint.cursor):
+            await self._operations.acquire()
+            batch.append(stored_file)
+            if len(batch) >= self._batch_size:
+                await self._finish_batch(checkpoint, batch, check_batch)
+                batch = []
+        if batch:
+            await self._finish_batch(checkpoint, batch, check_batch)
+
+    async def _finish_batch(
+        self,
+        checkpoint: ScrubCheckpoint,
+        batch: list[StoredFile],
+        check_batch: Callable[[list[StoredFile], ScrubReport], Awaitable[None]],
+    ) -> None:
+        await check_batch(batch, checkpoint.report)
+        checkpoint.cursor = batch[-1].cursor
+        await run_in_threadpool(self._save_checkpoint, checkpoint)
+
+    async def _check_row(self, file_metadata: ImageFile, report: ScrubReport) -> None:
+        size = await self._storage.get_image_size(file_metadata)
+        if size is None:
+            report.missing_files += 1
+            logger.warning("Image %s has no stored file", file_metadata.image_id)
+            return
+        if size != file_metadata.size:
+            report.size_mismatches += 1
+            logger.warning(
+                "Image %s is %d bytes, expected %d",
+                file_metadata.image_id,
+                size,
+                file_metadata.size,
+            )
+            if self._repair:
+                await run_in_threadpool(self._update_size, file_metadata, size)
+                report.repaired += 1
+        if self._verify_hash and file_metadata.content_hash is not None:
+            content_hash = await self._hash_image(file_metadata)
+            if content_hash != file_metadata.content_hash:
+                report.hash_mismatches += 1
+                logger.warning(
+                    "Image %s has content hash %s, expected %s",
+                    file_metadata.image_id,
+                    content_hash,
+                    file_metadata.content_hash,
+                )
+
+    async def _check_files(
+        self,
+        stored_files: list[StoredFile],
+        report: ScrubReport,
+    ) -> None:
+        report.checked_files += len(stored_files)
+        image_files = [
+            stored_file
+            for stored_file in stored_files
+            if is_image_name(stored_file.name)
+        ]
+        known_ids = await run_in_threadpool(
+            self._get_known_image_ids,
+            [UUID(stored_file.name) for stored_file in image_files],
+        )
+        orphans = [
+            stored_file
+            for stored_file in self._filter_expired(image_files)
+            if UUID(stored_file.name) not in known_ids
+        ]
+        for orphan in orphans:
+            logger.warning("Stored file %s has no image", orphan.cursor)
+        report.orphan_files += len(orphans)
+        if self._repair and orphans:
+            await self._storage.delete_images(
+                [ImageFile(image_id=orphan.name) for orphan in orphans]
+            )
+            report.repaired += len(orphans)
+        abandoned_files = [
+            stored_file
+            for stored_file in self._filter_expired(stored_files)
+            if is_temp_name(stored_file.name)
+        ]
+        for abandoned_file in abandoned_files:
+            logger.warning(
+                "Stored file %s is an abandoned upload", abandoned_file.cursor
+            )
+        report.abandoned_files += len(abandoned_files)
+        if self._repair and abandoned_files:
+            await self._storage.delete_stored_files(abandoned_files)
+            report.repaired += len(abandoned_files)
+
+    async def _check_blobs(
+        self,
+        stored_files: list[StoredFile],
+        report: ScrubReport,
+    ) -> None:
+        report.checked_blobs += len(stored_files)
+        known_hashes = await run_in_threadpool(
+            self._get_known_blob_hashes,
+            [stored_file.name for stored_file in stored_files],
+        )
+        orphans = [
+            stored_file
+            for stored_file in self._filter_expired(stored_files)
+            if stored_file.name not in known_hashes
+        ]
+        for orphan in orphans:
+            logger.warning("Stored blob %s is not referenced", orphan.cursor)
+            if self._repair:
+                await self._storage.delete_blob(orphan.name)
+                report.repaired += 1
+        report.orphan_blobs += len(orphans)
+
+    def _filter_expired(self, stored_files: list[StoredFile]) -> list[StoredFile]:
+        expired_at = datetime.now(timezone.utc) - self._grace_period
+        return [
+            stored_file
+            for stored_file in stored_files
+            if stored_file.modified_at < expired_at
+        ]
+
+    async def _hash_image(self, file_metadata: ImageFile) -> str:
+        digest = UploadDigest()
+        source = await self._storage.get_image_source(file_metadata)
+        if isinstance(source, bytes):
+            await self._bytes.acquire(len(source))
+            digest.update(source)
+            return digest.hexdigest()
+        async with aiofiles.open(source, "rb") as image_file:
+            while chunk := await image_file.read(UPLOAD_CHUNK_SIZE):
+                await self._bytes.acquire(len(chunk))
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _get_files(self, cursor: str | None) -> list[ImageFile]:
+        query = select(ImageFile).order_by(ImageFile.image_id)
+        if cursor is not None:
+            query = query.where(ImageFile.image_id > UUID(cursor))
+        with self._database.session() as session:
+            return list(session.exec(query.limit(self._batch_size)))
+
+    def _get_known_image_ids(self, image_ids: list[UUID]) -> set[UUID]:
+        with self._database.session() as session:
+            return set(
+                session.exec(
+                    select(ImageFile.image_id).where(ImageFile.image_id.in_(image_ids))
+                )
+            )
+
+    def _get_known_blob_hashes(self, content_hashes: list[str]) -> set[str]:
+        with self._database.session() as session:
+            return set(
+                session.exec(
+                    select(ImageBlob.content_hash).where(
+                        ImageBlob.content_hash.in_(content_hashes)
+                    )
+                )
+            )
+
+    def _update_size(self, file_metadata: ImageFile, size: int) -> None:
+        with self._database.session() as session:
+            session.exec(
+                update(ImageFile)
+                .where(ImageFile.image_id == file_metadata.image_id)
+                .where(ImageFile.size == file_metadata.size)
+                .where(ImageFile.content_hash == file_metadata.content_hash)
+                .values(size=size)
+            )
+            session.commit()
+
+    def _load_checkpoint(self) -> ScrubCheckpoint:
+        try:
+            with open(self._checkpoint_path, "rb") as checkpoint_file:
+                return ScrubCheckpoint.model_validate_json(checkpoint_file.read())
+        except FileNotFoundError:
+            return ScrubCheckpoint()
+
+    def _save_checkpoint(self, checkpoint: ScrubCheckpoint) -> None:
+        temp_path = f"{self._checkpoint_path}.{uuid4().hex}"
+        with open(temp_path, "w") as checkpoint_file:
+            checkpoint_file.write(checkpoint.model_dump_json())
+        os.replace(temp_path, self._checkpoint_path)
@@ -0,0 +1,141 @@
+import re
+
+from sqlalchemy import DDL, Float, event, literal, or_
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+from .models import Image
+
+SEARCH_SCHEMA = {
+    "postgresql": [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "ALTER TABLE image ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+        "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(description, '')), 'B')"
+        ") STORED",
+        "CREATE INDEX ix_image_search_vector ON image USING gin (search_vector)",
+        "CREATE INDEX ix_image_title_trgm ON image USING gin (title gin_trgm_ops)",
+        "CREATE INDEX ix_image_description_trgm ON image "
+        "USING gin (description gin_trgm_ops)",
+    ],
+    "sqlite": [
+        "CREATE VIRTUAL TABLE image_fts USING fts5("
+        "image_id UNINDEXED, title, description, "
+        "tokenize='unicode61 remove_diacritics 2')",
+        "CREATE TRIGGER image_fts_insert AFTER INSERT ON image BEGIN "
+        "INSERT INTO image_fts(image_id, title, description) "
+        "VALUES (new.id, new.title, new.description); END",
+        "CREATE TRIGGER image_fts_delete AFTER DELETE ON image BEGIN "
+        "DELETE FROM image_fts WHERE image_id = old.id; END",
+        "CREATE TRIGGER image_fts_update AFTER UPDATE OF title, description "
+        "ON image BEGIN "
+        "UPDATE image_fts SET title = new.title, description = new.description "
+        "WHERE image_id = old.id; END",
+    ],
+}
+SEARCH_SCHEMA_NAMES = frozenset(
+    {
+        "search_vector",
+        "ix_image_search_vector",
+        "ix_image_title_trgm",
+        "ix_image_description_trgm",
+    }
+)
+
+for dialect, statements in SEARCH_SCHEMA.items():
+    for statement in statements:
+        event.listen(
+            Image.__table__,
+            "after_create",
+            DDL(statement).execute_if(dialect=dialect),
+        )
+
+
+def is_search_schema_object(name: str | None) -> bool:
+    return name is not None and (
+        name in SEARCH_SCHEMA_NAMES or name.startswith("image_fts")
+    )
+
+
+def get_search_terms(text: str) -> list[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+class _ImageSearchFunction(FunctionElement):
+    inherit_cache = True
+
+    def __init__(self, text: str) -> None:
+        terms = get_search_terms(text)
+        super().__init__(
+            literal(" & ".join(f"{term}:*" for term in terms)),
+            literal(" ".join(f'"{term}"*' for term in terms)),
+            literal(text),
+        )
+
+
+class match_images(_ImageSearchFunction):
+    name = "match_images"
+    inherit_cache = True
+
+
+class rank_images(_ImageSearchFunction):
+    name = "rank_images"
+    inherit_cache = True
+    type = Float()
+
+
+def _process_arguments(element: _ImageSearchFunction, compiler, **kw) -> list[str]:
+    return [compiler.process(clause, **kw) for clause in element.clauses]
+
+
+@compiles(match_images)
+def _compile_match_images(element: match_images, compiler, **kw) -> str:
+    text = element.clauses.clauses[2]
+    return compiler.process(
+        or_(
+            Image.title.icontains(text), Image.description.icontains(text)
+        ).self_group(),
+        **kw,
+    )
+
+
+@compiles(match_images, "postgresql")
+def _compile_match_images_postgresql(element: match_images, compiler, **kw) -> str:
+    tsquery, _, text = _process_arguments(element, compiler, **kw)
+    return (
+        f"(image.search_vector @@ to_tsquery('simple', {tsquery}) "
+        f"OR image.title % {text} OR {text} <% image.description)"
+    )
+
+
+@compiles(match_images, "sqlite")
+def _compile_match_images_sqlite(element: match_images, compiler, **kw) -> str:
+    _, fts_query, _ = _process_arguments(element, compiler, **kw)
+    return (
+        "image.id IN "
+        f"(SELECT image_id FROM image_fts WHERE image_fts MATCH {fts_query})"
+    )
+
+
+@compiles(rank_images)
+def _compile_rank_images(element: rank_images, compiler, **kw) -> str:
+    return "0.0"
+
+
+@compiles(rank_images, "postgresql")
+def _compile_rank_images_postgresql(element: rank_images, compiler, **kw) -> str:
+    tsquery, _, text = _process_arguments(element, compiler, **kw)
+    return (
+        f"(ts_rank(image.search_vector, to_tsquery('simple', {tsquery})) "
+        f"+ greatest(similarity(image.title, {text}), "
+        f"word_similarity({text}, image.description)))"
+    )
+
+
+@compiles(rank_images, "sqlite")
+def _compile_rank_images_sqlite(element: rank_images, compiler, **kw) -> str:
+    _, fts_query, _ = _process_arguments(element, compiler, **kw)
+    return (
+        "(SELECT -bm25(image_fts, 0.0, 10.0, 1.0) FROM image_fts "
+        f"WHERE image_fts MATCH {fts_query} AND image_fts.image_id = image.id)"
+    )
@@ -1,63 +1,59 @@
-from io import IOBase
+import hashlib
+import os
+from datetime import datetime
+from functools import partial
 from uuid import UUID
 
-import cv2
-import numpy as np
-from colorthief import ColorThief
 from dependency_injector.wiring import Provide, inject
-from fastapi import BackgroundTasks, Depends, Response, UploadFile
-from pydantic_extra_types.color import Color
-from sqlalchemy.orm import selectinload
+from fastapi import BackgroundTasks, Depends, Response, UploadFile, status
+from sqlalchemy import Row, func, literal
+from sqlalchemy.orm import joinedload
 from sqlalchemy.util import greenlet_spawn
-from sqlmodel import select
-from sqlmodel.sql.expression import SelectOfScalar
+from sqlmodel import delete, select, update
+from sqlmodel.sql.expression import Select
 
-from src.users.models import User
+from src.users.models import User, UserImageLikes
 
 from ..config import Settings
 from ..containers import Container
 from ..db.exceptions import raises_on_not_found
-from ..db.session import DBSession, get_database
+from ..db.session import DBSession
+from ..db.statements import insert_ignoring_conflicts
 from ..users.exceptions import UserNotFound
+from .blobs import BlobReferences
+from .cache import DerivativeCache
+from .cached_storage import CacheStatistics, CachingImageStorage
+from .colors import color_to_lab, get_neighbouring_buckets
+from .conditional import (
+    RequestConditions,
+    format_http_date,
+    get_byte_range,
+    is_not_modified,
+    make_etag,
+)
+from .constants import VARIANT_CONTENT_TYPES
+from .duplicates import DuplicateIndex, DuplicateMatch, ImageHashes
 from .exceptions import ImageNotFound
+from .executor import AnalysisExecutor
 from .filters import ImageFilter
-from .models import Image, ImageFile, ImagePaletteColor
-from .schemas import ImageUpdateSchema
-from .storage import ImageStorage, copy_to_temp_file
-
-
-def find_average_color(image_buffer: IOBase) -> Color:
-    image_buffer.seek(0)
-    content = np.frombuffer(image_buffer.read(), dtype=np.uint8)
-    image = cv2.imdecode(content, cv2.IMREAD_UNCHANGED)
-    average_color_per_row = np.mean(image, axis=0)
-    average_color = np.mean(average_color_per_row, axis=0)
-    b, g, r = average_color
-    return Color((r, g, b)).as_hex()
-
-
-@inject
-def process_image(
-    image_id: str,
-    content: IOBase,
-    settings: Settings = Provide[Container.settings],
-) -> None:
-    with get_database().session() as session:
-        file_metadata = session.exec(
-            select(ImageFile).where(ImageFile.image_id == image_id)
-        ).one()
-        color_thief = ColorThief(content)
-        file_metadata.width, file_metadata.height = color_thief.image.size
-        file_metadata.dominant_color = Color(color_thief.get_color()).as_hex()
-        file_metadata.average_color = find_average_color(content)
-        file_metadata.palette.clear()
-        palette = color_thief.get_palette(
-            color_count=settings.image_palette_color_count
-        )
-        for color in palette:
-            file_metadata.palette.append(ImagePaletteColor(color=Color(color).as_hex()))
-        session.add(file_metadata)
-        session.commit()
+from .jobs import ProcessingQueue
+from .models import (
+    Image,
+    ImageFile,
+    ImagePaletteColor,
+    ImageVariant,
+    ProcessingState,
+    TrendingImage,
+)
+from .negotiation import choose_content_type
+from .processing import ImageProcessor
+from .schemas import ImageTransformSchema, ImageUpdateSchema
+from .similarity import SimilarityIndex, SimilarMatch
+from .storage import BlobStorage, ImageStorage, open_file_response
+from .trending import TrendingScores
+from .variants import transform_image
+
+_FALLBACK_FORMAT = "jpeg"
 
 
 class ImagesService:
@@ -67,28 +63,213 @@ class ImagesService:
         db_session: DBSession,
         background_task: BackgroundTasks,
         storage: ImageStorage = Depends(Provide[Container.image_storage]),
+        processor: ImageProcessor = Depends(Provide[Container.image_processor]),
+        analysis_executor: AnalysisExecutor = Depends(
+            Provide[Container.analysis_executor]
+        ),
+        derivative_cache: DerivativeCache = Depends(
+            Provide[Container.derivative_cache]
+        ),
+        duplicate_index: DuplicateIndex = Depends(Provide[Container.duplicate_index]),
+        similarity_index: SimilarityIndex = Depends(
+            Provide[Container.similarity_index]
+        ),
+        trending_scores: TrendingScores = Depends(Provide[Container.trending_scores]),
+        settings: Settings = Depends(Provide[Container.settings]),
     ) -> None:
         self._session = db_session
         self._background_tasks = background_task
         self._storage = storage
+        self._processor = processor
+        self._analysis_executor = analysis_executor
+        self._derivative_cache = derivative_cache
+        self._duplicate_index = duplicate_index
+        self._similarity_index = similarity_index
+        self._trending_scores = trending_scores
+        self._settings = settings
 
     @raises_on_not_found(ImageNotFound)
     def get_image_details(self, image_id: str | UUID) -> Image:
         image = self._session.exec(
             select(Image)
             .where(Image.id == image_id)
-            .options(selectinload("*").selectinload("*"))
+            .options(
+                joinedload(Image.owner),
+                joinedload(Image.file).selectinload(ImageFile.palette),
+            )
         ).one()
         return image
 
     @raises_on_not_found(ImageNotFound)
-    async def get_image_file(self, image_id: str | UUID) -> Response:
+    async def get_image_file(
+        self,
+        image_id: str | UUID,
+        size: int | None = None,
+        accept: str | None = None,
+        conditions: RequestConditions | None = None,
+        version: str | None = None,
+    ) -> Response:
+        conditions = conditions or RequestConditions()
+        file_metadata = await greenlet_spawn(self._session.get_one, ImageFile, image_id)
+        variant = None
+        if size is not None:
+            variant = await greenlet_spawn(self._find_variant, image_id, size, accept)
+        headers = self._get_cache_headers(file_metadata, variant, version)
+        if size is not None:
+            headers["Vary"] = "Accept"
+        etag = headers.get("ETag")
+        if is_not_modified(conditions, etag, file_metadata.uploaded_at):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        byte_range = get_byte_range(
+            conditions,
+            file_metadata.size if variant is None else variant.size,
+            etag,
+            file_metadata.uploaded_at,
+        )
+        if variant is None:
+            response = await self._storage.load_image(file_metadata, byte_range)
+        else:
+            response = await self._storage.load_variant(variant, byte_range)
+        response.headers.update(headers)
+        return response
+
+    @raises_on_not_found(ImageNotFound)
+    async def get_transformed_image(
+        self,
+        image_id: str | UUID,
+        transform: ImageTransformSchema,
+        accept: str | None = None,
+        conditions: RequestConditions | None = None,
+    ) -> Response:
+        conditions = conditions or RequestConditions()
         file_metadata = await greenlet_spawn(self._session.get_one, ImageFile, image_id)
-        return await self._storage.load_image(file_metadata)
+        image_format = transform.format or self._negotiate_format(accept)
+        cache_key = self._get_transform_cache_key(
+            file_metadata, transform, image_format
+        )
+        headers = {"ETag": make_etag(cache_key), "Cache-Control": "no-cache"}
+        if transform.format is None:
+            headers["Vary"] = "Accept"
+        if is_not_modified(conditions, headers["ETag"], None):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        cached_file = await self._derivative_cache.open_or_create(
+            cache_key,
+            partial(self._render_transform, file_metadata, transform, image_format),
+        )
+        return open_file_response(
+            cached_file,
+            VARIANT_CONTENT_TYPES[image_format],
+            os.fstat(cached_file.fileno()).st_size,
+            None,
+            headers=headers,
+        )
 
-    def filter_images_query(self, image_filter: ImageFilter) -> SelectOfScalar[Image]:
-        query = select(Image).options(selectinload("*").selectinload("*"))
-        return image_filter.filter(query)
+    def get_cache_statistics(self) -> CacheStatistics:
+        if isinstance(self._storage, CachingImageStorage):
+            return self._storage.statistics
+        return CacheStatistics()
+
+    def filter_images_query(self, image_filter: ImageFilter) -> Select:
+        return image_filter.sort(image_filter.filter(self._get_listing_query()))
+
+    def get_trending_images_query(self) -> Select:
+        threshold = self._trending_scores.get_threshold(datetime.utcnow())
+        return (
+            self._get_listing_query()
+            .join(TrendingImage, TrendingImage.image_id == Image.id)
+            .where(TrendingImage.score >= threshold)
+            .order_by(TrendingImage.score.desc(), TrendingImage.image_id.desc())
+        )
+
+    def search_images_by_color(
+        self,
+        color: str,
+        tolerance: float,
+        limit: int,
+    ) -> list[Row]:
+        lab = color_to_lab(color)
+        distance = (
+            (ImagePaletteColor.lab_l - lab.lightness)
+            * (ImagePaletteColor.lab_l - lab.lightness)
+            + (ImagePaletteColor.lab_a - lab.a) * (ImagePaletteColor.lab_a - lab.a)
+            + (ImagePaletteColor.lab_b - lab.b) * (ImagePaletteColor.lab_b - lab.b)
+        )
+        matches = (
+            select(
+                ImagePaletteColor.image_id,
+                func.min(distance).label("distance"),
+            )
+            .where(
+                ImagePaletteColor.lab_bucket.in_(
+                    get_neighbouring_buckets(lab, tolerance)
+                ),
+                distance <= tolerance * tolerance,
+            )
+            .group_by(ImagePaletteColor.image_id)
+            .order_by(func.min(distance), ImagePaletteColor.image_id)
+            .limit(limit)
+            .subquery()
+        )
+        query = (
+            self._get_listing_query()
+            .add_columns(matches.c.distance)
+            .join(matches, matches.c.image_id == Image.id)
+            .order_by(matches.c.distance, Image.id)
+        )
+        return self._session.exec(query).all()
+
+    @raises_on_not_found(ImageNotFound)
+    def find_duplicate_images(
+        self,
+        image_id: str | UUID,
+        max_distance: int,
+        limit: int,
+    ) -> list[tuple[Row, DuplicateMatch]]:
+        file_metadata = self._session.get_one(ImageFile, image_id)
+        if file_metadata.phash is None or file_metadata.dhash is None:
+            return []
+        self._duplicate_index.refresh()
+        matches = self._duplicate_index.find(
+            file_metadata.image_id,
+            ImageHashes(file_metadata.phash, file_metadata.dhash),
+            max_distance,
+        )
+        duplicates = []
+        for start in range(0, len(matches), limit):
+            batch = {match.image_id: match for match in matches[start : start + limit]}
+            rows = self._session.exec(
+                self._get_listing_query().where(Image.id.in_(batch))
+            )
+            duplicates.extend((row, batch[row.id]) for row in rows)
+            if len(duplicates) >= limit:
+                break
+        duplicates.sort(
+            key=lambda duplicate: (duplicate[1].distance, duplicate[1].dhash_distance)
+        )
+        return duplicates[:limit]
+
+    @raises_on_not_found(ImageNotFound)
+    def find_similar_images(
+        self,
+        image_id: str | UUID,
+        limit: int,
+    ) -> list[tuple[Row, SimilarMatch]]:
+        file_metadata = self._session.get_one(ImageFile, image_id)
+        if file_metadata.embedding is None:
+            return []
+        self._similarity_index.refresh()
+        matches = {
+            match.image_id: match
+            for match in self._similarity_index.find(
+                file_metadata.image_id, file_metadata.embedding, 2 * limit
+            )
+        }
+        rows = self._session.exec(
+            self._get_listing_query().where(Image.id.in_(matches))
+        )
+        similar = [(row, matches[row.id]) for row in rows]
+        similar.sort(key=lambda item: item[1].similarity, reverse=True)
+        return similar[:limit]
 
     async def create_image(self, image: Image, file: UploadFile) -> Image:
         await greenlet_spawn(self._session.add, image)
@@ -115,30 +296,274 @@ class ImagesService:
         await self._save_image_file(image_id, file)
         await greenlet_spawn(self._session.commit)
 
-    def delete_image(self, image: Image) -> None:
-        self._storage.delete_image(image.file)
-        self._session.delete(image)
-        self._session.commit()
+    async def delete_image(self, image: Image) -> None:
+        await self.delete_images([image])
 
-    def get_liked_images_query(self, user: User) -> list[Image]:
-        return select(Image).join(Image.liked_by).where(User.id == user.id)
+    async def delete_images(self, images: list[Image]) -> None:
+        files = [image.file for image in images if image.file is not None]
+        if isinstance(self._storage, BlobStorage):
+            blob_references = BlobReferences(self._session)
+            for file_metadata in files:
+                if file_metadata.content_hash is not None:
+                    await greenlet_spawn(
+                        blob_references.release, file_metadata.content_hash
+                    )
+        for image in images:
+            await greenlet_spawn(self._session.delete, image)
+        await greenlet_spawn(self._session.commit)
+        for image in images:
+            self._duplicate_index.remove(image.id)
+            self._similarity_index.remove(image.id)
+        await self._storage.delete_images(files)
 
-    def like_image(self, image: Image, user: User) -> None:
-        if user not in image.liked_by:
-            image.liked_by.append(user)
-        self._session.add(image)
+    def filter_liked_images_query(
+        self,
+        user: User,
+        image_filter: ImageFilter,
+    ) -> Select:
+        query = image_filter.filter(
+            self._get_listing_query()
+            .add_columns(UserImageLikes.liked_at)
+            .join(UserImageLikes, UserImageLikes.image_id == Image.id)
+            .where(UserImageLikes.user_id == user.id)
+        )
+        if image_filter.ordering_values:
+            return image_filter.sort(query)
+        return query.order_by(
+            UserImageLikes.liked_at.desc(), UserImageLikes.image_id.desc()
+        )
+
+    def like_image(self, image_id: str | UUID, user: User) -> None:
+        result = self._session.exec(
+            insert_ignoring_conflicts(self._session, UserImageLikes).from_select(
+                ["user_id", "image_id"],
+                select(literal(user.id), Image.id).where(Image.id == image_id),
+            )
+        )
+        if result.rowcount:
+            self._change_like_count(image_id, 1)
         self._session.commit()
+        if not result.rowcount:
+            self._ensure_image_exists(image_id)
 
-    def remove_like(self, image: Image, user: User) -> None:
-        if user not in image.liked_by:
-            raise UserNotFound("User has not liked this image")
-        image.liked_by.remove(user)
-        self._session.add(image)
+    def remove_like(self, image_id: str | UUID, user: User) -> None:
+        result = self._session.exec(
+            delete(UserImageLikes).where(
+                UserImageLikes.user_id == user.id,
+                UserImageLikes.image_id == image_id,
+            )
+        )
+        if result.rowcount:
+            self._change_like_count(image_id, -1)
         self._session.commit()
+        if not result.rowcount:
+            self._ensure_image_exists(image_id)
+            raise UserNotFound("User has not liked this image")
+
+    def _change_like_count(self, image_id: str | UUID, delta: int) -> None:
+        self._session.exec(
+            update(Image)
+            .where(Image.id == image_id)
+            .values(
+                like_count=Image.like_count + delta,
+                likes_updated_at=datetime.utcnow(),
+            )
+        )
+
+    @raises_on_not_found(ImageNotFound)
+    def _ensure_image_exists(self, image_id: str | UUID) -> None:
+        self._session.exec(select(Image.id).where(Image.id == image_id)).one()
+
+    def _find_variant(
+        self,
+        image_id: str | UUID,
+        size: int,
+        accept: str | None,
+    ) -> ImageVariant | None:
+        variants = self._session.exec(
+            select(ImageVariant)
+            .where(ImageVariant.image_id == image_id, ImageVariant.dimension >= size)
+            .order_by(ImageVariant.dimension)
+        ).all()
+        if not variants:
+            return None
+        formats = self._settings.image_variant_formats
+        smallest_variants = sorted(
+            (
+                variant
+                for variant in variants
+                if variant.dimension == variants[0].dimension
+                and variant.format in formats
+            ),
+            key=lambda variant: formats.index(variant.format),
+        )
+        content_type = choose_content_type(
+            accept,
+            [variant.content_type for variant in smallest_variants],
+        )
+        return next(
+            (
+                variant
+                for variant in smallest_variants
+                if variant.content_type == content_type
+            ),
+            None,
+        )
+
+    def _get_cache_headers(
+        self,
+        file_metadata: ImageFile,
+        variant: ImageVariant | None,
+        version: str | None,
+    ) -> dict[str, str]:
+        headers = {"Accept-Ranges": "bytes", "Cache-Control": "no-cache"}
+        if file_metadata.content_hash is not None:
+            if variant is None:
+                headers["ETag"] = make_etag(file_metadata.content_hash)
+            else:
+                headers["ETag"] = make_etag(
+                    file_metadata.content_hash, variant.dimension, variant.format
+                )
+            if version == file_metadata.content_hash:
+                headers[
+                    "Cache-Control"
+                ] = f"public, max-age={self._settings.image_cache_max_age}, immutable"
+        if file_metadata.uploaded_at is not None:
+            headers["Last-Modified"] = format_http_date(file_metadata.uploaded_at)
+        return headers
+
+    def _negotiate_format(self, accept: str | None) -> str:
+        formats = self._settings.image_variant_formats
+        content_type = choose_content_type(
+            accept,
+            [VARIANT_CONTENT_TYPES[image_format] for image_format in formats],
+        )
+        return next(
+            (
+                image_format
+                for image_format in formats
+                if VARIANT_CONTENT_TYPES[image_format] == content_type
+            ),
+            _FALLBACK_FORMAT,
+        )
+
+    def _get_transform_cache_key(
+        self,
+        file_metadata: ImageFile,
+        transform: ImageTransformSchema,
+        image_format: str,
+    ) -> str:
+        content_key = file_metadata.content_hash or (
+            f"{file_metadata.image_id}:{file_metadata.size}"
+        )
+        transform_key = ":".join(
+            str(value)
+            for value in (
+                transform.width,
+                transform.height,
+                transform.fit,
+                transform.quality,
+                image_format,
+            )
+        )
+        return hashlib.sha256(f"{content_key}:{transform_key}".encode()).hexdigest()
+
+    async def _render_transform(
+        self,
+        file_metadata: ImageFile,
+        transform: ImageTransformSchema,
+        image_format: str,
+    ) -> bytes:
+        source = await self._storage.get_image_source(file_metadata)
+        rendering = await self._analysis_executor.submit(
+            transform_image,
+            source,
+            transform.width,
+            transform.height,
+            transform.fit,
+            image_format,
+            transform.quality,
+        )
+        return await rendering
+
+    def _get_listing_query(self) -> Select:
+        palette = (
+            select(func.aggregate_strings(ImagePaletteColor.color, ","))
+            .where(ImagePaletteColor.image_id == Image.id)
+            .scalar_subquery()
+        )
+        return (
+            select(
+                Image.id,
+                User.username.label("owner"),
+                Image.title,
+                Image.description,
+                Image.created_at,
+                Image.like_count,
+                ImageFile.size,
+                ImageFile.content_hash,
+                ImageFile.width,
+                ImageFile.height,
+                ImageFile.dominant_color,
+                ImageFile.average_color,
+                ImageFile.processing_state,
+                palette.label("palette"),
+            )
+            .join(ImageFile, ImageFile.image_id == Image.id)
+            .outerjoin(User, User.id == Image.owner_id)
+        )
 
     async def _save_image_file(self, image_id: str, file: UploadFile) -> ImageFile:
         file_metadata = await self._storage.save_image(image_id, file)
-        await greenlet_spawn(self._session.merge, file_metadata)
-        temp_file = await copy_to_temp_file(file)
-        self._background_tasks.add_task(process_image, image_id, temp_file)
+        previous_file = await greenlet_spawn(self._session.get, ImageFile, image_id)
+        if previous_file is not None:
+            self._duplicate_index.remove(previous_file.image_id)
+            self._similarity_index.remove(previous_file.image_id)
+        previous_hash = previous_file.content_hash if previous_file else None
+        file_metadata = await greenlet_spawn(self._session.merge, file_metadata)
+        await greenlet_spawn(
+            self._session.exec,
+            delete(ImageVariant).where(ImageVariant.image_id == image_id),
+        )
+        if isinstance(self._storage, BlobStorage):
+            blob_references = BlobReferences(self._session)
+            await greenlet_spawn(
+                blob_references.acquire,
+                file_metadata.content_hash,
+                file_metadata.size,
+            )
+            if previous_hash is not None:
+                await greenlet_spawn(blob_references.release, previous_hash)
+            source_file = await greenlet_spawn(
+                blob_references.find_processed, file_metadata.content_hash, image_id
+            )
+            if source_file is not None:
+                await self._reuse_processing(file_metadata, source_file)
+                return file_metadata
+        await greenlet_spawn(ProcessingQueue(self._session).enqueue, image_id)
+        if self._settings.image_processing_inline:
+            self._background_tasks.add_task(self._processor.process_image, image_id)
         return file_metadata
+
+    async def _reuse_processing(
+        self,
+        file_metadata: ImageFile,
+        source_file: ImageFile,
+    ) -> None:
+        file_metadata.width = source_file.width
+        file_metadata.height = source_file.height
+        file_metadata.dominant_color = source_file.dominant_color
+        file_metadata.average_color = source_file.average_color
+        file_metadata.phash = source_file.phash
+        file_metadata.dhash = source_file.dhash
+        file_metadata.embedding = source_file.embedding
+        file_metadata.analyzed_at = datetime.utcnow()
+        file_metadata.palette = [
+            ImagePaletteColor.from_color(color.color) for color in source_file.palette
+        ]
+        file_metadata.variants = [
+            await self._storage.copy_variant(variant, file_metadata.image_id)
+            for variant in source_file.variants
+        ]
+        file_metadata.processing_state = ProcessingState.DONE
+        file_metadata.processing_job = None
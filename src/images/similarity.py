@@ -0,0 +1,318 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import NamedTuple
+from uuid import UUID, uuid4
+
+import numpy as np
+from sqlmodel import select
+
+from ..db.service import Database
+from .models import ImageFile
+
+_TRAINING_POINTS_PER_LIST = 16
+_TRAINING_SAMPLE_PER_LIST = 64
+_RETRAINING_GROWTH = 4
+_KMEANS_ITERATIONS = 10
+_ASSIGNMENT_BATCH_SIZE = 65536
+_SYNC_OVERLAP = timedelta(minutes=1)
+
+
+class SimilarMatch(NamedTuple):
+    image_id: UUID
+    similarity: float
+
+
+def decode_embedding(embedding: bytes) -> np.ndarray:
+    return np.frombuffer(embedding, dtype=np.float16).astype(np.float32)
+
+
+class IVFIndex:
+    def __init__(
+        self,
+        dimension: int,
+        list_count: int,
+        probe_count: int,
+        seed: int = 0,
+    ) -> None:
+        self._dimension = dimension
+        self._list_count = list_count
+        self._probe_count = probe_count
+        self._random = np.random.default_rng(seed)
+        self._vectors = np.zeros((0, dimension), dtype=np.float16)
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._ids: list[UUID | None] = []
+        self._positions: dict[UUID, int] = {}
+        self._free: list[int] = []
+        self._centroids: np.ndarray | None = None
+        self._trained_size = 0
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def image_ids(self) -> set[UUID]:
+        return set(self._positions)
+
+    @property
+    def is_trained(self) -> bool:
+        return self._centroids is not None
+
+    @property
+    def needs_training(self) -> bool:
+        if self._centroids is None:
+            return len(self) >= self._list_count * _TRAINING_POINTS_PER_LIST
+        return len(self) >= self._trained_size * _RETRAINING_GROWTH
+
+    def add(self, image_id: UUID, vector: np.ndarray) -> None:
+        self.remove(image_id)
+        if self._free:
+            position = self._free.pop()
+        else:
+            position = len(self._ids)
+            self._ids.append(None)
+            self._reserve(len(self._ids))
+        self._ids[position] = image_id
+        self._positions[image_id] = position
+        self._vectors[position] = vector
+        self._assignments[position] = (
+            self._assign(vector[None])[0] if self._centroids is not None else 0
+        )
+
+    def remove(self, image_id: UUID) -> None:
+        position = self._positions.pop(image_id, None)
+        if position is None:
+            return
+        self._ids[position] = None
+        self._assignments[position] = -1
+        self._free.append(position)
+
+    def train(self) -> None:
+        live = np.flatnonzero(self._assignments[: len(self._ids)] >= 0)
+        if not len(live):
+            return
+        list_count = min(self._list_count, len(live))
+        sample_size = min(len(live), list_count * _TRAINING_SAMPLE_PER_LIST)
+        sample = self._vectors[
+            self._random.choice(live, sample_size, replace=False)
+        ].astype(np.float32)
+        centroids = sample[self._random.choice(sample_size, list_count, replace=False)]
+        for _ in range(_KMEANS_ITERATIONS):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            occupied = norms[:, 0] > 0
+            centroids[occupied] = sums[occupied] / norms[occupied]
+        self._centroids = centroids
+        self._assignments[live] = self._assign(self._vectors[live])
+        self._trained_size = len(live)
+
+    def search(
+        self,
+        vector: np.ndarray,
+        limit: int,
+        exclude: UUID | None = None,
+    ) -> list[SimilarMatch]:
+        assignments = self._assignments[: len(self._ids)]
+        if self._centroids is None:
+            candidates = np.flatnonzero(assignments >= 0)
+        else:
+            probes = np.argsort(-(self._centroids @ vector))[: self._probe_count]
+            candidates = np.flatnonzero(np.isin(assignments, probes))
+        scores = self._vectors[candidates].astype(np.float32) @ vector
+        count = min(limit + 1, len(scores))
+        top = np.argpartition(-scores, count - 1)[:count] if count else []
+        matches = [
+            SimilarMatch(self._ids[candidates[index]], float(scores[index]))
+            for index in top
+            if self._ids[candidates[index]] != exclude
+        ]
+        matches.sort(key=lambda match: match.similarity, reverse=True)
+        return matches[:limit]
+
+    def save(self, path: str | Path, **metadata: str) -> None:
+        path = Path(path)
+        count = len(self._ids)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(f".{path.name}.{uuid4().hex}")
+        with open(temp_path, "wb") as index_file:
+            np.savez(
+                index_file,
+                ids=np.array([str(image_id or "") for image_id in self._ids]),
+                vectors=self._vectors[:count],
+                assignments=self._assignments[:count],
+                centroids=(
+                    self._centroids
+                    if self._centroids is not None
+                    else np.zeros((0, self._dimension), dtype=np.float32)
+                ),
+                trained_size=self._trained_size,
+                **{f"metadata_{key}": value for key, value in metadata.items()},
+            )
+        os.replace(temp_path, path)
+
+    def load(self, path: str | Path) -> dict[str, str]:
+        with np.load(path, allow_pickle=False) as data:
+            self._ids = [
+                UUID(image_id) if image_id else None for image_id in data["ids"]
+            ]
+            self._vectors = data["vectors"].astype(np.float16)
+            self._assignments = data["assignments"].astype(np.int32)
+            centroids = data["centroids"]
+            self._centroids = centroids if len(centroids) else None
+            self._trained_size = int(data["trained_size"])
+            metadata = {
+                key.removeprefix("metadata_"): str(data[key])
+                for key in data.files
+                if key.startswith("metadata_")
+            }
+        self._positions = {
+            image_id: position
+            for position, image_id in enumerate(self._ids)
+            if image_id is not None
+        }
+        self._free = [
+            position for position, image_id in enumerate(self._ids) if image_id is None
+        ]
+        return metadata
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        return np.concatenate(
+            [
+                np.argmax(
+                    vectors[start : start + _ASSIGNMENT_BATCH_SIZE].astype(np.float32)
+                    @ self._centroids.T,
+                    axis=1,
+                )
+                for start in range(0, len(vectors), _ASSIGNMENT_BATCH_SIZE)
+            ]
+        )
+
+    def _reserve(self, size: int) -> None:
+        capacity = len(self._vectors)
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2, 1024)
+        vectors = np.zeros((capacity, self._dimension), dtype=np.float16)
+        vectors[: len(self._vectors)] = self._vectors
+        assignments = np.full(capacity, -1, dtype=np.int32)
+        assignments[: len(self._assignments)] = self._assignments
+        self._vectors = vectors
+        self._assignments = assignments
+
+
+class SimilarityIndex:
+    def __init__(
+        self,
+        database: Database,
+        dimension: int,
+        list_count: int,
+        probe_count: int,
+        refresh_interval: float,
+        reconcile_interval: float,
+        location: str | Path | None = None,
+        batch_size: int = 10_000,
+    ) -> None:
+        self._database = database
+        self._refresh_interval = refresh_interval
+        self._reconcile_interval = reconcile_interval
+        self._location = Path(location) if location else None
+        self._batch_size = batch_size
+        self._index = IVFIndex(dimension, list_count, probe_count)
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._synced_until: datetime | None = None
+        self._refreshed_at: float | None = None
+        self._reconciled_at: float | None = None
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def refresh(self, force: bool = False) -> None:
+        with self._refresh_lock:
+            now = time.monotonic()
+            if self._refreshed_at is None:
+                self._load()
+            elif not force and now - self._refreshed_at < self._refresh_interval:
+                return
+            if (
+                force
+                or self._reconciled_at is None
+                or now - self._reconciled_at >= self._reconcile_interval
+            ):
+                self._reconcile()
+                self._reconciled_at = now
+            self._sync()
+            self._refreshed_at = now
+            if self._index.needs_training:
+                with self._lock:
+                    self._index.train()
+                self.save()
+
+    def save(self) -> None:
+        if self._location is None:
+            return
+        metadata = {}
+        if self._synced_until is not None:
+            metadata["synced_until"] = self._synced_until.isoformat()
+        with self._lock:
+            self._index.save(self._location, **metadata)
+
+    def add(self, image_id: UUID, embedding: bytes) -> None:
+        with self._lock:
+            self._index.add(image_id, decode_embedding(embedding))
+
+    def remove(self, image_id: UUID) -> None:
+        with self._lock:
+            self._index.remove(image_id)
+
+    def find(
+        self,
+        image_id: UUID,
+        embedding: bytes,
+        limit: int,
+    ) -> list[SimilarMatch]:
+        with self._lock:
+            return self._index.search(decode_embedding(embedding), limit, image_id)
+
+    def _load(self) -> None:
+        if self._location is None or not self._location.exists():
+            return
+        with self._lock:
+            metadata = self._index.load(self._location)
+        if "synced_until" in metadata:
+            self._synced_until = datetime.fromisoformat(metadata["synced_until"])
+
+    def _sync(self) -> None:
+        query = (
+            select(ImageFile.image_id, ImageFile.embedding, ImageFile.analyzed_at)
+            .where(ImageFile.embedding.is_not(None))
+            .order_by(ImageFile.analyzed_at)
+            .execution_options(yield_per=self._batch_size)
+        )
+        if self._synced_until is not None:
+            query = query.where(
+                ImageFile.analyzed_at >= self._synced_until - _SYNC_OVERLAP
+            )
+        with self._database.session() as session:
+            for image_id, embedding, analyzed_at in session.exec(query):
+                self.add(image_id, embedding)
+                self._synced_until = analyzed_at
+
+    def _reconcile(self) -> None:
+        with self._lock:
+            indexed_ids = self._index.image_ids()
+        if not indexed_ids:
+            return
+        query = (
+            select(ImageFile.image_id)
+            .where(ImageFile.embedding.is_not(None))
+            .execution_options(yield_per=self._batch_size)
+        )
+        with self._database.session() as session:
+            image_ids = set(session.exec(query))
+        with self._lock:
+            for image_id in indexed_ids - image_ids:
+                self._index.remove(image_id)
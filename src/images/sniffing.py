@@ -0,0 +1,153 @@
+import struct
+from typing import NamedTuple
+
+_JPEG_SOF_MARKERS = frozenset(
+    {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+)
+_JPEG_STANDALONE_MARKERS = frozenset({0x01, *range(0xD0, 0xD9)})
+_HEIC_BRANDS = frozenset({b"heic", b"heix", b"heim", b"heis", b"hevc", b"hevx"})
+_BMFF_CONTAINER_BOXES = {b"meta": 4, b"iprp": 0, b"ipco": 0}
+
+
+class ImageHeader(NamedTuple):
+    content_type: str
+    width: int
+    height: int
+
+
+class TruncatedHeader(Exception):
+    pass
+
+
+def _unpack(fmt: str, data: bytes, offset: int) -> tuple:
+    if len(data) < offset + struct.calcsize(fmt):
+        raise TruncatedHeader()
+    return struct.unpack_from(fmt, data, offset)
+
+
+def _sniff_png(data: bytes) -> ImageHeader | None:
+    (chunk_type,) = _unpack("4s", data, 12)
+    if chunk_type != b"IHDR":
+        return None
+    width, height = _unpack(">II", data, 16)
+    return ImageHeader("image/png", width, height)
+
+
+def _sniff_gif(data: bytes) -> ImageHeader:
+    width, height = _unpack("<HH", data, 6)
+    return ImageHeader("image/gif", width, height)
+
+
+def _sniff_bmp(data: bytes) -> ImageHeader:
+    (dib_header_size,) = _unpack("<I", data, 14)
+    if dib_header_size == 12:
+        width, height = _unpack("<HH", data, 18)
+    else:
+        width, height = _unpack("<ii", data, 18)
+    return ImageHeader("image/bmp", width, abs(height))
+
+
+def _sniff_webp(data: bytes) -> ImageHeader | None:
+    (chunk_type,) = _unpack("4s", data, 12)
+    if chunk_type == b"VP8 ":
+        (start_code,) = _unpack("3s", data, 23)
+        if start_code != b"\x9d\x01\x2a":
+            return None
+        width, height = _unpack("<HH", data, 26)
+        return ImageHeader("image/webp", width & 0x3FFF, height & 0x3FFF)
+    if chunk_type == b"VP8L":
+        signature, bits = _unpack("<BI", data, 20)
+        if signature != 0x2F:
+            return None
+        return ImageHeader(
+            "image/webp", (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        )
+    if chunk_type == b"VP8X":
+        size = _unpack("6B", data, 24)
+        width = size[0] | size[1] << 8 | size[2] << 16
+        height = size[3] | size[4] << 8 | size[5] << 16
+        return ImageHeader("image/webp", width + 1, height + 1)
+    return None
+
+
+def _sniff_jpeg(data: bytes) -> ImageHeader | None:
+    offset = 2
+    while True:
+        (marker_prefix,) = _unpack("B", data, offset)
+        if marker_prefix != 0xFF:
+            return None
+        (marker,) = _unpack("B", data, offset + 1)
+        if marker == 0xFF:
+            offset += 1
+        elif marker in _JPEG_SOF_MARKERS:
+            height, width = _unpack(">HH", data, offset + 5)
+            return ImageHeader("image/jpeg", width, height)
+        elif marker in _JPEG_STANDALONE_MARKERS:
+            offset += 2
+        elif marker == 0xD9:
+            return None
+        else:
+            (length,) = _unpack(">H", data, offset + 2)
+            if length < 2:
+                return None
+            offset += 2 + length
+
+
+def _iter_bmff_boxes(data: bytes, start: int, end: int):
+    offset = start
+    while offset < end:
+        size, box_type = _unpack(">I4s", data, offset)
+        header_size = 8
+        if size == 1:
+            (size,) = _unpack(">Q", data, offset + 8)
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size:
+            return
+        yield box_type, offset + header_size, offset + size
+        offset += size
+
+
+def _find_bmff_sizes(data: bytes, start: int, end: int) -> list[tuple[int, int]]:
+    sizes = []
+    for box_type, body_start, body_end in _iter_bmff_boxes(data, start, end):
+        if box_type == b"ispe":
+            sizes.append(_unpack(">II", data, body_start + 4))
+        elif box_type in _BMFF_CONTAINER_BOXES:
+            children_start = body_start + _BMFF_CONTAINER_BOXES[box_type]
+            sizes.extend(_find_bmff_sizes(data, children_start, body_end))
+            if box_type == b"meta":
+                break
+    return sizes
+
+
+def _sniff_heic(data: bytes) -> ImageHeader | None:
+    (ftyp_size,) = _unpack(">I", data, 0)
+    _unpack(f"{ftyp_size}s", data, 0)
+    brands = {data[offset : offset + 4] for offset in range(8, ftyp_size, 4)}
+    if not brands & _HEIC_BRANDS:
+        return None
+    sizes = _find_bmff_sizes(data, ftyp_size, 2**63)
+    if not sizes:
+        raise TruncatedHeader()
+    width, height = max(sizes, key=lambda size: size[0] * size[1])
+    return ImageHeader("image/heic", width, height)
+
+
+def sniff_image_header(data: bytes) -> ImageHeader | None:
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return _sniff_png(data)
+    if data.startswith(b"\xff\xd8\xff"):
+        return _sniff_jpeg(data)
+    if data.startswith((b"GIF87a", b"GIF89a")):
+        return _sniff_gif(data)
+    if data.startswith(b"BM"):
+        return _sniff_bmp(data)
+    if data.startswith(b"RIFF") and data[8:12] == b"WEBP":
+        return _sniff_webp(data)
+    if data[4:8] == b"ftyp":
+        return _sniff_heic(data)
+    if len(data) < 12:
+        raise TruncatedHeader()
+    return None
@@ -0,0 +1,21 @@
+import mmap
+from contextlib import contextmanager
+from io import BytesIO
+from pathlib import Path
+from typing import Iterator
+
+from PIL import Image as PILImage
+
+ImageSource = bytes | str | Path
+
+
+@contextmanager
+def open_image(source: ImageSource) -> Iterator[PILImage.Image]:
+    if isinstance(source, bytes):
+        with PILImage.open(BytesIO(source)) as image:
+            yield image
+        return
+    with open(source, "rb") as source_file:
+        with mmap.mmap(source_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            with PILImage.open(mapped) as image:
+                yield image
@@ -1,25 +1,105 @@
 import os
+import re
+import shutil
 from abc import ABCMeta, abstractmethod
-from tempfile import SpooledTemporaryFile
-from uuid import UUID
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, Iterable, Iterator, Literal, NamedTuple
+from urllib.parse import quote
+from uuid import UUID, uuid4
 
 import aiofiles
-from fastapi import Response, UploadFile
-from fastapi.responses import FileResponse
+import aiofiles.os
+from aiofiles.threadpool.binary import AsyncBufferedReader
+from fastapi import Response, UploadFile, status
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
 
+from .conditional import ByteRange
 from .exceptions import ImageNotFound
-from .models import ImageFile
+from .models import ImageFile, ImageVariant
+from .sources import ImageSource
+from .upload import stream_upload
+
+ServingMode = Literal["direct", "x_accel_redirect", "x_sendfile"]
 
-_TEMP_FILE_MAX_SIZE = 1_048_576
 _CHUNK_SIZE = 1_048_576
+_VARIANTS_DIRECTORY = "variants"
+_BLOBS_DIRECTORY = "blobs"
+_TEMP_DIRECTORY = "tmp"
+_BLOB_NAME_PATTERN = re.compile("[0-9a-f]{64}")
+_TEMP_SUFFIX_PATTERN = re.compile("[0-9a-f]{32}")
+
+
+class StoredFile(NamedTuple):
+    cursor: str
+    name: str
+    size: int
+    modified_at: datetime
+
+
+def is_image_name(name: str) -> bool:
+    try:
+        return str(UUID(name)) == name
+    except ValueError:
+        return False
+
+
+def is_temp_name(name: str) -> bool:
+    image_name, _, suffix = name.partition(".")
+    return is_image_name(image_name) and bool(_TEMP_SUFFIX_PATTERN.fullmatch(suffix))
 
 
-async def copy_to_temp_file(file: UploadFile) -> SpooledTemporaryFile:
-    await file.seek(0)
-    temp_file = SpooledTemporaryFile(_TEMP_FILE_MAX_SIZE)
-    while chunk := await file.read(_CHUNK_SIZE):
-        temp_file.write(chunk)
-    return temp_file
+def content_disposition(filename: str) -> str:
+    quoted_filename = quote(filename)
+    if quoted_filename != filename:
+        return f"attachment; filename*=utf-8''{quoted_filename}"
+    return f'attachment; filename="{filename}"'
+
+
+def file_response(
+    path: str,
+    media_type: str,
+    size: int,
+    byte_range: ByteRange | None,
+    filename: str | None = None,
+) -> Response:
+    if byte_range is None:
+        return FileResponse(path, media_type=media_type, filename=filename)
+    return StreamingResponse(
+        _read_file_range(path, byte_range),
+        status_code=status.HTTP_206_PARTIAL_CONTENT,
+        media_type=media_type,
+        headers={
+            "Content-Length": str(byte_range.length),
+            "Content-Range": f"bytes {byte_range.start}-{byte_range.end}/{size}",
+        },
+    )
+
+
+def open_file_response(
+    open_file: AsyncBufferedReader,
+    media_type: str,
+    size: int,
+    byte_range: ByteRange | None,
+    filename: str | None = None,
+    headers: dict[str, str] | None = None,
+) -> Response:
+    headers = dict(headers or {})
+    status_code = status.HTTP_200_OK
+    start, length = 0, size
+    if byte_range is not None:
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        start, length = byte_range.start, byte_range.length
+        headers["Content-Range"] = f"bytes {byte_range.start}-{byte_range.end}/{size}"
+    elif filename is not None:
+        headers["Content-Disposition"] = content_disposition(filename)
+    headers["Content-Length"] = str(length)
+    return StreamingResponse(
+        _stream_open_file(open_file, start, length),
+        status_code=status_code,
+        media_type=media_type,
+        headers=headers,
+    )
 
 
 class ImageStorage(metaclass=ABCMeta):
@@ -28,13 +108,70 @@ class ImageStorage(metaclass=ABCMeta):
         ...
 
     @abstractmethod
-    async def load_image(self, file_metadata: ImageFile) -> Response:
+    async def load_image(
+        self,
+        file_metadata: ImageFile,
+        byte_range: ByteRange | None = None,
+    ) -> Response:
+        ...
+
+    @abstractmethod
+    async def read_image(self, file_metadata: ImageFile) -> bytes:
+        ...
+
+    async def iter_image(self, file_metadata: ImageFile) -> AsyncIterator[bytes]:
+        yield await self.read_image(file_metadata)
+
+    async def get_image_source(self, file_metadata: ImageFile) -> ImageSource:
+        return await self.read_image(file_metadata)
+
+    @abstractmethod
+    async def get_image_size(self, file_metadata: ImageFile) -> int | None:
+        ...
+
+    @abstractmethod
+    def list_images(self, after: str | None = None) -> AsyncIterator[StoredFile]:
         ...
 
     @abstractmethod
     async def delete_image(self, file_metadata: ImageFile) -> None:
         ...
 
+    @abstractmethod
+    async def delete_images(self, files: Iterable[ImageFile]) -> None:
+        ...
+
+    @abstractmethod
+    async def delete_stored_files(self, stored_files: Iterable[StoredFile]) -> None:
+        ...
+
+    @abstractmethod
+    async def save_variant(self, variant: ImageVariant, content: bytes) -> None:
+        ...
+
+    @abstractmethod
+    async def copy_variant(
+        self,
+        variant: ImageVariant,
+        image_id: str | UUID,
+    ) -> ImageVariant:
+        ...
+
+    @abstractmethod
+    async def read_variant(self, variant: ImageVariant) -> bytes:
+        ...
+
+    async def iter_variant(self, variant: ImageVariant) -> AsyncIterator[bytes]:
+        yield await self.read_variant(variant)
+
+    @abstractmethod
+    async def load_variant(
+        self,
+        variant: ImageVariant,
+        byte_range: ByteRange | None = None,
+    ) -> Response:
+        ...
+
     def extract_file_metadata(self, image_id: str, file: UploadFile) -> ImageFile:
         return ImageFile(
             image_id=image_id,
@@ -44,33 +181,428 @@ class ImageStorage(metaclass=ABCMeta):
         )
 
 
+class BlobStorage(ImageStorage):
+    @abstractmethod
+    def list_blobs(self, after: str | None = None) -> AsyncIterator[StoredFile]:
+        ...
+
+    @abstractmethod
+    async def delete_blob(self, content_hash: str) -> None:
+        ...
+
+
 class LocalImageStorage(ImageStorage):
-    def __init__(self, storage_location: str) -> None:
+    def __init__(
+        self,
+        storage_location: str,
+        serving_mode: ServingMode = "direct",
+        internal_location: str = "/",
+        shard_depth: int = 2,
+        shard_width: int = 2,
+    ) -> None:
         self.storage_location = storage_location
+        self._serving_mode = serving_mode
+        self._internal_location = internal_location.rstrip("/") + "/"
+        self._shard_depth = shard_depth
+        self._shard_width = shard_width
 
     async def save_image(self, image_id: str, uploaded_file: UploadFile) -> ImageFile:
         file_metadata = self.extract_file_metadata(image_id, uploaded_file)
         image_path = self._get_image_path(image_id)
-        async with aiofiles.open(image_path, "wb") as local_file:
-            while chunk := await uploaded_file.read(_CHUNK_SIZE):
-                await local_file.write(chunk)
+        temp_path = f"{self._get_legacy_image_path(image_id)}.{uuid4().hex}"
+        try:
+            await self._write_upload(temp_path, uploaded_file, file_metadata)
+            await aiofiles.os.makedirs(os.path.dirname(image_path), exist_ok=True)
+            await aiofiles.os.replace(temp_path, image_path)
+        finally:
+            if await aiofiles.os.path.exists(temp_path):
+                await aiofiles.os.remove(temp_path)
         return file_metadata
 
-    async def load_image(self, file_metadata: ImageFile) -> Response:
-        image_path = self._get_image_path(file_metadata.image_id)
-        if not os.path.exists(image_path):
-            raise ImageNotFound()
-        return FileResponse(
-            image_path,
-            media_type=file_metadata.content_type,
+    async def load_image(
+        self,
+        file_metadata: ImageFile,
+        byte_range: ByteRange | None = None,
+    ) -> Response:
+        return await self._file_response(
+            await self._get_file_path(file_metadata),
+            file_metadata.content_type,
+            file_metadata.size,
+            byte_range,
             filename=file_metadata.filename,
         )
 
+    async def read_image(self, file_metadata: ImageFile) -> bytes:
+        image_path = await self._get_file_path(file_metadata)
+        try:
+            async with aiofiles.open(image_path, "rb") as local_file:
+                return await local_file.read()
+        except FileNotFoundError as exc:
+            raise ImageNotFound() from exc
+
+    async def get_image_source(self, file_metadata: ImageFile) -> ImageSource:
+        image_path = await self._get_file_path(file_metadata)
+        if not await aiofiles.os.path.exists(image_path):
+            raise ImageNotFound()
+        return os.path.abspath(image_path)
+
+    async def get_image_size(self, file_metadata: ImageFile) -> int | None:
+        try:
+            image_stat = await aiofiles.os.stat(
+                await self._get_file_path(file_metadata)
+            )
+        except FileNotFoundError:
+            return None
+        return image_stat.st_size
+
+    def list_images(self, after: str | None = None) -> AsyncIterator[StoredFile]:
+        return iterate_in_threadpool(
+            _walk_files(
+                self.storage_location,
+                self._shard_depth,
+                self._shard_width,
+                lambda name: is_image_name(name) or is_temp_name(name),
+                after,
+            )
+        )
+
     async def delete_image(self, file_metadata: ImageFile) -> None:
-        image_path = self._get_image_path(file_metadata.image_id)
-        if not os.path.exists(image_path):
+        if not await run_in_threadpool(self._delete_files, file_metadata.image_id):
             raise ImageNotFound()
-        os.remove(image_path)
+
+    async def delete_images(self, files: Iterable[ImageFile]) -> None:
+        image_ids = [file_metadata.image_id for file_metadata in files]
+        await run_in_threadpool(self._delete_all_files, image_ids)
+
+    async def delete_stored_files(self, stored_files: Iterable[StoredFile]) -> None:
+        for stored_file in stored_files:
+            try:
+                await aiofiles.os.remove(
+                    os.path.join(self.storage_location, *stored_file.cursor.split("/"))
+                )
+            except FileNotFoundError:
+                continue
+
+    async def save_variant(self, variant: ImageVariant, content: bytes) -> None:
+        await aiofiles.os.makedirs(
+            self._get_variants_directory(variant.image_id),
+            exist_ok=True,
+        )
+        variant_path = self._get_variant_path(variant)
+        temp_path = f"{variant_path}.{uuid4().hex}"
+        async with aiofiles.open(temp_path, "wb") as local_file:
+            await local_file.write(content)
+        await aiofiles.os.replace(temp_path, variant_path)
+
+    async def copy_variant(
+        self,
+        variant: ImageVariant,
+        image_id: str | UUID,
+    ) -> ImageVariant:
+        copied_variant = ImageVariant(
+            **variant.model_dump(exclude={"image_id"}),
+            image_id=image_id,
+        )
+        await aiofiles.os.makedirs(
+            self._get_variants_directory(image_id),
+            exist_ok=True,
+        )
+        await run_in_threadpool(
+            _link_file,
+            await self._find_variant_path(variant),
+            self._get_variant_path(copied_variant),
+        )
+        return copied_variant
+
+    async def read_variant(self, variant: ImageVariant) -> bytes:
+        try:
+            async with aiofiles.open(
+                await self._find_variant_path(variant), "rb"
+            ) as local_file:
+                return await local_file.read()
+        except FileNotFoundError as exc:
+            raise ImageNotFound() from exc
+
+    async def load_variant(
+        self,
+        variant: ImageVariant,
+        byte_range: ByteRange | None = None,
+    ) -> Response:
+        return await self._file_response(
+            await self._find_variant_path(variant),
+            variant.content_type,
+            variant.size,
+            byte_range,
+        )
+
+    async def _file_response(
+        self,
+        path: str,
+        media_type: str,
+        size: int,
+        byte_range: ByteRange | None,
+        filename: str | None = None,
+    ) -> Response:
+        if not await aiofiles.os.path.exists(path):
+            raise ImageNotFound()
+        if self._serving_mode != "direct":
+            return self._offloaded_response(path, media_type, filename)
+        return file_response(path, media_type, size, byte_range, filename)
+
+    def _offloaded_response(
+        self,
+        path: str,
+        media_type: str,
+        filename: str | None,
+    ) -> Response:
+        if self._serving_mode == "x_accel_redirect":
+            relative_path = os.path.relpath(path, self.storage_location)
+            headers = {
+                "X-Accel-Redirect": self._internal_location
+                + quote(relative_path.replace(os.sep, "/"))
+            }
+        else:
+            headers = {"X-Sendfile": os.path.abspath(path)}
+        if filename is not None:
+            headers["Content-Disposition"] = content_disposition(filename)
+        return Response(media_type=media_type, headers=headers)
+
+    async def _write_upload(
+        self,
+        path: str,
+        uploaded_file: UploadFile,
+        file_metadata: ImageFile,
+    ) -> None:
+        async with aiofiles.open(path, "wb") as local_file:
+            await stream_upload(uploaded_file, file_metadata, local_file.write)
+
+    def migrate_image(self, image_id: str | UUID) -> bool:
+        migrated = False
+        legacy_path = self._get_legacy_image_path(image_id)
+        if os.path.exists(legacy_path):
+            image_path = self._get_image_path(image_id)
+            os.makedirs(os.path.dirname(image_path), exist_ok=True)
+            os.replace(legacy_path, image_path)
+            migrated = True
+        legacy_variants_directory = self._get_legacy_variants_directory(image_id)
+        if os.path.isdir(legacy_variants_directory):
+            variants_directory = self._get_variants_directory(image_id)
+            os.makedirs(variants_directory, exist_ok=True)
+            for entry in os.scandir(legacy_variants_directory):
+                destination = os.path.join(variants_directory, entry.name)
+                if not os.path.exists(destination):
+                    os.replace(entry.path, destination)
+            shutil.rmtree(legacy_variants_directory, True)
+            migrated = True
+        return migrated
+
+    def _delete_all_files(self, image_ids: list[str | UUID]) -> None:
+        for image_id in image_ids:
+            self._delete_files(image_id)
+
+    def _delete_files(self, image_id: str | UUID) -> bool:
+        deleted = False
+        for image_path in (
+            self._get_image_path(image_id),
+            self._get_legacy_image_path(image_id),
+        ):
+            try:
+                os.remove(image_path)
+            except FileNotFoundError:
+                continue
+            deleted = True
+        shutil.rmtree(self._get_variants_directory(image_id), True)
+        shutil.rmtree(self._get_legacy_variants_directory(image_id), True)
+        return deleted
+
+    async def _get_file_path(self, file_metadata: ImageFile) -> str:
+        return await _resolve_path(
+            self._get_image_path(file_metadata.image_id),
+            self._get_legacy_image_path(file_metadata.image_id),
+        )
+
+    def _get_shards(self, name: str) -> list[str]:
+        return [
+            name[level * self._shard_width : (level + 1) * self._shard_width]
+            for level in range(self._shard_depth)
+        ]
 
     def _get_image_path(self, image_id: str | UUID) -> str:
+        name = str(image_id)
+        return os.path.join(self.storage_location, *self._get_shards(name), name)
+
+    def _get_legacy_image_path(self, image_id: str | UUID) -> str:
         return os.path.join(self.storage_location, str(image_id))
+
+    def _get_variants_directory(self, image_id: str | UUID) -> str:
+        name = str(image_id)
+        return os.path.join(
+            self.storage_location,
+            _VARIANTS_DIRECTORY,
+            *self._get_shards(name),
+            name,
+        )
+
+    def _get_legacy_variants_directory(self, image_id: str | UUID) -> str:
+        return os.path.join(self.storage_location, _VARIANTS_DIRECTORY, str(image_id))
+
+    def _get_variant_path(self, variant: ImageVariant) -> str:
+        return os.path.join(
+            self._get_variants_directory(variant.image_id),
+            f"{variant.dimension}.{variant.format}",
+        )
+
+    async def _find_variant_path(self, variant: ImageVariant) -> str:
+        return await _resolve_path(
+            self._get_variant_path(variant),
+            os.path.join(
+                self._get_legacy_variants_directory(variant.image_id),
+                f"{variant.dimension}.{variant.format}",
+            ),
+        )
+
+
+class ContentAddressedImageStorage(LocalImageStorage, BlobStorage):
+    async def save_image(self, image_id: str, uploaded_file: UploadFile) -> ImageFile:
+        file_metadata = self.extract_file_metadata(image_id, uploaded_file)
+        temp_directory = os.path.join(self.storage_location, _TEMP_DIRECTORY)
+        await aiofiles.os.makedirs(temp_directory, exist_ok=True)
+        temp_path = os.path.join(temp_directory, uuid4().hex)
+        try:
+            await self._write_upload(temp_path, uploaded_file, file_metadata)
+            blob_path = self._get_blob_path(file_metadata.content_hash)
+            await aiofiles.os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            await aiofiles.os.replace(temp_path, blob_path)
+        finally:
+            if await aiofiles.os.path.exists(temp_path):
+                await aiofiles.os.remove(temp_path)
+        return file_metadata
+
+    async def delete_image(self, file_metadata: ImageFile) -> None:
+        if not await aiofiles.os.path.exists(await self._get_file_path(file_metadata)):
+            raise ImageNotFound()
+        await run_in_threadpool(self._delete_files, file_metadata.image_id)
+
+    def list_blobs(self, after: str | None = None) -> AsyncIterator[StoredFile]:
+        return iterate_in_threadpool(
+            _walk_files(
+                os.path.join(self.storage_location, _BLOBS_DIRECTORY),
+                1,
+                2,
+                _BLOB_NAME_PATTERN.fullmatch,
+                after,
+            )
+        )
+
+    async def delete_blob(self, content_hash: str) -> None:
+        try:
+            await aiofiles.os.remove(self._get_blob_path(content_hash))
+        except FileNotFoundError:
+            pass
+
+    async def _get_file_path(self, file_metadata: ImageFile) -> str:
+        if file_metadata.content_hash is not None:
+            blob_path = self._get_blob_path(file_metadata.content_hash)
+            if await aiofiles.os.path.exists(blob_path):
+                return blob_path
+        return await super()._get_file_path(file_metadata)
+
+    def _get_blob_path(self, content_hash: str) -> str:
+        return os.path.join(
+            self.storage_location,
+            _BLOBS_DIRECTORY,
+            content_hash[:2],
+            content_hash,
+        )
+
+
+async def _resolve_path(path: str, legacy_path: str) -> str:
+    if await aiofiles.os.path.exists(path):
+        return path
+    if await aiofiles.os.path.exists(legacy_path):
+        return legacy_path
+    return path
+
+
+def _walk_files(
+    directory: str,
+    shard_depth: int,
+    shard_width: int,
+    is_valid_name: Callable[[str], object],
+    after: str | None,
+    parents: tuple[str, ...] = (),
+) -> Iterator[StoredFile]:
+    after_parts = tuple(after.split("/")) if after else ()
+    try:
+        entries = sorted(os.scandir(directory), key=lambda entry: entry.name)
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        parts = (*parents, entry.name)
+        if parts < after_parts[: len(parts)]:
+            continue
+        if entry.is_dir(follow_symlinks=False):
+            if len(parents) < shard_depth and len(entry.name) == shard_width:
+                yield from _walk_files(
+                    entry.path,
+                    shard_depth,
+                    shard_width,
+                    is_valid_name,
+                    after,
+                    parts,
+                )
+        elif is_valid_name(entry.name) and parts > after_parts:
+            try:
+                entry_stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            yield StoredFile(
+                "/".join(parts),
+                entry.name,
+                entry_stat.st_size,
+                datetime.fromtimestamp(entry_stat.st_mtime, timezone.utc),
+            )
+
+
+def _link_file(source: str, destination: str) -> None:
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+async def _read_file_range(path: str, byte_range: ByteRange) -> AsyncIterator[bytes]:
+    async with aiofiles.open(path, "rb") as local_file:
+        async for chunk in _read_open_file(
+            local_file, byte_range.start, byte_range.length
+        ):
+            yield chunk
+
+
+async def _stream_open_file(
+    open_file: AsyncBufferedReader,
+    start: int,
+    length: int,
+) -> AsyncIterator[bytes]:
+    try:
+        async for chunk in _read_open_file(open_file, start, length):
+            yield chunk
+    finally:
+        await open_file.close()
+
+
+async def _read_open_file(
+    open_file: AsyncBufferedReader,
+    start: int,
+    length: int,
+) -> AsyncIterator[bytes]:
+    remaining = length
+    await open_file.seek(start)
+    while remaining > 0:
+        chunk = await open_file.read(min(_CHUNK_SIZE, remaining))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+        yield chunk
@@ -0,0 +1,59 @@
+import numpy as np
+from PIL import Image as PILImage
+from PIL import ImageOps
+from pydantic import BaseModel
+
+from .analysis import ImageAnalysis, analyze_pixels, downscale_image, image_pixels
+from .sources import ImageSource, open_image
+from .variants import EncodedVariant, render_variants
+
+_DRAFT_FORMATS = ("JPEG",)
+
+
+class ProcessingResult(BaseModel):
+    analysis: ImageAnalysis
+    variants: list[EncodedVariant]
+
+
+def process_image_source(
+    source: ImageSource,
+    palette_color_count: int,
+    max_dimension: int | None,
+    variant_dimensions: list[int],
+    variant_formats: list[str],
+    variant_quality: int,
+) -> ProcessingResult:
+    with open_image(source) as image:
+        width, height = image.size
+        decode_analysis_image = bool(max_dimension) and image.format in _DRAFT_FORMATS
+        if max_dimension and variant_dimensions:
+            image.draft(None, (max(variant_dimensions),) * 2)
+        image = ImageOps.exif_transpose(image)
+        variants = render_variants(
+            image,
+            variant_dimensions,
+            variant_formats,
+            variant_quality,
+        )
+        if not decode_analysis_image:
+            pixels = _analysis_pixels(image, max_dimension)
+    if decode_analysis_image:
+        pixels = _analysis_pixels(
+            _decode_oriented(source, max_dimension), max_dimension
+        )
+    return ProcessingResult(
+        analysis=analyze_pixels(width, height, pixels, palette_color_count),
+        variants=variants,
+    )
+
+
+def _decode_oriented(source: ImageSource, max_dimension: int) -> PILImage.Image:
+    with open_image(source) as image:
+        image.draft(None, (max_dimension, max_dimension))
+        return ImageOps.exif_transpose(image)
+
+
+def _analysis_pixels(image: PILImage.Image, max_dimension: int | None) -> np.ndarray:
+    if max_dimension:
+        image = downscale_image(image, max_dimension)
+    return image_pixels(image)
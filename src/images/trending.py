@@ -0,0 +1,115 @@
+import math
+from datetime import datetime, timedelta
+from typing import Sequence
+
+from sqlalchemy import Row
+from sqlmodel import Session, func, select, update
+
+from ..db.service import Database
+from ..users.models import UserImageLikes
+from .models import Image, TrendingImage
+
+_EPOCH = datetime(2024, 1, 1)
+_MIN_SCORE = 1e-6
+_SYNC_OVERLAP = timedelta(minutes=1)
+
+
+class TrendingScores:
+    def __init__(
+        self,
+        database: Database,
+        half_life: float,
+        min_score: float,
+        batch_size: int = 1000,
+    ) -> None:
+        self._database = database
+        self._decay_rate = math.log(2) / half_life
+        self._min_score = min_score
+        self._batch_size = batch_size
+
+    def get_threshold(self, now: datetime) -> float:
+        return self._to_rank(self._min_score, now)
+
+    def get_score(self, rank: float, now: datetime) -> float:
+        return math.exp(rank - self._decay_rate * (now - _EPOCH).total_seconds())
+
+    def refresh(self, now: datetime | None = None) -> int:
+        now = now or datetime.utcnow()
+        with self._database.session() as session:
+            synced_until = session.exec(
+                select(func.max(TrendingImage.likes_updated_at))
+            ).one()
+            query = (
+                select(Image.id, Image.like_count, Image.likes_updated_at)
+                .where(Image.likes_updated_at.is_not(None))
+                .order_by(Image.likes_updated_at, Image.id)
+            )
+            if synced_until is not None:
+                query = query.where(
+                    Image.likes_updated_at >= synced_until - _SYNC_OVERLAP
+                )
+            changes = session.exec(query).all()
+            updated = 0
+            for start in range(0, len(changes), self._batch_size):
+                batch = changes[start : start + self._batch_size]
+                updated += self._apply(session, batch, now)
+                session.commit()
+        return updated
+
+    def _apply(self, session: Session, batch: Sequence[Row], now: datetime) -> int:
+        trending = {
+            row.image_id: row
+            for row in session.exec(
+                select(TrendingImage).where(
+                    TrendingImage.image_id.in_([image_id for image_id, _, _ in batch])
+                )
+            )
+        }
+        updated = 0
+        for image_id, like_count, likes_updated_at in batch:
+            row = trending.get(image_id)
+            if row is None:
+                row = TrendingImage(
+                    image_id=image_id,
+                    score=self._to_rank(_MIN_SCORE, now),
+                    like_count=0,
+                    likes_updated_at=likes_updated_at,
+                )
+                session.add(row)
+            row.likes_updated_at = likes_updated_at
+            if like_count == row.like_count:
+                continue
+            score = self.get_score(row.score, now) + like_count - row.like_count
+            row.score = self._to_rank(max(score, _MIN_SCORE), now)
+            row.like_count = like_count
+            updated += 1
+        return updated
+
+    def _to_rank(self, score: float, now: datetime) -> float:
+        return math.log(score) + self._decay_rate * (now - _EPOCH).total_seconds()
+
+
+def reconcile_like_counts(database: Database, batch_size: int = 1000) -> int:
+    like_count = (
+        select(func.count())
+        .where(UserImageLikes.image_id == Image.id)
+        .scalar_subquery()
+    )
+    fixed = 0
+    last_id = None
+    with database.session() as session:
+        while True:
+            query = select(Image.id).order_by(Image.id).limit(batch_size)
+            if last_id is not None:
+                query = query.where(Image.id > last_id)
+            image_ids = session.exec(query).all()
+            if not image_ids:
+                return fixed
+            result = session.exec(
+                update(Image)
+                .where(Image.id.in_(image_ids), Image.like_count != like_count)
+                .values(like_count=like_count, likes_updated_at=datetime.utcnow())
+            )
+            session.commit()
+            fixed += result.rowcount
+            last_id = image_ids[-1]
@@ -0,0 +1,97 @@
+import hashlib
+from typing import Awaitable, Callable, Protocol
+
+from fastapi import UploadFile
+
+from .constants import IMAGE_MIME_TYPE_ALIASES
+from .exceptions import InvalidImage
+from .models import ImageFile
+from .sniffing import ImageHeader, TruncatedHeader, sniff_image_header
+
+UPLOAD_CHUNK_SIZE = 1_048_576
+SNIFF_MAX_HEADER_SIZE = 1_048_576
+
+
+class ChunkConsumer(Protocol):
+    def update(self, chunk: bytes) -> None:
+        ...
+
+
+class UploadDigest:
+    def __init__(self) -> None:
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    def update(self, chunk: bytes) -> None:
+        self._hash.update(chunk)
+        self.size += len(chunk)
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+class HeaderSniffer:
+    def __init__(self, declared_content_type: str | None) -> None:
+        self._declared_content_type = IMAGE_MIME_TYPE_ALIASES.get(
+            declared_content_type, declared_content_type
+        )
+        self._buffer = bytearray()
+        self._header: ImageHeader | None = None
+
+    def update(self, chunk: bytes) -> None:
+        if self._header is not None:
+            return
+        self._buffer += chunk[: SNIFF_MAX_HEADER_SIZE - len(self._buffer)]
+        try:
+            self._header = self._sniff()
+        except TruncatedHeader:
+            if len(self._buffer) >= SNIFF_MAX_HEADER_SIZE:
+                raise InvalidImage()
+        else:
+            self._buffer.clear()
+
+    def result(self) -> ImageHeader:
+        if self._header is None:
+            try:
+                self._header = self._sniff()
+            except TruncatedHeader:
+                raise InvalidImage()
+        return self._header
+
+    def _sniff(self) -> ImageHeader:
+        header = sniff_image_header(bytes(self._buffer))
+        if header is None or not header.width or not header.height:
+            raise InvalidImage()
+        if header.content_type != self._declared_content_type:
+            raise InvalidImage(
+                f"Image content does not match declared type "
+                f"{self._declared_content_type}"
+            )
+        return header
+
+
+async def tee_upload(
+    uploaded_file: UploadFile,
+    write: Callable[[bytes], Awaitable[object]],
+    *consumers: ChunkConsumer,
+) -> None:
+    while chunk := await uploaded_file.read(UPLOAD_CHUNK_SIZE):
+        for consumer in consumers:
+            consumer.update(chunk)
+        await write(chunk)
+
+
+async def stream_upload(
+    uploaded_file: UploadFile,
+    file_metadata: ImageFile,
+    write: Callable[[bytes], Awaitable[object]],
+) -> None:
+    sniffer = HeaderSniffer(file_metadata.content_type)
+    digest = UploadDigest()
+    await tee_upload(uploaded_file, write, sniffer, digest)
+    image_header = sniffer.result()
+    file_metadata.content_type = image_header.content_type
+    file_metadata.width = image_header.width
+    file_metadata.height = image_header.height
+    file_metadata.content_hash = digest.hexdigest()
+    file_metadata.size = digest.size
@@ -0,0 +1,125 @@
+from io import BytesIO
+from typing import Iterable, Literal
+
+from PIL import Image as PILImage
+from PIL import ImageOps
+from pydantic import BaseModel
+
+from .analysis import downscale_image
+from .constants import MAX_TRANSFORM_DIMENSION
+from .sources import ImageSource, open_image
+
+_BACKGROUND_COLOR = (255, 255, 255)
+_EXIF_ORIENTATION_TAG = 0x0112
+_TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+Fit = Literal["contain", "cover", "fill"]
+
+
+class EncodedVariant(BaseModel):
+    dimension: int
+    format: str
+    width: int
+    height: int
+    content: bytes
+
+
+def normalize_mode(image: PILImage.Image) -> PILImage.Image:
+    if image.mode in ("RGB", "RGBA"):
+        return image
+    if image.has_transparency_data:
+        return image.convert("RGBA")
+    return image.convert("RGB")
+
+
+def encode_image(image: PILImage.Image, image_format: str, quality: int) -> bytes:
+    if image_format == "jpeg" and image.mode == "RGBA":
+        background = PILImage.new("RGB", image.size, _BACKGROUND_COLOR)
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    buffer = BytesIO()
+    image.save(buffer, format=image_format.upper(), quality=quality)
+    return buffer.getvalue()
+
+
+def render_variants(
+    image: PILImage.Image,
+    dimensions: Iterable[int],
+    formats: Iterable[str],
+    quality: int,
+) -> list[EncodedVariant]:
+    variants = []
+    source = normalize_mode(image)
+    for dimension in sorted(dimensions, reverse=True):
+        if dimension > max(image.size):
+            continue
+        source = downscale_image(source, dimension, PILImage.Resampling.LANCZOS)
+        for image_format in formats:
+            variants.append(
+                EncodedVariant(
+                    dimension=dimension,
+                    format=image_format,
+                    width=source.width,
+                    height=source.height,
+                    content=encode_image(source, image_format, quality),
+                )
+            )
+    return variants
+
+
+def oriented_size(image: PILImage.Image) -> tuple[int, int]:
+    orientation = image.getexif().get(_EXIF_ORIENTATION_TAG)
+    if orientation in _TRANSPOSED_ORIENTATIONS:
+        return image.height, image.width
+    return image.size
+
+
+def fit_size(
+    size: tuple[int, int],
+    width: int | None,
+    height: int | None,
+    fit: Fit,
+) -> tuple[int, int]:
+    original_width, original_height = size
+    if width is None and height is None:
+        return size
+    if width is None or height is None:
+        scale = width / original_width if width else height / original_height
+        if fit == "contain":
+            scale = min(scale, 1)
+        scale = min(scale, MAX_TRANSFORM_DIMENSION / max(size))
+    elif fit == "fill":
+        return width, height
+    elif fit == "cover":
+        scale = max(width / original_width, height / original_height)
+    else:
+        scale = min(width / original_width, height / original_height, 1)
+    return (
+        max(round(original_width * scale), 1),
+        max(round(original_height * scale), 1),
+    )
+
+
+def transform_image(
+    source: ImageSource,
+    width: int | None,
+    height: int | None,
+    fit: Fit,
+    image_format: str,
+    quality: int,
+) -> bytes:
+    with open_image(source) as image:
+        size = oriented_size(image)
+        scaled_size = fit_size(size, width, height, fit)
+        draft_size = scaled_size if size == image.size else scaled_size[::-1]
+        image.draft(None, draft_size)
+        image = normalize_mode(ImageOps.exif_transpose(image))
+        if fit == "cover" and width and height:
+            image = ImageOps.fit(image, (width, height), PILImage.Resampling.LANCZOS)
+        elif image.size != scaled_size:
+            image = image.resize(
+                scaled_size,
+                PILImage.Resampling.LANCZOS,
+                reducing_gap=2.0,
+            )
+        return encode_image(image, image_format, quality)
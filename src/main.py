@@ -1,9 +1,18 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi_pagination import add_pagination
 
 from .api.router import api_router
-from .containers import Container
+from .containers import Container, close_clients
+from .db.exceptions import InvalidCursor
 from .exceptions import NotFound
+from .images.exceptions import (
+    AnalysisQueueFull,
+    InvalidImage,
+    RangeNotSatisfiable,
+)
 from .users.exceptions import UserAlreadyExists
 
 
@@ -15,14 +24,49 @@ def user_already_exists_handler(request: Request, exc: UserAlreadyExists):
     raise HTTPException(status.HTTP_400_BAD_REQUEST, str(exc)) from exc
 
 
+def analysis_queue_full_handler(request: Request, exc: AnalysisQueueFull):
+    raise HTTPException(status.HTTP_503_SERVICE_UNAVAILABLE, str(exc)) from exc
+
+
+def invalid_image_handler(request: Request, exc: InvalidImage):
+    raise HTTPException(status.HTTP_400_BAD_REQUEST, str(exc)) from exc
+
+
+def range_not_satisfiable_handler(request: Request, exc: RangeNotSatisfiable):
+    raise HTTPException(
+        status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+        str(exc),
+        headers={"Content-Range": f"bytes */{exc.size}"},
+    ) from exc
+
+
+def invalid_cursor_handler(request: Request, exc: InvalidCursor):
+    raise HTTPException(status.HTTP_400_BAD_REQUEST, str(exc)) from exc
+
+
 def setup_exception_handlers(app: FastAPI) -> None:
     app.add_exception_handler(NotFound, not_found_handler)
     app.add_exception_handler(UserAlreadyExists, user_already_exists_handler)
+    app.add_exception_handler(AnalysisQueueFull, analysis_queue_full_handler)
+    app.add_exception_handler(InvalidImage, invalid_image_handler)
+    app.add_exception_handler(RangeNotSatisfiable, range_not_satisfiable_handler)
+    app.add_exception_handler(InvalidCursor, invalid_cursor_handler)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if app.container.settings().image_index_preload:
+        await run_in_threadpool(app.container.duplicate_index().refresh)
+        await run_in_threadpool(app.container.similarity_index().refresh)
+    yield
+    await run_in_threadpool(app.container.similarity_index().save)
+    await close_clients(app.container)
+    app.container.shutdown_resources()
 
 
 def create_app() -> FastAPI:
     container = Container()
-    app = FastAPI()
+    app = FastAPI(lifespan=lifespan)
     app.container = container
 
     setup_exception_handlers(app)
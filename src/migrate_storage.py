@@ -0,0 +1,35 @@
+import argparse
+import asyncio
+import logging
+
+from .containers import Container
+from .images.layout import LayoutMigration
+from .images.storage import LocalImageStorage
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Move images stored in the flat legacy layout into shards.",
+    )
+    parser.add_argument("--checkpoint", default=".layout-migration.json")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    container = Container()
+    storage = container.image_storage()
+    if not isinstance(storage, LocalImageStorage):
+        parser.error("the configured image storage is not a local directory")
+    migration = LayoutMigration(
+        container.db(),
+        storage,
+        args.checkpoint,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+    )
+    asyncio.run(migration.run())
+
+
+if __name__ == "__main__":
+    main()
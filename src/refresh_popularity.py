@@ -0,0 +1,61 @@
+import argparse
+import logging
+import signal
+import threading
+import time
+
+from .containers import Container
+from .images.trending import reconcile_like_counts
+
+logger = logging.getLogger(__name__)
+
+
+def run(
+    container: Container,
+    refresh_interval: float,
+    reconcile_interval: float,
+    once: bool = False,
+) -> None:
+    database = container.db()
+    trending_scores = container.trending_scores()
+    stopping = threading.Event()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signal_number, lambda *_: stopping.set())
+
+    reconciled_at = None
+    while not stopping.is_set():
+        now = time.monotonic()
+        if reconciled_at is None or now - reconciled_at >= reconcile_interval:
+            fixed = reconcile_like_counts(database)
+            reconciled_at = now
+            logger.info("Reconciled like counts of %d images", fixed)
+        updated = trending_scores.refresh()
+        logger.info("Updated trending scores of %d images", updated)
+        if once:
+            return
+        stopping.wait(refresh_interval)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Reconcile like counters and refresh trending scores.",
+    )
+    parser.add_argument("--once", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    container = Container()
+    settings = container.settings()
+    try:
+        run(
+            container,
+            settings.image_trending_refresh_interval,
+            settings.image_like_reconcile_interval,
+            args.once,
+        )
+    finally:
+        container.shutdown_resources()
+
+
+if __name__ == "__main__":
+    main()
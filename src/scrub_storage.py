@@ -0,0 +1,48 @@
+import argparse
+import asyncio
+import logging
+from datetime import timedelta
+
+from .containers import Container, close_clients
+from .images.scrubber import StorageScrubber
+
+
+async def run(container: Container, args: argparse.Namespace) -> None:
+    settings = container.settings()
+    scrubber = StorageScrubber(
+        container.db(),
+        container.image_storage(),
+        args.checkpoint,
+        batch_size=settings.image_scrub_batch_size,
+        operations_per_second=settings.image_scrub_operations_per_second,
+        bytes_per_second=settings.image_scrub_bytes_per_second,
+        grace_period=timedelta(seconds=settings.image_scrub_grace_period),
+        verify_hash=args.verify_hash,
+        repair=args.repair,
+    )
+    try:
+        report = await scrubber.run()
+    finally:
+        await close_clients(container)
+    logging.getLogger(__name__).info("Scrub finished: %s", report)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Check stored image files against the database.",
+    )
+    parser.add_argument("--checkpoint", default=".scrub-checkpoint.json")
+    parser.add_argument("--verify-hash", action="store_true")
+    parser.add_argument("--repair", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    container = Container()
+    try:
+        asyncio.run(run(container, args))
+    finally:
+        container.shutdown_resources()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
+from datetime import datetime
 from enum import StrEnum, auto
 from typing import TYPE_CHECKING
 from uuid import UUID
 
-from sqlmodel import Enum, Field, Relationship, SQLModel
+from sqlalchemy.dialects import sqlite
+from sqlmodel import DateTime, Enum, Field, Index, Relationship, SQLModel, text
 
 if TYPE_CHECKING:
     from ..images.models import Image
@@ -38,12 +40,29 @@ class UserUpdate(SQLModel):
 
 
 class UserImageLikes(SQLModel, table=True):
+    __table_args__ = (
+        Index(
+            "ix_userimagelikes_user_id_liked_at_image_id",
+            "user_id",
+            "liked_at",
+            "image_id",
+        ),
+    )
+
     user_id: int | None = Field(default=None, foreign_key="user.id", primary_key=True)
     image_id: UUID | None = Field(
         default=None,
         foreign_key="image.id",
         primary_key=True,
     )
+    liked_at: datetime = Field(
+        sa_type=DateTime().with_variant(
+            sqlite.DATETIME(truncate_microseconds=True), "sqlite"
+        ),
+        sa_column_kwargs={
+            "server_default": text("CURRENT_TIMESTAMP"),
+        },
+    )
 
 
 class User(UserBase, table=True):
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import signal
+
+from .containers import Container, close_clients
+from .images.processing import ImageProcessor
+
+logger = logging.getLogger(__name__)
+
+
+async def run_worker(
+    processor: ImageProcessor,
+    concurrency: int,
+    poll_interval: float,
+) -> None:
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signal_number, stopping.set)
+
+    stop_requested = asyncio.create_task(stopping.wait())
+    running: set[asyncio.Task] = set()
+    try:
+        while not stopping.is_set():
+            jobs = []
+            if len(running) < concurrency:
+                try:
+                    jobs = await processor.claim(concurrency - len(running))
+                except Exception:
+                    logger.exception("Claiming image processing jobs failed")
+                    await asyncio.wait({stop_requested}, timeout=poll_interval)
+                    continue
+            for job in jobs:
+                task = asyncio.create_task(processor.process(job))
+                running.add(task)
+                task.add_done_callback(running.discard)
+            if not jobs or len(running) >= concurrency:
+                await asyncio.wait(
+                    {stop_requested, *running},
+                    timeout=poll_interval,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+    except asyncio.CancelledError:
+        for task in running:
+            task.cancel()
+        raise
+    finally:
+        stop_requested.cancel()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(signal_number)
+        await asyncio.gather(*running, return_exceptions=True)
+
+
+async def run(container: Container) -> None:
+    settings = container.settings()
+    try:
+        await run_worker(
+            container.image_processor(),
+            settings.image_processing_concurrency,
+            settings.image_processing_poll_interval,
+        )
+    finally:
+        await close_clients(container)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    container = Container()
+    try:
+        asyncio.run(run(container))
+    finally:
+        container.shutdown_resources()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import os
 from tempfile import TemporaryDirectory
 
 import pytest
@@ -5,7 +6,7 @@ import pytest_asyncio
 from asgi_lifespan import LifespanManager
 from factory import Faker, SubFactory
 from factory.alchemy import SQLAlchemyModelFactory
-from fastapi import BackgroundTasks, FastAPI
+from fastapi import BackgroundTasks, FastAPI, UploadFile
 from sqlalchemy import StaticPool
 from sqlmodel import Session
 
@@ -13,6 +14,7 @@ from src.config import Settings
 from src.containers import Container
 from src.db.service import Database
 from src.db.session import get_db_session
+from src.images.cache import DerivativeCache
 from src.images.models import Image
 from src.images.service import ImagesService
 from src.images.storage import ImageStorage, LocalImageStorage
@@ -21,6 +23,9 @@ from src.users.models import User
 from src.users.service import UsersService
 
 TEST_DB_URL = "sqlite:///:memory:"
+TEST_IMAGE_FILENAME = "colors.jpg"
+TEST_IMAGE_MIME = "image/jpeg"
+TEST_DERIVATIVE_CACHE_MAX_SIZE = 1_048_576
 
 
 @pytest.fixture(scope="session")
@@ -28,6 +33,23 @@ def assets_directory():
     return "tests/assets"
 
 
+@pytest.fixture(scope="session")
+def original_image_path(assets_directory: str):
+    return os.path.join(assets_directory, TEST_IMAGE_FILENAME)
+
+
+@pytest.fixture
+def uploaded_file(original_image_path: str):
+    file_size = os.stat(original_image_path).st_size
+    with open(original_image_path, "rb") as image_file:
+        yield UploadFile(
+            image_file,
+            size=file_size,
+            filename=TEST_IMAGE_FILENAME,
+            headers={"content-type": TEST_IMAGE_MIME},
+        )
+
+
 @pytest.fixture(scope="session")
 def app():
     return create_app()
@@ -40,7 +62,7 @@ def container(app: FastAPI):
 
 @pytest.fixture(scope="session", autouse=True)
 def override_settings(container: Container):
-    container.settings.override(Settings(db_url=TEST_DB_URL))
+    container.settings.override(Settings(db_url=TEST_DB_URL, image_index_preload=False))
     yield
     container.settings.reset_override()
 
@@ -98,6 +120,24 @@ def override_image_storage(container: Container, image_storage: ImageStorage):
     container.image_storage.reset_override()
 
 
+@pytest.fixture
+def derivative_cache_location():
+    with TemporaryDirectory(prefix="pics-cache-test-") as temp_dir_path:
+        yield temp_dir_path
+
+
+@pytest.fixture
+def derivative_cache(derivative_cache_location: str):
+    return DerivativeCache(derivative_cache_location, TEST_DERIVATIVE_CACHE_MAX_SIZE)
+
+
+@pytest.fixture(autouse=True)
+def override_derivative_cache(container: Container, derivative_cache: DerivativeCache):
+    container.derivative_cache.override(derivative_cache)
+    yield
+    container.derivative_cache.reset_override()
+
+
 @pytest.fixture
 def images_service(db_session: Session, background_tasks: BackgroundTasks):
     return ImagesService(db_session, background_tasks)
@@ -0,0 +1,102 @@
+import os
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image as PILImage
+from pydantic_extra_types.color import Color
+
+from src.images.analysis import analyze_image
+from src.images.tasks import process_image_source
+
+PALETTE_COLOR_COUNT = 5
+REDUCED_MAX_DIMENSION = 256
+MAX_AVERAGE_COLOR_DRIFT = 3
+MAX_PALETTE_COLOR_DRIFT = 48
+
+
+@pytest.fixture(scope="session")
+def image_content(assets_directory: str):
+    with open(os.path.join(assets_directory, "colors.jpg"), "rb") as image_file:
+        return image_file.read()
+
+
+def test_analyze_image_size(image_content: bytes):
+    analysis = analyze_image(image_content, PALETTE_COLOR_COUNT)
+    assert (analysis.width, analysis.height) == (783, 551)
+
+
+def test_analyze_image_colors(image_content: bytes):
+    analysis = analyze_image(image_content, PALETTE_COLOR_COUNT)
+    assert analysis.dominant_color.startswith("#")
+    assert analysis.average_color.startswith("#")
+    assert 0 < len(analysis.palette) <= PALETTE_COLOR_COUNT
+
+
+def test_analyze_image_from_path(image_content: bytes, original_image_path: str):
+    analysis = analyze_image(original_image_path, PALETTE_COLOR_COUNT)
+    assert analysis == analyze_image(image_content, PALETTE_COLOR_COUNT)
+
+
+def to_rgb(color: str) -> np.ndarray:
+    return np.array(Color(color).as_rgb_tuple(alpha=False), dtype=float)
+
+
+def test_analyze_image_reduced_resolution_size(image_content: bytes):
+    analysis = analyze_image(image_content, PALETTE_COLOR_COUNT, REDUCED_MAX_DIMENSION)
+    assert (analysis.width, analysis.height) == (783, 551)
+
+
+def test_analyze_image_reduced_resolution_drift(image_content: bytes):
+    full = analyze_image(image_content, PALETTE_COLOR_COUNT)
+    reduced = analyze_image(image_content, PALETTE_COLOR_COUNT, REDUCED_MAX_DIMENSION)
+    average_drift = np.abs(to_rgb(full.average_color) - to_rgb(reduced.average_color))
+    assert average_drift.max() <= MAX_AVERAGE_COLOR_DRIFT
+    for color in reduced.palette:
+        palette_drift = min(
+            np.linalg.norm(to_rgb(color) - to_rgb(full_color))
+            for full_color in full.palette
+        )
+        assert palette_drift <= MAX_PALETTE_COLOR_DRIFT
+
+
+def test_process_image_source_analysis_resolution(image_content: bytes):
+    result = process_image_source(
+        image_content,
+        PALETTE_COLOR_COUNT,
+        REDUCED_MAX_DIMENSION,
+        [1024],
+        ["webp"],
+        80,
+    )
+    assert result.analysis == analyze_image(
+        image_content, PALETTE_COLOR_COUNT, REDUCED_MAX_DIMENSION
+    )
+
+
+def encode_image(image: PILImage.Image, image_format: str = "PNG") -> bytes:
+    buffer = BytesIO()
+    image.save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def test_analyze_image_grayscale():
+    content = encode_image(PILImage.new("L", (10, 10), color=128))
+    analysis = analyze_image(content, PALETTE_COLOR_COUNT)
+    assert analysis.average_color == "#808080"
+    assert analysis.palette == ["#808080"]
+
+
+def test_analyze_image_ignores_transparent_pixels():
+    image = PILImage.new("RGBA", (10, 10), color=(255, 0, 0, 0))
+    image.paste((0, 0, 255, 255), (0, 0, 5, 10))
+    analysis = analyze_image(encode_image(image), PALETTE_COLOR_COUNT)
+    assert analysis.average_color == "#00f"
+    assert analysis.dominant_color == "#00f"
+
+
+def test_analyze_image_palette_order():
+    image = PILImage.new("RGB", (10, 10), color=(255, 0, 0))
+    image.paste((0, 255, 0), (0, 0, 3, 10))
+    analysis = analyze_image(encode_image(image), PALETTE_COLOR_COUNT)
+    assert analysis.palette == ["#f00", "#0f0"]
@@ -0,0 +1,119 @@
+import asyncio
+import os
+
+import pytest
+
+from src.images.cache import DerivativeCache, FrequencySketch, MemoryCache
+
+CACHE_MAX_SIZE = 10
+
+
+class Renderer:
+    def __init__(self, content: bytes = b"content") -> None:
+        self.content = content
+        self.calls = 0
+
+    async def __call__(self) -> bytes:
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return self.content
+
+
+@pytest.fixture
+def small_cache(derivative_cache_location: str):
+    return DerivativeCache(derivative_cache_location, CACHE_MAX_SIZE)
+
+
+@pytest.mark.asyncio
+async def test_get_or_create(derivative_cache: DerivativeCache):
+    render = Renderer()
+    path = await derivative_cache.get_or_create("abcdef", render)
+    with open(path, "rb") as cached_file:
+        assert cached_file.read() == render.content
+
+
+@pytest.mark.asyncio
+async def test_get_or_create_cached(derivative_cache: DerivativeCache):
+    render = Renderer()
+    first_path = await derivative_cache.get_or_create("abcdef", render)
+    second_path = await derivative_cache.get_or_create("abcdef", render)
+    assert first_path == second_path
+    assert render.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_get_or_create_deduplicates_concurrent_requests(
+    derivative_cache: DerivativeCache,
+):
+    render = Renderer()
+    paths = await asyncio.gather(
+        *(derivative_cache.get_or_create("abcdef", render) for _ in range(5))
+    )
+    assert len(set(paths)) == 1
+    assert render.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_eviction(small_cache: DerivativeCache):
+    first_path = await small_cache.get_or_create("aa01", Renderer(b"123456"))
+    second_path = await small_cache.get_or_create("aa02", Renderer(b"123456"))
+    assert not os.path.exists(first_path)
+    assert os.path.exists(second_path)
+    assert small_cache.total_size <= CACHE_MAX_SIZE
+
+
+@pytest.mark.asyncio
+async def test_open_survives_eviction(small_cache: DerivativeCache):
+    cached_file = await small_cache.open_or_create("aa01", Renderer(b"123456"))
+    await small_cache.get_or_create("aa02", Renderer(b"123456"))
+    assert await small_cache.open("aa01") is None
+    assert await cached_file.read() == b"123456"
+    await cached_file.close()
+
+
+@pytest.mark.asyncio
+async def test_eviction_least_recently_used(small_cache: DerivativeCache):
+    first_path = await small_cache.get_or_create("aa01", Renderer(b"1234"))
+    second_path = await small_cache.get_or_create("aa02", Renderer(b"1234"))
+    await small_cache.get_or_create("aa01", Renderer(b"1234"))
+    await small_cache.get_or_create("aa03", Renderer(b"1234"))
+    assert os.path.exists(first_path)
+    assert not os.path.exists(second_path)
+
+
+@pytest.mark.asyncio
+async def test_index_existing_files(
+    derivative_cache: DerivativeCache,
+    derivative_cache_location: str,
+):
+    await derivative_cache.get_or_create("abcdef", Renderer())
+    restarted_cache = DerivativeCache(derivative_cache_location, CACHE_MAX_SIZE)
+    render = Renderer()
+    await restarted_cache.get_or_create("abcdef", render)
+    assert render.calls == 0
+    assert restarted_cache.total_size == len(render.content)
+
+
+def test_memory_cache_rejects_cold_entries():
+    sketch = FrequencySketch()
+    memory_cache = MemoryCache(10, sketch)
+    for _ in range(3):
+        sketch.increment("hot")
+    assert memory_cache.put("hot", b"hot-entry")
+    sketch.increment("cold")
+    assert not memory_cache.put("cold", b"cold-entry")
+    for _ in range(3):
+        sketch.increment("cold")
+    assert memory_cache.put("cold", b"cold-entry")
+    assert memory_cache.get("hot") is None
+    assert memory_cache.total_size == 10
+
+
+def test_frequency_sketch_ages():
+    sketch = FrequencySketch(width=16)
+    for _ in range(20):
+        sketch.increment("key")
+    assert sketch.estimate("key") == 15
+    for index in range(140):
+        sketch.increment(f"other-{index}")
+    assert sketch.estimate("key") < 15
@@ -0,0 +1,144 @@
+import os
+
+import pytest
+from fastapi import UploadFile
+from fastapi.responses import FileResponse, StreamingResponse
+
+from src.images.cache import DerivativeCache
+from src.images.cached_storage import CachingImageStorage, create_caching_storage
+from src.images.conditional import ByteRange
+from src.images.exceptions import ImageNotFound
+from src.images.models import ImageVariant
+from src.images.storage import (
+    BlobStorage,
+    ContentAddressedImageStorage,
+    ImageStorage,
+    LocalImageStorage,
+)
+
+TEST_IMAGE_ID = "e7c1b8a4-54a4-4b57-9b0c-5d0f3a3c2a11"
+MEMORY_MAX_SIZE = 1_048_576
+
+
+@pytest.fixture
+def disk_cache(derivative_cache_location: str):
+    return DerivativeCache(derivative_cache_location, MEMORY_MAX_SIZE)
+
+
+@pytest.fixture
+def caching_storage(image_storage: LocalImageStorage, disk_cache: DerivativeCache):
+    return CachingImageStorage(
+        image_storage,
+        disk_cache,
+        memory_max_size=MEMORY_MAX_SIZE,
+        memory_max_file_size=MEMORY_MAX_SIZE,
+    )
+
+
+@pytest.mark.asyncio
+async def test_load_image_tiers(
+    caching_storage: CachingImageStorage,
+    disk_cache: DerivativeCache,
+    uploaded_file: UploadFile,
+):
+    file_metadata = await caching_storage.save_image(TEST_IMAGE_ID, uploaded_file)
+    first_response = await caching_storage.load_image(file_metadata)
+    assert disk_cache.total_size == 0
+    second_response = await caching_storage.load_image(file_metadata)
+    third_response = await caching_storage.load_image(file_metadata)
+    statistics = caching_storage.statistics
+    assert (statistics.misses, statistics.disk_hits, statistics.memory_hits) == (
+        2,
+        0,
+        1,
+    )
+    assert disk_cache.total_size == file_metadata.size
+    assert isinstance(first_response, FileResponse)
+    assert isinstance(second_response, StreamingResponse)
+    assert second_response.headers["Content-Length"] == str(file_metadata.size)
+    content = b"".join([chunk async for chunk in second_response.body_iterator])
+    assert content == await caching_storage.read_image(file_metadata)
+    assert len(third_response.body) == file_metadata.size
+    assert third_response.media_type == file_metadata.content_type
+
+
+@pytest.mark.asyncio
+async def test_load_image_range_from_memory(
+    caching_storage: CachingImageStorage,
+    uploaded_file: UploadFile,
+):
+    file_metadata = await caching_storage.save_image(TEST_IMAGE_ID, uploaded_file)
+    content = await caching_storage.read_image(file_metadata)
+    await caching_storage.read_image(file_metadata)
+    response = await caching_storage.load_image(file_metadata, ByteRange(10, 19))
+    assert caching_storage.statistics.memory_hits == 1
+    assert response.status_code == 206
+    assert response.body == content[10:20]
+    assert response.headers["Content-Range"] == f"bytes 10-19/{len(content)}"
+
+
+@pytest.mark.asyncio
+async def test_delete_image_invalidates(
+    caching_storage: CachingImageStorage,
+    disk_cache: DerivativeCache,
+    uploaded_file: UploadFile,
+):
+    file_metadata = await caching_storage.save_image(TEST_IMAGE_ID, uploaded_file)
+    variant = ImageVariant(
+        image_id=TEST_IMAGE_ID,
+        dimension=256,
+        format="webp",
+        content_type="image/webp",
+        size=7,
+    )
+    await caching_storage.save_variant(variant, b"content")
+    for _ in range(2):
+        await caching_storage.read_image(file_metadata)
+        await caching_storage.load_variant(variant)
+    assert disk_cache.total_size == file_metadata.size + variant.size
+    await caching_storage.delete_image(file_metadata)
+    assert disk_cache.total_size == 0
+    with pytest.raises(ImageNotFound):
+        await caching_storage.read_image(file_metadata)
+    assert not os.listdir(os.path.join(disk_cache._location, TEST_IMAGE_ID[:2]))
+
+
+@pytest.mark.asyncio
+async def test_load_image_fills_disk_cache_from_stream(
+    caching_storage: CachingImageStorage,
+    image_storage: LocalImageStorage,
+    uploaded_file: UploadFile,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    file_metadata = await caching_storage.save_image(TEST_IMAGE_ID, uploaded_file)
+    content = await image_storage.read_image(file_metadata)
+
+    async def iter_image(_):
+        for start in range(0, len(content), 1000):
+            yield content[start : start + 1000]
+
+    async def read_image(_):
+        raise AssertionError("cache fill buffered the image")
+
+    monkeypatch.setattr(image_storage, "iter_image", iter_image)
+    monkeypatch.setattr(image_storage, "read_image", read_image)
+    await caching_storage.load_image(file_metadata)
+    response = await caching_storage.load_image(file_metadata)
+
+    assert b"".join([chunk async for chunk in response.body_iterator]) == content
+    source = await caching_storage.get_image_source(file_metadata)
+    assert isinstance(source, str)
+    with open(source, "rb") as cached_file:
+        assert cached_file.read() == content
+
+
+def test_caching_blob_storage(
+    image_storage: ImageStorage,
+    image_storage_location: str,
+    disk_cache: DerivativeCache,
+):
+    storage = ContentAddressedImageStorage(image_storage_location)
+    assert isinstance(create_caching_storage(storage, disk_cache), BlobStorage)
+    assert not isinstance(
+        create_caching_storage(image_storage, disk_cache), BlobStorage
+    )
@@ -0,0 +1,76 @@
+import random
+
+import pytest
+from sqlmodel import Session
+
+from src.images.colors import (
+    LabColor,
+    color_to_lab,
+    delta_e,
+    get_color_bucket,
+    get_neighbouring_buckets,
+)
+from src.images.models import ImageFile, ImagePaletteColor
+from src.images.schemas import ImageColorMatchSchema
+from src.images.service import ImagesService
+
+
+@pytest.mark.parametrize(
+    "color,expected",
+    [
+        ("#000000", (0.0, 0.0, 0.0)),
+        ("#ffffff", (100.0, 0.0, 0.0)),
+        ("#ff0000", (53.24, 80.09, 67.2)),
+        ("#0000ff", (32.3, 79.19, -107.86)),
+    ],
+)
+def test_color_to_lab(color: str, expected: tuple[float, float, float]):
+    assert color_to_lab(color) == pytest.approx(expected, abs=0.01)
+
+
+def test_neighbouring_buckets_cover_tolerance():
+    generator = random.Random(0)
+    for _ in range(200):
+        origin = LabColor(
+            generator.uniform(0, 100),
+            generator.uniform(-128, 127),
+            generator.uniform(-128, 127),
+        )
+        tolerance = generator.uniform(1, 25)
+        buckets = set(get_neighbouring_buckets(origin, tolerance))
+        for _ in range(20):
+            candidate = LabColor(
+                *(value + generator.uniform(-tolerance, tolerance) for value in origin)
+            )
+            if delta_e(origin, candidate) <= tolerance:
+                assert get_color_bucket(candidate) in buckets
+
+
+def test_search_images_by_color(
+    db_session: Session,
+    images_service: ImagesService,
+    image_factory,
+):
+    palettes = {
+        "orange": ["#ff8000", "#202020"],
+        "amber": ["#ff9a10"],
+        "blue": ["#0040ff", "#101010"],
+    }
+    images = {}
+    for title, palette in palettes.items():
+        image = image_factory(title=title)
+        image.file = ImageFile(filename="a.jpg", content_type="image/jpeg", size=1)
+        image.file.palette = [ImagePaletteColor.from_color(color) for color in palette]
+        images[title] = image
+    db_session.commit()
+
+    matches = ImageColorMatchSchema.from_row_bulk(
+        images_service.search_images_by_color("#ff8505", 15, 10)
+    )
+
+    found = [match for match in matches if match.title in palettes]
+    assert [match.title for match in found] == ["orange", "amber"]
+    assert found[0].delta_e == pytest.approx(
+        delta_e(color_to_lab("#ff8505"), color_to_lab("#ff8000"))
+    )
+    assert found[1].delta_e <= 15
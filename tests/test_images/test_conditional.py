@@ -0,0 +1,82 @@
+from datetime import datetime
+
+import pytest
+
+from src.images.conditional import (
+    ByteRange,
+    RequestConditions,
+    get_byte_range,
+    is_not_modified,
+    make_etag,
+    parse_range,
+)
+from src.images.exceptions import RangeNotSatisfiable
+
+ETAG = make_etag("abc")
+LAST_MODIFIED = datetime(2024, 1, 1, 12, 0, 0)
+
+
+@pytest.mark.parametrize(
+    "conditions,expected",
+    [
+        (RequestConditions(), False),
+        (RequestConditions(if_none_match=ETAG), True),
+        (RequestConditions(if_none_match=f'"other", W/{ETAG}'), True),
+        (RequestConditions(if_none_match="*"), True),
+        (RequestConditions(if_none_match='"other"'), False),
+        (
+            RequestConditions(if_modified_since="Mon, 01 Jan 2024 12:00:00 GMT"),
+            True,
+        ),
+        (
+            RequestConditions(if_modified_since="Mon, 01 Jan 2024 11:59:59 GMT"),
+            False,
+        ),
+        (
+            RequestConditions(
+                if_none_match='"other"',
+                if_modified_since="Mon, 01 Jan 2024 12:00:00 GMT",
+            ),
+            False,
+        ),
+    ],
+)
+def test_is_not_modified(conditions: RequestConditions, expected: bool):
+    assert is_not_modified(conditions, ETAG, LAST_MODIFIED) is expected
+
+
+@pytest.mark.parametrize(
+    "range_header,expected",
+    [
+        ("bytes=0-99", ByteRange(0, 99)),
+        ("bytes=100-", ByteRange(100, 999)),
+        ("bytes=-100", ByteRange(900, 999)),
+        ("bytes=900-2000", ByteRange(900, 999)),
+        ("bytes=0-1,5-6", None),
+        ("items=0-1", None),
+        ("bytes=5-1", None),
+    ],
+)
+def test_parse_range(range_header: str, expected: ByteRange | None):
+    assert parse_range(range_header, 1000) == expected
+
+
+def test_parse_range_not_satisfiable():
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=1000-", 1000)
+
+
+@pytest.mark.parametrize(
+    "if_range,expected",
+    [
+        (None, ByteRange(0, 9)),
+        (ETAG, ByteRange(0, 9)),
+        ('"other"', None),
+        (f"W/{ETAG}", None),
+        ("Mon, 01 Jan 2024 12:00:00 GMT", ByteRange(0, 9)),
+        ("Mon, 01 Jan 2024 11:00:00 GMT", None),
+    ],
+)
+def test_get_byte_range_if_range(if_range: str | None, expected: ByteRange | None):
+    conditions = RequestConditions(range="bytes=0-9", if_range=if_range)
+    assert get_byte_range(conditions, 1000, ETAG, LAST_MODIFIED) == expected
@@ -0,0 +1,141 @@
+import random
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+from PIL import Image as PILImage
+from PIL import ImageOps
+from sqlmodel import Session
+
+from src.containers import Container
+from src.images.duplicates import DuplicateIndex, HammingIndex, ImageHashes
+from src.images.hashing import difference_hash, hamming_distance, perceptual_hash
+from src.images.models import ImageFile
+from src.images.service import ImagesService
+
+NEAR_DUPLICATE_DISTANCE = 8
+
+
+@pytest.fixture(scope="module")
+def original_image(original_image_path: str):
+    with PILImage.open(original_image_path) as image:
+        return image.convert("RGB")
+
+
+@pytest.mark.parametrize("hash_image", [perceptual_hash, difference_hash])
+def test_hash_near_duplicates(original_image: PILImage.Image, hash_image):
+    width, height = original_image.size
+    resized = original_image.resize((width // 3, height // 3))
+    cropped = original_image.crop((8, 8, width - 8, height - 8))
+    assert hamming_distance(hash_image(original_image), hash_image(resized)) <= (
+        NEAR_DUPLICATE_DISTANCE
+    )
+    assert hamming_distance(hash_image(original_image), hash_image(cropped)) <= (
+        NEAR_DUPLICATE_DISTANCE
+    )
+    assert hamming_distance(
+        hash_image(original_image), hash_image(ImageOps.mirror(original_image))
+    ) > (NEAR_DUPLICATE_DISTANCE)
+
+
+def test_hash_fits_signed_bigint(original_image: PILImage.Image):
+    for value in (perceptual_hash(original_image), difference_hash(original_image)):
+        assert -(2**63) <= value < 2**63
+
+
+def test_hamming_index_matches_brute_force():
+    generator = random.Random(0)
+    index = HammingIndex()
+    hashes = {}
+    base = generator.getrandbits(64) - 2**63
+    for _ in range(2000):
+        value = base
+        for bit in generator.sample(range(64), generator.randint(0, 20)):
+            value ^= 1 << bit
+        image_hashes = ImageHashes(value - 2**64 if value >= 2**63 else value, 0)
+        image_id = uuid4()
+        hashes[image_id] = image_hashes
+        index.add(image_id, image_hashes)
+    removed = list(hashes)[:100]
+    for image_id in removed:
+        index.remove(image_id)
+        del hashes[image_id]
+
+    for max_distance in (0, 3, 7, 12):
+        query = ImageHashes(base, 0)
+        expected = {
+            image_id
+            for image_id, image_hashes in hashes.items()
+            if hamming_distance(base, image_hashes.phash) <= max_distance
+        }
+        matches = index.search(query, max_distance)
+        assert {match.image_id for match in matches} == expected
+        assert [match.distance for match in matches] == sorted(
+            match.distance for match in matches
+        )
+
+
+def test_find_duplicate_images(
+    db_session: Session,
+    images_service: ImagesService,
+    image_factory,
+    container: Container,
+):
+    hashes = {
+        "original": (0x0F0F_0F0F_0F0F_0F0F, 0x1234),
+        "repost": (0x0F0F_0F0F_0F0F_0F0E, 0x1235),
+        "edited": (0x0F0F_0F0F_0F0F_0FF0, 0x1234),
+        "different": (-0x0F0F_0F0F_0F0F_0F10, 0x4321),
+    }
+    images = {}
+    for title, (phash, dhash) in hashes.items():
+        image = image_factory(title=title)
+        image.file = ImageFile(
+            filename="a.jpg",
+            content_type="image/jpeg",
+            size=1,
+            phash=phash,
+            dhash=dhash,
+            analyzed_at=datetime.utcnow(),
+        )
+        images[title] = image
+    db_session.commit()
+    container.duplicate_index().refresh(force=True)
+
+    duplicates = images_service.find_duplicate_images(images["original"].id, 8, 10)
+
+    assert [(row.title, match.distance) for row, match in duplicates] == [
+        ("repost", 1),
+        ("edited", 8),
+    ]
+    assert images_service.find_duplicate_images(images["original"].id, 0, 10) == []
+
+
+def test_duplicate_index_sync(db_session: Session, image_factory, container: Container):
+    index = DuplicateIndex(container.db(), refresh_interval=0, reconcile_interval=0)
+    hashes = ImageHashes(0x0F0F_0F0F_0F0F_0F0F, 0x1234)
+
+    def add_image(title: str, analyzed_at: datetime):
+        image = image_factory(title=title)
+        image.file = ImageFile(
+            filename="a.jpg",
+            content_type="image/jpeg",
+            size=1,
+            phash=hashes.phash,
+            dhash=hashes.dhash,
+            analyzed_at=analyzed_at,
+        )
+        db_session.commit()
+        return image
+
+    now = datetime.utcnow()
+    deleted = add_image("deleted", now)
+    index.refresh(force=True)
+    late = add_image("late", now - timedelta(seconds=10))
+    db_session.delete(deleted)
+    db_session.commit()
+    index.refresh(force=True)
+
+    image_ids = {match.image_id for match in index.find(None, hashes, 0)}
+    assert late.id in image_ids
+    assert deleted.id not in image_ids
@@ -0,0 +1,41 @@
+import os
+import signal
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from src.images.exceptions import AnalysisQueueFull
+from src.images.executor import AnalysisExecutor
+
+
+@pytest.fixture
+def analysis_executor():
+    executor = AnalysisExecutor(max_workers=1, max_pending=0, submit_timeout=0.05)
+    yield executor
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_submit(analysis_executor: AnalysisExecutor):
+    future = await analysis_executor.submit(pow, 2, 10)
+    assert await future == 1024
+
+
+@pytest.mark.asyncio
+async def test_submit_queue_full(analysis_executor: AnalysisExecutor):
+    future = await analysis_executor.submit(time.sleep, 0.5)
+    with pytest.raises(AnalysisQueueFull):
+        await analysis_executor.submit(pow, 2, 10)
+    await future
+
+
+@pytest.mark.asyncio
+async def test_submit_after_worker_crash(analysis_executor: AnalysisExecutor):
+    worker_pid = await (await analysis_executor.submit(os.getpid))
+    future = await analysis_executor.submit(time.sleep, 10)
+    os.kill(worker_pid, signal.SIGKILL)
+    with pytest.raises(BrokenProcessPool):
+        await future
+    future = await analysis_executor.submit(pow, 2, 10)
+    assert await future == 1024
@@ -0,0 +1,141 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import Session, delete, select
+
+from src.images.analysis import ImageAnalysis
+from src.images.jobs import ProcessingQueue
+from src.images.models import ImageFile, ProcessingJob, ProcessingState
+
+LEASE = timedelta(minutes=5)
+MAX_ATTEMPTS = 2
+RETRY_DELAY = timedelta(seconds=10)
+ANALYSIS = ImageAnalysis(
+    width=10,
+    height=20,
+    dominant_color="#f00",
+    average_color="#800000",
+    palette=["#f00", "#000"],
+    phash=-0x0F0F0F0F0F0F0F10,
+    dhash=0x3C3C3C3C3C3C3C3C,
+    embedding=bytes(128),
+)
+
+
+@pytest.fixture(autouse=True)
+def clear_processing_jobs(db_session: Session):
+    db_session.exec(delete(ProcessingJob))
+    db_session.commit()
+
+
+@pytest.fixture
+def processing_queue(db_session: Session):
+    return ProcessingQueue(db_session)
+
+
+@pytest.fixture
+def image_file(db_session: Session, image_factory):
+    image = image_factory()
+    image.file = ImageFile(filename="image.png", content_type="image/png", size=1)
+    db_session.add(image)
+    db_session.commit()
+    return image.file
+
+
+@pytest.fixture
+def enqueued_image_file(processing_queue: ProcessingQueue, image_file: ImageFile):
+    processing_queue.enqueue(image_file.image_id)
+    return image_file
+
+
+def test_claim(
+    db_session: Session,
+    processing_queue: ProcessingQueue,
+    enqueued_image_file: ImageFile,
+):
+    [job] = processing_queue.claim(5, LEASE, MAX_ATTEMPTS)
+    assert job.file.image_id == enqueued_image_file.image_id
+    assert job.attempts == 1
+    db_session.refresh(enqueued_image_file)
+    assert enqueued_image_file.processing_state is ProcessingState.PROCESSING
+
+
+def test_claim_skips_claimed_jobs(
+    processing_queue: ProcessingQueue,
+    enqueued_image_file: ImageFile,
+):
+    processing_queue.claim(5, LEASE, MAX_ATTEMPTS)
+    assert processing_queue.claim(5, LEASE, MAX_ATTEMPTS) == []
+
+
+def test_claim_expired_lease(
+    processing_queue: ProcessingQueue,
+    enqueued_image_file: ImageFile,
+):
+    processing_queue.claim(5, -LEASE, MAX_ATTEMPTS)
+    [job] = processing_queue.claim(5, LEASE, MAX_ATTEMPTS)
+    assert job.attempts == 2
+
+
+def test_complete(
+    db_session: Session,
+    processing_queue: ProcessingQueue,
+    enqueued_image_file: ImageFile,
+):
+    [job] = processing_queue.claim(5, LEASE, MAX_ATTEMPTS)
+    assert processing_queue.complete(job, ANALYSIS, [])
+    db_session.refresh(enqueued_image_file)
+    assert enqueued_image_file.processing_state is ProcessingState.DONE
+    assert enqueued_image_file.width == ANALYSIS.width
+    palette = {color.color for color in enqueued_image_file.palette}
+    assert palette == set(ANALYSIS.palette)
+    assert db_session.exec(select(ProcessingJob)).first() is None
+
+
+def test_complete_after_reupload(
+    processing_queue: ProcessingQueue,
+    enqueued_image_file: ImageFile,
+):
+    [job] = processing_queue.claim(5, LEASE, MAX_ATTEMPTS)
+    processing_queue.enqueue(enqueued_image_file.image_id)
+    assert not processing_queue.complete(job, ANALYSIS, [])
+
+
+def test_fail_schedules_retry(
+    db_session: Session,
+    processing_queue: ProcessingQueue,
+    enqueued_image_file: ImageFile,
+):
+    [job] = processing_queue.claim(5, LEASE, MAX_ATTEMPTS)
+    processing_queue.fail(job, "error", MAX_ATTEMPTS, RETRY_DELAY)
+    processing_job = db_session.exec(select(ProcessingJob)).one()
+    assert processing_job.state is ProcessingState.PENDING
+    assert processing_job.run_after > datetime.utcnow()
+    assert processing_queue.claim(5, LEASE, MAX_ATTEMPTS) == []
+
+
+def test_fail_max_attempts(
+    db_session: Session,
+    processing_queue: ProcessingQueue,
+    enqueued_image_file: ImageFile,
+):
+    for _ in range(MAX_ATTEMPTS):
+        [job] = processing_queue.claim(5, LEASE, MAX_ATTEMPTS)
+        processing_queue.fail(job, "error", MAX_ATTEMPTS, timedelta())
+    db_session.refresh(enqueued_image_file)
+    assert enqueued_image_file.processing_state is ProcessingState.FAILED
+    assert processing_queue.claim(5, LEASE, MAX_ATTEMPTS) == []
+
+
+def test_release_backs_off(
+    db_session: Session,
+    processing_queue: ProcessingQueue,
+    enqueued_image_file: ImageFile,
+):
+    [job] = processing_queue.claim(5, LEASE, MAX_ATTEMPTS)
+    processing_queue.release(job, RETRY_DELAY)
+    processing_job = db_session.exec(select(ProcessingJob)).one()
+    assert processing_job.state is ProcessingState.PENDING
+    assert processing_job.attempts == 0
+    assert processing_job.run_after > datetime.utcnow()
+    assert processing_queue.claim(5, LEASE, MAX_ATTEMPTS) == []
@@ -0,0 +1,72 @@
+import json
+import os
+
+import pytest
+
+from src.db.service import Database
+from src.images.layout import LayoutMigration
+from src.images.models import Image, ImageFile
+from src.images.storage import LocalImageStorage
+
+
+@pytest.fixture
+def database(image_storage_location: str):
+    database = Database(f"sqlite:///{image_storage_location}/images.db")
+    database.create_tables()
+    return database
+
+
+@pytest.fixture
+def legacy_image_ids(database: Database, image_storage_location: str):
+    image_ids = []
+    with database.session() as session:
+        for _ in range(5):
+            image = Image(title="image")
+            image.file = ImageFile(filename="a.jpg", content_type="image/jpeg", size=1)
+            session.add(image)
+            image_ids.append(str(image.id))
+        session.commit()
+    for image_id in image_ids:
+        with open(os.path.join(image_storage_location, image_id), "wb") as file:
+            file.write(b"content")
+    return sorted(image_ids)
+
+
+@pytest.fixture
+def checkpoint_path(image_storage_location: str):
+    return os.path.join(image_storage_location, "checkpoint.json")
+
+
+@pytest.mark.asyncio
+async def test_layout_migration(
+    database: Database,
+    image_storage: LocalImageStorage,
+    image_storage_location: str,
+    checkpoint_path: str,
+    legacy_image_ids: list[str],
+):
+    migration = LayoutMigration(database, image_storage, checkpoint_path, batch_size=2)
+    checkpoint = await migration.run()
+    assert (checkpoint.scanned, checkpoint.migrated) == (5, 5)
+    for image_id in legacy_image_ids:
+        assert not os.path.exists(os.path.join(image_storage_location, image_id))
+        assert os.path.exists(image_storage._get_image_path(image_id))
+
+
+@pytest.mark.asyncio
+async def test_layout_migration_resumes_from_checkpoint(
+    database: Database,
+    image_storage: LocalImageStorage,
+    image_storage_location: str,
+    checkpoint_path: str,
+    legacy_image_ids: list[str],
+):
+    with open(checkpoint_path, "w") as checkpoint_file:
+        json.dump({"last_image_id": legacy_image_ids[2], "scanned": 3}, checkpoint_file)
+    migration = LayoutMigration(database, image_storage, checkpoint_path)
+    checkpoint = await migration.run()
+    assert (checkpoint.scanned, checkpoint.migrated) == (5, 2)
+    for image_id in legacy_image_ids[:3]:
+        assert os.path.exists(os.path.join(image_storage_location, image_id))
+    for image_id in legacy_image_ids[3:]:
+        assert os.path.exists(image_storage._get_image_path(image_id))
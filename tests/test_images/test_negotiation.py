@@ -0,0 +1,21 @@
+import pytest
+
+from src.images.negotiation import choose_content_type
+
+AVAILABLE_CONTENT_TYPES = ["image/webp", "image/jpeg"]
+
+
+@pytest.mark.parametrize(
+    "accept,expected_content_type",
+    [
+        (None, "image/webp"),
+        ("image/avif,image/webp,*/*;q=0.8", "image/webp"),
+        ("image/jpeg", "image/jpeg"),
+        ("image/webp;q=0.5,image/*", "image/jpeg"),
+        ("image/webp;q=0,*/*", "image/jpeg"),
+        ("image/png", None),
+    ],
+)
+def test_choose_content_type(accept: str | None, expected_content_type: str | None):
+    content_type = choose_content_type(accept, AVAILABLE_CONTENT_TYPES)
+    assert content_type == expected_content_type
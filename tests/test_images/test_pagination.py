@@ -0,0 +1,172 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import Session
+
+from src.db.exceptions import InvalidCursor
+from src.db.pagination import KeysetParams, paginate_keyset
+from src.images.filters import ImageFilter
+from src.images.models import Image, ImageFile
+from src.images.schemas import ImageDetailsSchema, ImageLikedSchema
+from src.images.service import ImagesService
+from src.users.models import UserImageLikes
+
+
+@pytest.fixture
+def owner_images(db_session: Session, image_factory, user_factory):
+    owner = user_factory()
+    images = []
+    for title in ["b", "a", "c", "a", "b"]:
+        image = image_factory(owner=owner, title=title)
+        image.file = ImageFile(filename="a.jpg", content_type="image/jpeg", size=1)
+        images.append(image)
+    db_session.commit()
+    return owner, images
+
+
+def collect_pages(
+    db_session: Session,
+    images_service: ImagesService,
+    owner_id: int,
+    ordering: list[str],
+    size: int = 2,
+) -> list[ImageDetailsSchema]:
+    query = images_service.filter_images_query(ImageFilter(owner_id=owner_id))
+    items = []
+    cursor = None
+    for _ in range(len(ordering) + 10):
+        page = paginate_keyset(
+            db_session,
+            query,
+            Image,
+            ordering,
+            KeysetParams(cursor=cursor, size=size),
+            ImageDetailsSchema.from_row_bulk,
+        )
+        items.extend(page.items)
+        assert len(page.items) <= size
+        cursor = page.next_cursor
+        if cursor is None:
+            return items
+    pytest.fail("Pagination did not terminate")
+
+
+@pytest.mark.parametrize(
+    "ordering",
+    [["-created_at"], ["title"], ["-title"], ["title", "-created_at"]],
+)
+def test_paginate_keyset_visits_every_row_once(
+    db_session: Session,
+    images_service: ImagesService,
+    owner_images,
+    ordering: list[str],
+):
+    owner, images = owner_images
+    items = collect_pages(db_session, images_service, owner.id, ordering)
+    expected = sorted(
+        images, key=lambda image: str(image.id), reverse=ordering[-1][0] == "-"
+    )
+    for field in reversed(ordering):
+        name = field.lstrip("-")
+        expected.sort(
+            key=lambda image: getattr(image, name), reverse=field.startswith("-")
+        )
+    assert [item.id for item in items] == [str(image.id) for image in expected]
+
+
+def test_paginate_keyset_total(
+    db_session: Session,
+    images_service: ImagesService,
+    owner_images,
+):
+    owner, _ = owner_images
+    page = paginate_keyset(
+        db_session,
+        images_service.filter_images_query(ImageFilter(owner_id=owner.id)),
+        Image,
+        ["-created_at"],
+        KeysetParams(size=2, include_total=True),
+        ImageDetailsSchema.from_row_bulk,
+    )
+    assert page.total == 5
+    assert page.next_cursor is not None
+
+
+@pytest.mark.parametrize(
+    "ordering,cursor",
+    [
+        (["description"], None),
+        (["-created_at"], "not-a-cursor"),
+        (["title"], "eyJrIjogWyItY3JlYXRlZF9hdCJdLCAidiI6IFtdfQ=="),
+    ],
+)
+def test_paginate_keyset_invalid(
+    db_session: Session,
+    images_service: ImagesService,
+    ordering: list[str],
+    cursor: str | None,
+):
+    with pytest.raises(InvalidCursor):
+        paginate_keyset(
+            db_session,
+            images_service.filter_images_query(ImageFilter()),
+            Image,
+            ordering,
+            KeysetParams(cursor=cursor),
+            ImageDetailsSchema.from_row_bulk,
+        )
+
+
+def test_paginate_liked_images_by_like_time(
+    db_session: Session,
+    images_service: ImagesService,
+    owner_images,
+    image_factory,
+    user_factory,
+):
+    owner, images = owner_images
+    other_image = image_factory()
+    other_image.file = ImageFile(filename="a.jpg", content_type="image/jpeg", size=1)
+    user = user_factory()
+    liked_at = datetime(2024, 1, 1)
+    for offset, image in enumerate([*images, other_image]):
+        db_session.add(
+            UserImageLikes(
+                user_id=user.id,
+                image_id=image.id,
+                liked_at=liked_at + timedelta(minutes=offset % 3),
+            )
+        )
+    db_session.commit()
+    query = images_service.filter_liked_images_query(
+        user, ImageFilter(owner_id=owner.id)
+    )
+
+    items = []
+    cursor = None
+    for _ in range(len(images)):
+        page = paginate_keyset(
+            db_session,
+            query,
+            UserImageLikes,
+            ["-liked_at"],
+            KeysetParams(cursor=cursor, size=2),
+            ImageLikedSchema.from_row_bulk,
+        )
+        items.extend(page.items)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    expected = sorted(
+        images,
+        key=lambda image: (images.index(image) % 3, str(image.id)),
+        reverse=True,
+    )
+    assert [item.id for item in items] == [str(image.id) for image in expected]
+    assert [item.liked_at for item in items] == sorted(
+        (item.liked_at for item in items), reverse=True
+    )
+    assert [row.id for row in db_session.exec(query)] == [
+        image.id for image in expected
+    ]
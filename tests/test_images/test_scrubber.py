@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+
+import pytest
+
+from src.db.service import Database
+from src.images.models import Image, ImageBlob, ImageFile
+from src.images.scrubber import StorageScrubber
+from src.images.storage import ContentAddressedImageStorage, LocalImageStorage
+
+CONTENT = b"content"
+
+
+@pytest.fixture
+def database(image_storage_location: str):
+    database = Database(f"sqlite:///{image_storage_location}/images.db")
+    database.create_tables()
+    return database
+
+
+@pytest.fixture
+def checkpoint_path(image_storage_location: str):
+    return os.path.join(image_storage_location, "checkpoint.json")
+
+
+@pytest.fixture
+def stored_image_ids(
+    database: Database,
+    image_storage: LocalImageStorage,
+    image_storage_location: str,
+):
+    image_ids = {}
+    with database.session() as session:
+        for name, size in (("valid", 7), ("missing", 7), ("resized", 3)):
+            image = Image(title=name)
+            image.file = ImageFile(
+                filename="a.jpg",
+                content_type="image/jpeg",
+                size=size,
+                content_hash=hashlib.sha256(CONTENT).hexdigest(),
+            )
+            session.add(image)
+            image_ids[name] = str(image.id)
+        session.commit()
+    image_ids["orphan"] = str(uuid.uuid4())
+    image_ids["uploading"] = str(uuid.uuid4())
+    for name in ("valid", "resized", "orphan", "uploading"):
+        image_path = image_storage._get_image_path(image_ids[name])
+        os.makedirs(os.path.dirname(image_path), exist_ok=True)
+        with open(image_path, "wb") as image_file:
+            image_file.write(CONTENT)
+    old_timestamp = time.time() - 7200
+    orphan_path = image_storage._get_image_path(image_ids["orphan"])
+    os.utime(orphan_path, (old_timestamp, old_timestamp))
+    return image_ids
+
+
+@pytest.mark.asyncio
+async def test_scrubber_reports(
+    database: Database,
+    image_storage: LocalImageStorage,
+    checkpoint_path: str,
+    stored_image_ids: dict[str, str],
+):
+    scrubber = StorageScrubber(database, image_storage, checkpoint_path, batch_size=2)
+    report = await scrubber.run()
+    assert (report.checked_rows, report.checked_files) == (3, 4)
+    assert (report.missing_files, report.size_mismatches) == (1, 1)
+    assert (report.orphan_files, report.repaired) == (1, 0)
+    assert os.path.exists(image_storage._get_image_path(stored_image_ids["orphan"]))
+    with open(checkpoint_path) as checkpoint_file:
+        assert json.load(checkpoint_file)["cursor"] is None
+
+
+@pytest.mark.asyncio
+async def test_scrubber_repairs(
+    database: Database,
+    image_storage: LocalImageStorage,
+    checkpoint_path: str,
+    stored_image_ids: dict[str, str],
+):
+    scrubber = StorageScrubber(
+        database, image_storage, checkpoint_path, verify_hash=True, repair=True
+    )
+    report = await scrubber.run()
+    assert (report.hash_mismatches, report.repaired) == (0, 2)
+    assert not os.path.exists(image_storage._get_image_path(stored_image_ids["orphan"]))
+    assert os.path.exists(image_storage._get_image_path(stored_image_ids["uploading"]))
+    with database.session() as session:
+        assert session.get(Image, uuid.UUID(stored_image_ids["missing"])) is not None
+        resized_file = session.get(ImageFile, uuid.UUID(stored_image_ids["resized"]))
+        assert resized_file.size == len(CONTENT)
+
+
+@pytest.mark.asyncio
+async def test_scrubber_collects_abandoned_uploads(
+    database: Database,
+    image_storage: LocalImageStorage,
+    image_storage_location: str,
+    checkpoint_path: str,
+):
+    temp_paths = {}
+    for name in ("abandoned", "writing"):
+        temp_paths[name] = os.path.join(
+            image_storage_location, f"{uuid.uuid4()}.{uuid.uuid4().hex}"
+        )
+        with open(temp_paths[name], "wb") as temp_file:
+            temp_file.write(CONTENT)
+    old_timestamp = time.time() - 7200
+    os.utime(temp_paths["abandoned"], (old_timestamp, old_timestamp))
+
+    scrubber = StorageScrubber(database, image_storage, checkpoint_path, repair=True)
+    report = await scrubber.run()
+
+    assert (report.abandoned_files, report.orphan_files) == (1, 0)
+    assert not os.path.exists(temp_paths["abandoned"])
+    assert os.path.exists(temp_paths["writing"])
+
+
+@pytest.mark.asyncio
+async def test_scrubber_verifies_hash(
+    database: Database,
+    image_storage: LocalImageStorage,
+    checkpoint_path: str,
+    stored_image_ids: dict[str, str],
+):
+    with open(image_storage._get_image_path(stored_image_ids["valid"]), "wb") as file:
+        file.write(b"CONTENT")
+    scrubber = StorageScrubber(
+        database, image_storage, checkpoint_path, verify_hash=True
+    )
+    report = await scrubber.run()
+    assert report.hash_mismatches == 1
+
+
+@pytest.mark.asyncio
+async def test_scrubber_resumes_from_checkpoint(
+    database: Database,
+    image_storage: LocalImageStorage,
+    checkpoint_path: str,
+    stored_image_ids: dict[str, str],
+):
+    with open(checkpoint_path, "w") as checkpoint_file:
+        json.dump({"phase": "files", "report": {"checked_rows": 3}}, checkpoint_file)
+    scrubber = StorageScrubber(database, image_storage, checkpoint_path)
+    report = await scrubber.run()
+    assert (report.checked_rows, report.checked_files) == (3, 4)
+    assert (report.missing_files, report.orphan_files) == (0, 1)
+
+
+@pytest.mark.asyncio
+async def test_scrubber_collects_released_blobs(
+    database: Database,
+    image_storage_location: str,
+    checkpoint_path: str,
+):
+    storage = ContentAddressedImageStorage(image_storage_location)
+    blob_paths = {}
+    for name in ("released", "reuploaded", "referenced"):
+        content_hash = hashlib.sha256(name.encode()).hexdigest()
+        blob_paths[name] = storage._get_blob_path(content_hash)
+        os.makedirs(os.path.dirname(blob_paths[name]), exist_ok=True)
+        with open(blob_paths[name], "wb") as blob_file:
+            blob_file.write(CONTENT)
+        if name != "reuploaded":
+            old_timestamp = time.time() - 7200
+            os.utime(blob_paths[name], (old_timestamp, old_timestamp))
+    with database.session() as session:
+        session.add(
+            ImageBlob(
+                content_hash=hashlib.sha256(b"referenced").hexdigest(),
+                size=len(CONTENT),
+                ref_count=1,
+            )
+        )
+        session.commit()
+
+    scrubber = StorageScrubber(database, storage, checkpoint_path, repair=True)
+    report = await scrubber.run()
+
+    assert report.orphan_blobs == 1
+    assert not os.path.exists(blob_paths["released"])
+    assert os.path.exists(blob_paths["reuploaded"])
+    assert os.path.exists(blob_paths["referenced"])
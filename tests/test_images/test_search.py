@@ -0,0 +1,89 @@
+from uuid import UUID
+
+import pytest
+from sqlmodel import Session
+
+from src.images.filters import ImageFilter
+from src.images.models import ImageFile
+from src.images.service import ImagesService
+
+
+@pytest.fixture
+def search_images(db_session: Session, image_factory, user_factory):
+    owner = user_factory()
+    images = {}
+    for title, description in [
+        ("sunset", "Orange sky over the beach"),
+        ("beach", "Sand and sunset colours"),
+        ("mountain", "Snow on the summit"),
+        ("café", "Morning espresso"),
+    ]:
+        image = image_factory(owner=owner, title=title, description=description)
+        image.file = ImageFile(filename="a.jpg", content_type="image/jpeg", size=1)
+        images[title] = image
+    db_session.commit()
+    return owner, images
+
+
+def search(
+    db_session: Session,
+    images_service: ImagesService,
+    owner_id: int,
+    text: str,
+) -> list[str]:
+    query = images_service.filter_images_query(
+        ImageFilter(owner_id=owner_id, search=text)
+    )
+    return [row.title for row in db_session.exec(query)]
+
+
+@pytest.mark.parametrize(
+    "text,expected",
+    [
+        ("sunset", ["sunset", "beach"]),
+        ("SUN", ["sunset", "beach"]),
+        ("sand colours", ["beach"]),
+        ("summ", ["mountain"]),
+        ("cafe", ["café"]),
+        ("volcano", []),
+    ],
+)
+def test_search_images(
+    db_session: Session,
+    images_service: ImagesService,
+    search_images,
+    text: str,
+    expected: list[str],
+):
+    owner, _ = search_images
+    assert search(db_session, images_service, owner.id, text) == expected
+
+
+def test_search_images_ignores_empty_query(
+    db_session: Session,
+    images_service: ImagesService,
+    search_images,
+):
+    owner, images = search_images
+    assert len(search(db_session, images_service, owner.id, "!?")) == len(images)
+
+
+def test_search_images_tracks_changes(
+    db_session: Session,
+    images_service: ImagesService,
+    search_images,
+):
+    owner, images = search_images
+    images["mountain"].title = "volcano"
+    db_session.delete(images["sunset"])
+    db_session.commit()
+    assert search(db_session, images_service, owner.id, "volcano") == ["volcano"]
+    assert search(db_session, images_service, owner.id, "sunset") == ["beach"]
+
+
+def test_search_index_keyed_by_image_id(db_session: Session, search_images):
+    _, images = search_images
+    image_ids = db_session.connection().exec_driver_sql(
+        "SELECT image_id FROM image_fts WHERE image_fts MATCH 'summit'"
+    )
+    assert images["mountain"].id in {UUID(image_id) for image_id, in image_ids}
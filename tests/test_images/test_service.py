@@ -1,12 +1,33 @@
 import uuid
 
 import pytest
+from fastapi import BackgroundTasks, UploadFile
+from fastapi_pagination import Params
+from fastapi_pagination.ext.sqlmodel import paginate
+from sqlalchemy import event
 from sqlmodel import Session, select
 
+from src.containers import Container
+from src.images.cache import DerivativeCache
+from src.images.cached_storage import CacheStatistics, CachingImageStorage
+from src.images.conditional import RequestConditions
 from src.images.exceptions import ImageNotFound
-from src.images.models import Image
-from src.images.schemas import ImageUpdateSchema
+from src.images.filters import ImageFilter
+from src.images.models import (
+    Image,
+    ImageBlob,
+    ImageFile,
+    ImagePaletteColor,
+    ImageVariant,
+    ProcessingState,
+)
+from src.images.schemas import (
+    ImageDetailsSchema,
+    ImageTransformSchema,
+    ImageUpdateSchema,
+)
 from src.images.service import ImagesService
+from src.images.storage import ContentAddressedImageStorage, ImageStorage
 from src.users.exceptions import UserNotFound
 from src.users.models import User
 
@@ -29,6 +50,188 @@ async def test_get_image_file_not_found(images_service: ImagesService):
         await images_service.get_image_file(str(uuid.uuid4()))
 
 
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "size,accept,expected_path",
+    [
+        (100, "image/webp,*/*", "256.webp"),
+        (100, "image/jpeg", "256.jpeg"),
+        (300, "*/*", "1024.webp"),
+    ],
+)
+async def test_get_image_file_variant(
+    db_session: Session,
+    image_storage: ImageStorage,
+    images_service: ImagesService,
+    image_factory,
+    size: int,
+    accept: str,
+    expected_path: str,
+):
+    image: Image = image_factory()
+    image.file = ImageFile(filename="image.png", content_type="image/png", size=1)
+    for dimension in (256, 1024):
+        for image_format in ("webp", "jpeg"):
+            variant = ImageVariant(
+                dimension=dimension,
+                format=image_format,
+                content_type=f"image/{image_format}",
+                size=1,
+                width=dimension,
+                height=dimension,
+            )
+            image.file.variants.append(variant)
+    db_session.add(image)
+    db_session.commit()
+    for variant in image.file.variants:
+        await image_storage.save_variant(variant, b"content")
+    response = await images_service.get_image_file(image.id, size, accept)
+    assert response.path.endswith(expected_path)
+    assert response.headers["Vary"] == "Accept"
+
+
+@pytest.mark.asyncio
+async def test_get_image_file_not_modified(
+    db_session: Session,
+    images_service: ImagesService,
+    image_factory,
+):
+    image: Image = image_factory()
+    image.file = ImageFile(
+        filename="image.png",
+        content_type="image/png",
+        size=1,
+        content_hash="abc",
+    )
+    db_session.add(image)
+    db_session.commit()
+    conditions = RequestConditions(if_none_match='"abc"')
+    response = await images_service.get_image_file(image.id, conditions=conditions)
+    assert response.status_code == 304
+    assert response.headers["ETag"] == '"abc"'
+    assert response.headers["Cache-Control"] == "no-cache"
+
+
+@pytest.mark.asyncio
+async def test_get_image_file_versioned(
+    db_session: Session,
+    image_storage: ImageStorage,
+    images_service: ImagesService,
+    image_factory,
+    uploaded_file: UploadFile,
+):
+    image: Image = image_factory()
+    image.file = await image_storage.save_image(str(image.id), uploaded_file)
+    db_session.add(image)
+    db_session.commit()
+    response = await images_service.get_image_file(
+        image.id, version=image.file.content_hash
+    )
+    assert response.status_code == 200
+    assert response.headers["ETag"] == f'"{image.file.content_hash}"'
+    assert "immutable" in response.headers["Cache-Control"]
+
+
+@pytest.mark.asyncio
+async def test_get_image_file_range(
+    db_session: Session,
+    image_storage: ImageStorage,
+    images_service: ImagesService,
+    image_factory,
+    uploaded_file: UploadFile,
+):
+    image: Image = image_factory()
+    image.file = await image_storage.save_image(str(image.id), uploaded_file)
+    db_session.add(image)
+    db_session.commit()
+    conditions = RequestConditions(range="bytes=0-9")
+    response = await images_service.get_image_file(image.id, conditions=conditions)
+    content = b"".join([chunk async for chunk in response.body_iterator])
+    assert response.status_code == 206
+    assert response.headers["Content-Range"] == f"bytes 0-9/{image.file.size}"
+    assert content == (await image_storage.read_image(image.file))[:10]
+
+
+@pytest.mark.asyncio
+async def test_get_transformed_image(
+    db_session: Session,
+    image_storage: ImageStorage,
+    images_service: ImagesService,
+    image_factory,
+    uploaded_file: UploadFile,
+):
+    image: Image = image_factory()
+    image.file = await image_storage.save_image(str(image.id), uploaded_file)
+    db_session.add(image)
+    db_session.commit()
+    transform = ImageTransformSchema(width=100, height=100, fit="cover", quality=80)
+    response = await images_service.get_transformed_image(
+        image.id, transform, "image/webp"
+    )
+    cached_response = await images_service.get_transformed_image(
+        image.id, transform, "image/webp"
+    )
+    assert response.media_type == "image/webp"
+    content = b"".join([chunk async for chunk in response.body_iterator])
+    cached_content = b"".join([chunk async for chunk in cached_response.body_iterator])
+    assert content == cached_content
+    assert response.headers["Content-Length"] == str(len(content))
+
+
+@pytest.mark.asyncio
+async def test_deduplicated_upload_reuses_processing(
+    container: Container,
+    db_session: Session,
+    background_tasks: BackgroundTasks,
+    image_storage_location: str,
+    image_factory,
+    uploaded_file: UploadFile,
+):
+    storage = ContentAddressedImageStorage(image_storage_location)
+    with container.image_storage.override(storage):
+        images_service = ImagesService(db_session, background_tasks)
+        first_image = await images_service.create_image(image_factory(), uploaded_file)
+        first_image.file.width = 10
+        first_image.file.dominant_color = "#ff0000"
+        first_image.file.palette = [ImagePaletteColor(color="#ff0000")]
+        first_image.file.processing_state = ProcessingState.DONE
+        db_session.commit()
+        await uploaded_file.seek(0)
+        second_image = await images_service.create_image(image_factory(), uploaded_file)
+        content_hash = second_image.file.content_hash
+        blob = db_session.get(ImageBlob, content_hash)
+        assert second_image.file.processing_state == ProcessingState.DONE
+        assert second_image.file.processing_job is None
+        assert second_image.file.width == 10
+        assert [color.color for color in second_image.file.palette] == ["#ff0000"]
+        assert blob.ref_count == 2
+
+        await images_service.delete_image(first_image)
+        assert await storage.read_image(second_image.file)
+        await images_service.delete_image(second_image)
+        assert db_session.get(ImageBlob, content_hash) is None
+        assert [blob.name async for blob in storage.list_blobs()] == [content_hash]
+
+
+@pytest.mark.asyncio
+async def test_get_cache_statistics(
+    db_session: Session,
+    background_tasks: BackgroundTasks,
+    container: Container,
+    image_storage: ImageStorage,
+    derivative_cache: DerivativeCache,
+    uploaded_file: UploadFile,
+):
+    images_service = ImagesService(db_session, background_tasks)
+    assert images_service.get_cache_statistics() == CacheStatistics()
+    caching_storage = CachingImageStorage(image_storage, derivative_cache)
+    file_metadata = await caching_storage.save_image(str(uuid.uuid4()), uploaded_file)
+    await caching_storage.read_image(file_metadata)
+    with container.image_storage.override(caching_storage):
+        images_service = ImagesService(db_session, background_tasks)
+        assert images_service.get_cache_statistics().misses == 1
+
+
 def test_update_image_details(
     db_session: Session,
     images_service: ImagesService,
@@ -52,9 +255,64 @@ def test_like_image(
 ):
     image: Image = image_factory()
     user: User = user_factory()
-    images_service.like_image(image, user)
+    images_service.like_image(image.id, user)
+    images_service.like_image(str(image.id), user)
     image_in_db = db_session.exec(select(Image).where(Image.id == image.id)).one()
-    assert user in image_in_db.liked_by
+    db_session.refresh(image_in_db)
+    assert image_in_db.liked_by == [user]
+
+
+def test_like_popular_image_constant_statements(
+    db_session: Session,
+    images_service: ImagesService,
+    image_factory,
+    user_factory,
+):
+    image: Image = image_factory()
+    for _ in range(20):
+        user_factory(liked_images=[image])
+    db_session.commit()
+    user: User = user_factory()
+    statements = []
+    engine = db_session.get_bind()
+
+    def count_statement(*args):
+        statements.append(args)
+
+    for toggle_like in (images_service.like_image, images_service.remove_like):
+        image_id = image.id
+        db_session.refresh(user)
+        event.listen(engine, "before_cursor_execute", count_statement)
+        try:
+            toggle_like(image_id, user)
+        finally:
+            event.remove(engine, "before_cursor_execute", count_statement)
+    assert len(statements) == 4
+
+
+def test_like_count(
+    db_session: Session,
+    images_service: ImagesService,
+    image_factory,
+    user_factory,
+):
+    image: Image = image_factory()
+    image_id = image.id
+    users = user_factory.create_batch(3)
+    db_session.commit()
+    for user in users:
+        images_service.like_image(image_id, user)
+    images_service.like_image(image_id, users[0])
+    images_service.remove_like(image_id, users[1])
+    image_in_db = db_session.get(Image, image_id)
+    db_session.refresh(image_in_db)
+    assert image_in_db.like_count == 2
+    assert image_in_db.likes_updated_at is not None
+
+
+def test_like_image_not_found(images_service: ImagesService, user_factory):
+    with pytest.raises(ImageNotFound):
+        images_service.like_image(uuid.uuid4(), user_factory())
 
 
 def test_remove_like(
@@ -65,8 +323,9 @@ def test_remove_like(
 ):
     image: Image = image_factory()
     user: User = user_factory(liked_images=[image])
-    images_service.remove_like(image, user)
+    images_service.remove_like(image.id, user)
     image_in_db = db_session.exec(select(Image).where(Image.id == image.id)).one()
+    db_session.refresh(image_in_db)
     assert user not in image_in_db.liked_by
 
 
@@ -78,4 +337,71 @@ def test_remove_like_not_found(
     image: Image = image_factory()
     user: User = user_factory()
     with pytest.raises(UserNotFound):
-        images_service.remove_like(image, user)
+        images_service.remove_like(image.id, user)
+    with pytest.raises(ImageNotFound):
+        images_service.remove_like(uuid.uuid4(), user)
+
+
+@pytest.mark.asyncio
+async def test_delete_images_removes_files(
+    db_session: Session,
+    image_storage: ImageStorage,
+    images_service: ImagesService,
+    image_factory,
+    uploaded_file: UploadFile,
+):
+    images = []
+    for _ in range(2):
+        await uploaded_file.seek(0)
+        images.append(await images_service.create_image(image_factory(), uploaded_file))
+    files = [image.file for image in images]
+    await images_service.delete_images(images)
+    for file_metadata in files:
+        assert db_session.get(ImageFile, file_metadata.image_id) is None
+        with pytest.raises(ImageNotFound):
+            await image_storage.read_image(file_metadata)
+
+
+@pytest.mark.parametrize("page_size", [2, 10])
+def test_list_images_statement_count(
+    db_session: Session,
+    images_service: ImagesService,
+    image_factory,
+    user_factory,
+    page_size: int,
+):
+    owner = user_factory()
+    fans = user_factory.create_batch(3)
+    for _ in range(5):
+        image = image_factory(owner=owner, liked_by=fans)
+        image.file = ImageFile(
+            filename="image.jpg",
+            content_type="image/jpeg",
+            size=1,
+            palette=[
+                ImagePaletteColor(color="#ff0000"),
+                ImagePaletteColor(color="#00ff00"),
+            ],
+        )
+    db_session.commit()
+    query = images_service.filter_images_query(ImageFilter(owner_id=owner.id))
+    statements = []
+    engine = db_session.get_bind()
+
+    def count_statement(*args):
+        statements.append(args)
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+    try:
+        page = paginate(
+            db_session,
+            query,
+            Params(size=page_size),
+            transformer=ImageDetailsSchema.from_row_bulk,
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+    assert len(statements) == 2
+    assert len(page.items) == min(page_size, 5)
+    assert page.items[0].owner == owner.username
+    assert sorted(page.items[0].palette) == ["#00ff00", "#ff0000"]
@@ -0,0 +1,183 @@
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import numpy as np
+import pytest
+from sqlmodel import Session
+
+from src.containers import Container
+from src.images.analysis import EMBEDDING_DIMENSION, color_embedding
+from src.images.models import ImageFile
+from src.images.service import ImagesService
+from src.images.similarity import IVFIndex, SimilarityIndex, decode_embedding
+
+LIST_COUNT = 8
+PROBE_COUNT = 3
+MIN_RECALL = 0.9
+
+
+def random_vectors(generator: np.random.Generator, count: int) -> np.ndarray:
+    centers = generator.random((LIST_COUNT, EMBEDDING_DIMENSION))
+    vectors = centers[generator.integers(LIST_COUNT, size=count)]
+    vectors += generator.normal(scale=0.1, size=vectors.shape)
+    vectors = np.abs(vectors)
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float16)
+
+
+@pytest.fixture
+def trained_index():
+    generator = np.random.default_rng(0)
+    index = IVFIndex(EMBEDDING_DIMENSION, LIST_COUNT, PROBE_COUNT)
+    vectors = random_vectors(generator, 1000)
+    ids = [uuid4() for _ in vectors]
+    for image_id, vector in zip(ids, vectors):
+        index.add(image_id, vector)
+    assert index.needs_training
+    index.train()
+    return index, ids, vectors.astype(np.float32)
+
+
+def embed(pixels: list[list[int]]) -> np.ndarray:
+    return decode_embedding(color_embedding(np.array(pixels, dtype=np.uint8)))
+
+
+def test_color_embedding():
+    red = np.tile(np.array([[255, 0, 0]], dtype=np.uint8), (100, 1))
+    mixed = np.concatenate([red, np.full((100, 3), 255, dtype=np.uint8)])
+    red_embedding = decode_embedding(color_embedding(red))
+    mixed_embedding = decode_embedding(color_embedding(mixed))
+    assert red_embedding.shape == (EMBEDDING_DIMENSION,)
+    assert np.linalg.norm(red_embedding) == pytest.approx(1, abs=1e-3)
+    assert red_embedding @ mixed_embedding == pytest.approx(np.sqrt(0.5), abs=1e-3)
+
+
+def test_color_embedding_similar_shades():
+    red = embed([[250, 10, 10]])
+    dark_red = embed([[200, 0, 0]])
+    orange = embed([[255, 140, 0]])
+    blue = embed([[0, 0, 255]])
+    assert red @ dark_red > red @ orange > red @ blue
+
+
+def test_ivf_index_recall(trained_index):
+    index, ids, vectors = trained_index
+    hits = 0
+    for query_index in range(50):
+        expected = set(
+            ids[position]
+            for position in np.argsort(-(vectors @ vectors[query_index]))[1:11]
+        )
+        matches = index.search(vectors[query_index], 10, exclude=ids[query_index])
+        assert ids[query_index] not in {match.image_id for match in matches}
+        hits += len(expected & {match.image_id for match in matches})
+    assert hits / 500 >= MIN_RECALL
+
+
+def test_ivf_index_incremental_updates(trained_index):
+    index, ids, vectors = trained_index
+    index.remove(ids[0])
+    new_id = uuid4()
+    index.add(new_id, vectors[0])
+    matches = index.search(vectors[0], 1)
+    assert matches[0].image_id == new_id
+    assert len(index) == len(ids)
+
+
+def test_ivf_index_persistence(trained_index, tmp_path):
+    index, ids, vectors = trained_index
+    index.remove(ids[1])
+    index.save(tmp_path / "similarity.npz", synced_until="2024-01-01T00:00:00")
+
+    restored = IVFIndex(EMBEDDING_DIMENSION, LIST_COUNT, PROBE_COUNT)
+    metadata = restored.load(tmp_path / "similarity.npz")
+
+    assert metadata == {"synced_until": "2024-01-01T00:00:00"}
+    assert len(restored) == len(ids) - 1
+    assert restored.search(vectors[2], 5) == index.search(vectors[2], 5)
+    restored.add(uuid4(), vectors[1])
+    assert len(restored) == len(ids)
+
+
+def test_find_similar_images(
+    db_session: Session,
+    images_service: ImagesService,
+    image_factory,
+    container: Container,
+):
+    colors = {
+        "red": [[250, 10, 10]],
+        "dark red": [[200, 0, 0]],
+        "blue": [[0, 0, 255]],
+    }
+    images = {}
+    for title, pixels in colors.items():
+        image = image_factory(title=title)
+        image.file = ImageFile(
+            filename="a.jpg",
+            content_type="image/jpeg",
+            size=1,
+            embedding=color_embedding(np.array(pixels, dtype=np.uint8)),
+            analyzed_at=datetime.utcnow(),
+        )
+        images[title] = image
+    db_session.commit()
+    container.similarity_index().refresh(force=True)
+
+    similar = images_service.find_similar_images(images["red"].id, 10)
+
+    scores = {row.title: match.similarity for row, match in similar}
+    assert "red" not in scores
+    assert scores["dark red"] > scores.get("blue", 0)
+    assert [match.similarity for _, match in similar] == sorted(
+        (match.similarity for _, match in similar), reverse=True
+    )
+
+
+def test_similarity_index_sync(
+    db_session: Session,
+    image_factory,
+    container: Container,
+    tmp_path,
+):
+    embedding = color_embedding(np.array([[250, 10, 10]], dtype=np.uint8))
+
+    def create_index():
+        return SimilarityIndex(
+            container.db(),
+            EMBEDDING_DIMENSION,
+            LIST_COUNT,
+            PROBE_COUNT,
+            refresh_interval=0,
+            reconcile_interval=3600,
+            location=tmp_path / "similarity.npz",
+        )
+
+    def add_image(title: str, analyzed_at: datetime):
+        image = image_factory(title=title)
+        image.file = ImageFile(
+            filename="a.jpg",
+            content_type="image/jpeg",
+            size=1,
+            embedding=embedding,
+            analyzed_at=analyzed_at,
+        )
+        db_session.commit()
+        return image
+
+    now = datetime.utcnow()
+    deleted = add_image("deleted", now)
+    index = create_index()
+    index.refresh()
+    index.save()
+    late = add_image("late", now - timedelta(seconds=10))
+    db_session.delete(deleted)
+    db_session.commit()
+
+    restored = create_index()
+    restored.refresh()
+
+    image_ids = {
+        match.image_id for match in restored.find(None, embedding, len(restored))
+    }
+    assert late.id in image_ids
+    assert deleted.id not in image_ids
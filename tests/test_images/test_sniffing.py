@@ -0,0 +1,84 @@
+import struct
+from io import BytesIO
+
+import pytest
+from PIL import Image as PILImage
+
+from src.images.exceptions import InvalidImage
+from src.images.sniffing import ImageHeader, TruncatedHeader, sniff_image_header
+from src.images.upload import HeaderSniffer
+
+WIDTH, HEIGHT = 37, 21
+
+
+def encode(image_format: str, mode: str = "RGB", **params) -> bytes:
+    buffer = BytesIO()
+    PILImage.new(mode, (WIDTH, HEIGHT)).save(buffer, format=image_format, **params)
+    return buffer.getvalue()
+
+
+def bmff_box(box_type: bytes, body: bytes) -> bytes:
+    return struct.pack(">I4s", len(body) + 8, box_type) + body
+
+
+def encode_heic() -> bytes:
+    ftyp = bmff_box(b"ftyp", b"heic" + b"\0\0\0\0" + b"mif1heic")
+    ispe = bmff_box(b"ispe", b"\0\0\0\0" + struct.pack(">II", WIDTH, HEIGHT))
+    thumbnail_ispe = bmff_box(b"ispe", b"\0\0\0\0" + struct.pack(">II", 8, 8))
+    ipco = bmff_box(b"ipco", thumbnail_ispe + ispe)
+    meta = bmff_box(b"meta", b"\0\0\0\0" + bmff_box(b"iprp", ipco))
+    return ftyp + meta + bmff_box(b"mdat", b"\0" * 16)
+
+
+@pytest.mark.parametrize(
+    "content,content_type",
+    [
+        (encode("PNG"), "image/png"),
+        (encode("JPEG"), "image/jpeg"),
+        (encode("JPEG", progressive=True), "image/jpeg"),
+        (encode("GIF"), "image/gif"),
+        (encode("BMP"), "image/bmp"),
+        (encode("WEBP"), "image/webp"),
+        (encode("WEBP", lossless=True), "image/webp"),
+        (encode("WEBP", mode="RGBA"), "image/webp"),
+        (encode_heic(), "image/heic"),
+    ],
+)
+def test_sniff_image_header(content: bytes, content_type: str):
+    assert sniff_image_header(content) == ImageHeader(content_type, WIDTH, HEIGHT)
+
+
+def test_sniff_image_header_jpeg_exif(original_image_path: str):
+    with open(original_image_path, "rb") as image_file:
+        header = sniff_image_header(image_file.read())
+    assert header == ImageHeader("image/jpeg", 783, 551)
+
+
+def test_sniff_image_header_truncated():
+    with pytest.raises(TruncatedHeader):
+        sniff_image_header(encode("PNG")[:20])
+
+
+def test_sniff_image_header_unknown():
+    assert sniff_image_header(b"not an image at all") is None
+
+
+def test_header_sniffer_chunked():
+    content = encode("JPEG")
+    sniffer = HeaderSniffer("image/jpg")
+    for offset in range(0, len(content), 16):
+        sniffer.update(content[offset : offset + 16])
+    assert sniffer.result() == ImageHeader("image/jpeg", WIDTH, HEIGHT)
+
+
+def test_header_sniffer_mismatch():
+    sniffer = HeaderSniffer("image/png")
+    with pytest.raises(InvalidImage):
+        sniffer.update(encode("JPEG"))
+
+
+def test_header_sniffer_corrupt():
+    sniffer = HeaderSniffer("image/png")
+    sniffer.update(encode("PNG")[:20])
+    with pytest.raises(InvalidImage):
+        sniffer.result()
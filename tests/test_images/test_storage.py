@@ -1,35 +1,23 @@
 import os
 import uuid
+from io import BytesIO
 
 import pytest
 from fastapi import UploadFile
 from fastapi.responses import FileResponse
 
-from src.images.exceptions import ImageNotFound
-from src.images.models import ImageFile
-from src.images.storage import ImageStorage
+from src.images.exceptions import ImageNotFound, InvalidImage
+from src.images.models import ImageFile, ImageVariant
+from src.images.storage import (
+    ContentAddressedImageStorage,
+    ImageStorage,
+    LocalImageStorage,
+)
 
 TEST_IMAGE_FILENAME = "colors.jpg"
 TEST_IMAGE_MIME = "image/jpeg"
 
 
-@pytest.fixture(scope="session")
-def original_image_path(assets_directory: str):
-    return os.path.join(assets_directory, TEST_IMAGE_FILENAME)
-
-
-@pytest.fixture
-def uploaded_file(original_image_path: str):
-    file_size = os.stat(original_image_path).st_size
-    with open(original_image_path, "rb") as image_file:
-        yield UploadFile(
-            image_file,
-            size=file_size,
-            filename=TEST_IMAGE_FILENAME,
-            headers={"content-type": TEST_IMAGE_MIME},
-        )
-
-
 @pytest.mark.asyncio
 async def test_save_image_metadata(
     image_storage: ImageStorage,
@@ -40,6 +28,22 @@ async def test_save_image_metadata(
     assert file_metadata.image_id == image_id
     assert file_metadata.filename == TEST_IMAGE_FILENAME
     assert file_metadata.content_type == TEST_IMAGE_MIME
+    assert (file_metadata.width, file_metadata.height) == (783, 551)
+
+
+@pytest.mark.asyncio
+async def test_save_image_invalid(
+    image_storage_location: str,
+    image_storage: ImageStorage,
+):
+    uploaded_file = UploadFile(
+        BytesIO(b"definitely not a jpeg"),
+        filename=TEST_IMAGE_FILENAME,
+        headers={"content-type": TEST_IMAGE_MIME},
+    )
+    with pytest.raises(InvalidImage):
+        await image_storage.save_image(str(uuid.uuid4()), uploaded_file)
+    assert os.listdir(image_storage_location) == []
 
 
 @pytest.mark.asyncio
@@ -51,11 +55,27 @@ async def test_save_image_file_created(
 ):
     image_id = str(uuid.uuid4())
     await image_storage.save_image(image_id, uploaded_file)
-    saved_image_path = os.path.join(image_storage_location, image_id)
+    saved_image_path = os.path.join(
+        image_storage_location, image_id[:2], image_id[2:4], image_id
+    )
     assert os.path.exists(saved_image_path)
     assert os.stat(saved_image_path).st_size == os.stat(original_image_path).st_size
 
 
+@pytest.mark.asyncio
+async def test_get_image_source(
+    original_image_path: str,
+    image_storage: ImageStorage,
+    uploaded_file: UploadFile,
+):
+    file_metadata = await image_storage.save_image(str(uuid.uuid4()), uploaded_file)
+    image_source = await image_storage.get_image_source(file_metadata)
+    assert os.path.isabs(image_source)
+    with open(image_source, "rb") as saved_file:
+        with open(original_image_path, "rb") as original_file:
+            assert saved_file.read() == original_file.read()
+
+
 @pytest.mark.asyncio
 async def test_load_image_response(
     image_storage_location: str,
@@ -77,6 +97,68 @@ async def test_load_image_response(
     assert response.filename == TEST_IMAGE_FILENAME
 
 
+@pytest.mark.asyncio
+async def test_load_image_x_accel_redirect(
+    image_storage_location: str,
+    uploaded_file: UploadFile,
+):
+    image_storage = LocalImageStorage(
+        image_storage_location, "x_accel_redirect", "/protected-images"
+    )
+    file_metadata = await image_storage.save_image(str(uuid.uuid4()), uploaded_file)
+    response = await image_storage.load_image(file_metadata)
+    assert response.body == b""
+    assert response.media_type == TEST_IMAGE_MIME
+    image_id = file_metadata.image_id
+    assert (
+        response.headers["X-Accel-Redirect"]
+        == f"/protected-images/{image_id[:2]}/{image_id[2:4]}/{image_id}"
+    )
+    assert TEST_IMAGE_FILENAME in response.headers["Content-Disposition"]
+
+
+@pytest.mark.asyncio
+async def test_load_variant_x_sendfile(image_storage_location: str):
+    image_storage = LocalImageStorage(image_storage_location, "x_sendfile")
+    variant = ImageVariant(
+        image_id=uuid.uuid4(),
+        dimension=256,
+        format="webp",
+        content_type="image/webp",
+    )
+    await image_storage.save_variant(variant, b"content")
+    response = await image_storage.load_variant(variant)
+    assert os.path.isabs(response.headers["X-Sendfile"])
+    with open(response.headers["X-Sendfile"], "rb") as variant_file:
+        assert variant_file.read() == b"content"
+
+
+@pytest.mark.asyncio
+async def test_migrate_image(image_storage_location: str, uploaded_file: UploadFile):
+    image_storage = LocalImageStorage(image_storage_location)
+    image_id = str(uuid.uuid4())
+    legacy_variants_directory = os.path.join(
+        image_storage_location, "variants", image_id
+    )
+    os.makedirs(legacy_variants_directory)
+    with open(os.path.join(legacy_variants_directory, "256.webp"), "wb") as variant:
+        variant.write(b"content")
+    with open(os.path.join(image_storage_location, image_id), "wb") as image_file:
+        image_file.write(await uploaded_file.read())
+    file_metadata = ImageFile(image_id=image_id, content_type=TEST_IMAGE_MIME)
+    variant = ImageVariant(image_id=image_id, dimension=256, format="webp")
+    legacy_response = await image_storage.load_variant(variant)
+
+    assert image_storage.migrate_image(image_id)
+    assert not image_storage.migrate_image(image_id)
+    assert sorted(os.listdir(image_storage_location)) == [image_id[:2], "variants"]
+    assert not os.path.exists(legacy_response.path)
+    await uploaded_file.seek(0)
+    assert await image_storage.read_image(file_metadata) == await uploaded_file.read()
+    response = await image_storage.load_variant(variant)
+    assert response.path.endswith(os.path.join(image_id[2:4], image_id, "256.webp"))
+
+
 @pytest.mark.asyncio
 async def test_load_image_not_found(image_storage: ImageStorage):
     metadata = ImageFile(image_id=uuid.uuid4())
@@ -89,3 +171,82 @@ async def test_delete_image_not_found(image_storage: ImageStorage):
     metadata = ImageFile(image_id=uuid.uuid4())
     with pytest.raises(ImageNotFound):
         await image_storage.delete_image(metadata)
+
+
+@pytest.mark.asyncio
+async def test_delete_images(
+    image_storage_location: str,
+    image_storage: ImageStorage,
+    uploaded_file: UploadFile,
+):
+    files = []
+    for _ in range(3):
+        await uploaded_file.seek(0)
+        files.append(await image_storage.save_image(str(uuid.uuid4()), uploaded_file))
+        await image_storage.save_variant(
+            ImageVariant(image_id=files[-1].image_id, dimension=256, format="webp"),
+            b"content",
+        )
+    await image_storage.delete_images([*files, ImageFile(image_id=uuid.uuid4())])
+    for file_metadata in files:
+        with pytest.raises(ImageNotFound):
+            await image_storage.read_image(file_metadata)
+    for _, _, filenames in os.walk(image_storage_location):
+        assert filenames == []
+
+
+@pytest.mark.asyncio
+async def test_load_variant_response(image_storage: ImageStorage):
+    variant = ImageVariant(
+        image_id=uuid.uuid4(),
+        dimension=256,
+        format="webp",
+        content_type="image/webp",
+    )
+    await image_storage.save_variant(variant, b"content")
+    response = await image_storage.load_variant(variant)
+    assert isinstance(response, FileResponse)
+    assert response.media_type == "image/webp"
+
+
+@pytest.mark.asyncio
+async def test_load_variant_not_found(image_storage: ImageStorage):
+    variant = ImageVariant(image_id=uuid.uuid4(), dimension=256, format="webp")
+    with pytest.raises(ImageNotFound):
+        await image_storage.load_variant(variant)
+
+
+@pytest.mark.asyncio
+async def test_content_addressed_save_image(
+    image_storage_location: str,
+    uploaded_file: UploadFile,
+):
+    storage = ContentAddressedImageStorage(image_storage_location)
+    first_file = await storage.save_image(str(uuid.uuid4()), uploaded_file)
+    await uploaded_file.seek(0)
+    second_file = await storage.save_image(str(uuid.uuid4()), uploaded_file)
+    blob_path = os.path.join(
+        image_storage_location,
+        "blobs",
+        first_file.content_hash[:2],
+        first_file.content_hash,
+    )
+    assert first_file.content_hash == second_file.content_hash
+    assert os.path.exists(blob_path)
+    assert await storage.read_image(second_file) == await storage.read_image(first_file)
+
+
+@pytest.mark.asyncio
+async def test_copy_variant(image_storage: ImageStorage):
+    variant = ImageVariant(
+        image_id=uuid.uuid4(),
+        dimension=256,
+        format="webp",
+        content_type="image/webp",
+    )
+    await image_storage.save_variant(variant, b"content")
+    copied_variant = await image_storage.copy_variant(variant, uuid.uuid4())
+    await image_storage.save_variant(variant, b"updated")
+    response = await image_storage.load_variant(copied_variant)
+    with open(response.path, "rb") as variant_file:
+        assert variant_file.read() == b"content"
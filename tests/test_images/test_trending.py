@@ -0,0 +1,148 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import Session, select, update
+
+from src.db.pagination import KeysetParams, paginate_keyset
+from src.db.service import Database
+from src.images.filters import ImageFilter
+from src.images.models import Image, ImageFile, TrendingImage
+from src.images.schemas import ImageDetailsSchema
+from src.images.service import ImagesService
+from src.images.trending import TrendingScores, reconcile_like_counts
+
+HALF_LIFE = 3600
+MIN_SCORE = 0.1
+
+
+def add_file(image: Image) -> Image:
+    image.file = ImageFile(filename="a.jpg", content_type="image/jpeg", size=1)
+    return image
+
+
+def test_reconcile_like_counts(
+    db_session: Session,
+    database: Database,
+    image_factory,
+    user_factory,
+):
+    image = image_factory()
+    user_factory.create_batch(2, liked_images=[image])
+    db_session.commit()
+    image_id = image.id
+    db_session.exec(update(Image).where(Image.id == image_id).values(like_count=7))
+    db_session.commit()
+
+    assert reconcile_like_counts(database, batch_size=2) >= 1
+
+    db_session.expire_all()
+    assert db_session.get(Image, image_id).like_count == 2
+    assert reconcile_like_counts(database) == 0
+
+
+def test_trending_scores_decay(
+    db_session: Session,
+    database: Database,
+    images_service: ImagesService,
+    image_factory,
+    user_factory,
+):
+    scores = TrendingScores(database, HALF_LIFE, MIN_SCORE)
+    older = add_file(image_factory(title="older"))
+    newer = add_file(image_factory(title="newer"))
+    users = user_factory.create_batch(3)
+    db_session.commit()
+    image_ids = {older.id: "older", newer.id: "newer"}
+    now = datetime.utcnow()
+
+    for user in users:
+        images_service.like_image(older.id, user)
+    scores.refresh(now)
+    for user in users[:2]:
+        images_service.like_image(newer.id, user)
+    later = now + timedelta(seconds=2 * HALF_LIFE)
+    scores.refresh(later)
+    assert scores.refresh(later) == 0
+
+    trending = {
+        image_ids[row.image_id]: scores.get_score(row.score, later)
+        for row in db_session.exec(
+            select(TrendingImage).where(TrendingImage.image_id.in_(image_ids))
+        )
+    }
+    assert trending["older"] == pytest.approx(0.75)
+    assert trending["newer"] == pytest.approx(2)
+    titles = [
+        row.title
+        for row in db_session.exec(images_service.get_trending_images_query())
+        if row.id in image_ids
+    ]
+    assert titles == ["newer", "older"]
+
+
+def test_trending_keyset_pages(
+    db_session: Session,
+    database: Database,
+    images_service: ImagesService,
+    image_factory,
+    user_factory,
+):
+    scores = TrendingScores(database, HALF_LIFE, MIN_SCORE)
+    images = [add_file(image_factory()) for _ in range(4)]
+    users = user_factory.create_batch(2)
+    db_session.commit()
+    for image, likes in zip(images, (1, 2, 1, 2)):
+        for user in users[:likes]:
+            images_service.like_image(image.id, user)
+    scores.refresh(datetime.utcnow())
+    query = images_service.get_trending_images_query()
+
+    items = []
+    cursor = None
+    while True:
+        page = paginate_keyset(
+            db_session,
+            query,
+            TrendingImage,
+            ["-score"],
+            KeysetParams(cursor=cursor, size=1),
+            ImageDetailsSchema.from_row_bulk,
+        )
+        assert page.total is None
+        items.extend(page.items)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    assert [item.id for item in items] == [
+        str(row.id) for row in db_session.exec(query)
+    ]
+    image_ids = [str(image.id) for image in images]
+    assert [item.id for item in items if item.id in image_ids] == [
+        str(image.id)
+        for image in sorted(
+            images,
+            key=lambda image: (images.index(image) % 2, str(image.id)),
+            reverse=True,
+        )
+    ]
+
+
+def test_order_by_like_count(
+    db_session: Session,
+    images_service: ImagesService,
+    image_factory,
+    user_factory,
+):
+    owner = user_factory()
+    for like_count in (1, 3, 2):
+        add_file(image_factory(owner=owner, like_count=like_count))
+    db_session.commit()
+
+    rows = db_session.exec(
+        images_service.filter_images_query(
+            ImageFilter(owner_id=owner.id, order_by=["-like_count"])
+        )
+    ).all()
+
+    assert [row.like_count for row in rows] == [3, 2, 1]
@@ -0,0 +1,83 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image as PILImage
+
+from src.images.constants import MAX_TRANSFORM_DIMENSION
+from src.images.variants import (
+    encode_image,
+    fit_size,
+    render_variants,
+    transform_image,
+)
+
+VARIANT_QUALITY = 80
+
+
+def test_render_variants_sizes():
+    image = PILImage.new("RGB", (400, 200))
+    variants = render_variants(image, [100, 200, 800], ["jpeg"], VARIANT_QUALITY)
+    sizes = [(variant.dimension, variant.width, variant.height) for variant in variants]
+    assert sizes == [(200, 200, 100), (100, 100, 50)]
+
+
+def test_render_variants_formats():
+    image = PILImage.new("RGBA", (400, 200))
+    variants = render_variants(image, [100], ["webp", "jpeg"], VARIANT_QUALITY)
+    for variant in variants:
+        with PILImage.open(BytesIO(variant.content)) as encoded_image:
+            assert encoded_image.format.lower() == variant.format
+
+
+@pytest.mark.parametrize(
+    "width,height,fit,expected_size",
+    [
+        (100, None, "contain", (100, 50)),
+        (100, 100, "contain", (100, 50)),
+        (800, 800, "contain", (400, 200)),
+        (100, 100, "cover", (100, 100)),
+        (100, 100, "fill", (100, 100)),
+    ],
+)
+def test_transform_image(
+    width: int | None,
+    height: int | None,
+    fit: str,
+    expected_size: tuple[int, int],
+):
+    content = encode_image(PILImage.new("RGB", (400, 200)), "png", VARIANT_QUALITY)
+    transformed = transform_image(content, width, height, fit, "webp", VARIANT_QUALITY)
+    with PILImage.open(BytesIO(transformed)) as transformed_image:
+        assert transformed_image.format == "WEBP"
+        assert transformed_image.size == expected_size
+
+
+@pytest.mark.parametrize(
+    "size,width,height,fit,expected_size",
+    [
+        (
+            (1, 4000),
+            MAX_TRANSFORM_DIMENSION,
+            None,
+            "cover",
+            (1, MAX_TRANSFORM_DIMENSION),
+        ),
+        (
+            (1, 4000),
+            MAX_TRANSFORM_DIMENSION,
+            None,
+            "fill",
+            (1, MAX_TRANSFORM_DIMENSION),
+        ),
+        ((8000, 2), None, 100, "cover", (MAX_TRANSFORM_DIMENSION, 1)),
+        ((100, 50), 400, None, "cover", (400, 200)),
+    ],
+)
+def test_fit_size_limits_single_dimension(
+    size: tuple[int, int],
+    width: int | None,
+    height: int | None,
+    fit: str,
+    expected_size: tuple[int, int],
+):
+    assert fit_size(size, width, height, fit) == expected_size
@@ -0,0 +1,35 @@
+import asyncio
+import os
+import signal
+
+import pytest
+
+from src.worker import run_worker
+
+
+class FlakyProcessor:
+    def __init__(self) -> None:
+        self.claims = 0
+        self.processed: list[str] = []
+
+    async def claim(self, limit: int) -> list[str]:
+        self.claims += 1
+        if self.claims == 1:
+            raise ConnectionError()
+        if self.claims == 2:
+            return ["job"]
+        return []
+
+    async def process(self, job: str) -> None:
+        await asyncio.sleep(0.05)
+        self.processed.append(job)
+        os.kill(os.getpid(), signal.SIGTERM)
+
+
+@pytest.mark.asyncio
+async def test_run_worker_survives_claim_errors():
+    processor = FlakyProcessor()
+    async with asyncio.timeout(10):
+        await run_worker(processor, concurrency=2, poll_interval=0.01)
+    assert processor.claims >= 2
+    assert processor.processed == ["job"]